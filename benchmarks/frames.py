@@ -0,0 +1,167 @@
+# how long frames take in the standard scenes (see scenes.py), without a window
+# every scene is drawn for a fixed number of frames with the camera going around it, and the frame times are written to a json file
+# with a baseline (an older results file), every scene is compared to it, and anything that got slower by more than the threshold fails the run
+# startup (compiling, see engine.warmup()) is written down on its own, it's never part of the frame times and isn't compared
+
+# run from the repo folder: python -m benchmarks.frames [--frames 120] [--output results.json] [--baseline old.json] [--threshold 0.1]
+# (see --help for the rest)
+
+import argparse
+import json
+import platform
+import sys
+import time
+import numpy as np
+import numba
+from pg3d_scripts import pg3d as engine
+from benchmarks import scenes
+
+# frames drawn before timing starts (compiling is already done by then, this is for everything else that's slow the first time, like the mesh/texture caches)
+warmupFrames = 10
+
+# the frame time percentiles that are written down
+percentiles = (50, 90, 95, 99)
+
+def summarize(times):
+    times = np.asarray(times)
+    summary = {"mean": float(times.mean()), "max": float(times.max())}
+    for p in percentiles:
+        summary["p" + str(p)] = float(np.percentile(times, p))
+    return summary
+
+def set_camera(position, forward, up):
+    engine.setCameraPosition(position[0], position[1], position[2])
+    engine.cameraLocalTransform.forward = forward
+    engine.cameraLocalTransform.up = up
+
+# draws the scene that's been built, returns the results for it
+def run_scene(target, frameCount):
+    center, radius, height = target
+
+    # (the camera stays in one spot while compiling, so the timed frames all go around the scene exactly once)
+    set_camera(*scenes.camera_path(center, radius, height, 0, frameCount))
+    for i in range(warmupFrames):
+        engine.getFrame()
+        engine.update()
+
+    frameTimes = []
+    stages = {"snapshot": [], "clear": [], "transform": [], "draw": [], "instances": [], "render": [], "wait": [], "getFrame": [], "update": []}
+    counters = {"triangles_submitted": [], "triangles_rasterized": [], "triangles_clipped": [], "pixels_shaded": [], "models_drawn": []}
+
+    for i in range(frameCount):
+        set_camera(*scenes.camera_path(center, radius, height, i, frameCount))
+
+        start = time.perf_counter()
+        engine.getFrame()
+        frameDone = time.perf_counter()
+        engine.update()
+        end = time.perf_counter()
+
+        stats = engine.getRenderStats()
+        frameTimes.append((end - start) * 1000)
+        stages["getFrame"].append((frameDone - start) * 1000)
+        stages["update"].append((end - frameDone) * 1000)
+        # (the drawing is split up by the profiler, see pg3d_profiler.py)
+        for name in ("snapshot", "clear", "transform", "draw", "instances", "render", "wait"):
+            stages[name].append(stats[name + "_ms"])
+        for name in counters:
+            counters[name].append(stats[name])
+
+    return {
+        "frames": frameCount,
+        "frame_ms": summarize(frameTimes),
+        "stages_ms": {name: summarize(times) for name, times in stages.items()},
+        "per_frame": {name: float(np.mean(values)) for name, values in counters.items()},
+    }
+
+# every scene that got slower than the baseline by more than threshold (0.1 = 10%), going by the median and 95th percentile frame times
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, scene in results["scenes"].items():
+        if (name not in baseline["scenes"]):
+            print(name + ": not in the baseline")
+            continue
+        old = baseline["scenes"][name]
+        if (old["size"] != scene["size"] or old["frames"] != scene["frames"]):
+            print(name + ": the baseline was run with a different size/frame count, skipping")
+            continue
+
+        for key in ("p50", "p95"):
+            before = old["frame_ms"][key]
+            after = scene["frame_ms"][key]
+            change = after / before - 1
+            line = name + " " + key + ": " + str(round(before, 2)) + " -> " + str(round(after, 2)) + " ms (" + ("+" if change >= 0 else "") + str(round(change * 100, 1)) + "%)"
+            if (change > threshold):
+                line += "  REGRESSION"
+                regressions.append((name, key, change))
+            print(line)
+    return regressions
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="frame time benchmarks for the standard scenes")
+    parser.add_argument("--scenes", default=",".join(scenes.scenes), help="comma separated, any of: " + ", ".join(scenes.scenes))
+    parser.add_argument("--size", type=int, default=None, help="how many cubes/trees/particles/boxes (each scene has its own default)")
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--width", type=int, default=320)
+    parser.add_argument("--height", type=int, default=240)
+    parser.add_argument("--tiled", type=int, default=0, help="tile size for tiled rendering (0 = off)")
+    parser.add_argument("--pipelined", action="store_true")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=None, help="an older results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="how much slower (0.1 = 10%%) counts as a regression")
+    args = parser.parse_args(argv)
+
+    engine.init(args.width, args.height, args.width, args.height, 70, True)
+    engine.warmup()
+    engine.setBackgroundMode("skybox")
+    # physics and particles move the same amount every frame, no matter how long the frames take
+    engine.setFixedTimeStep(1 / 60)
+    engine.enableProfiler(args.frames)
+    if (args.tiled > 0):
+        engine.enableTiledRendering(args.tiled)
+    if (args.pipelined):
+        engine.enablePipelinedRendering()
+
+    results = {
+        "engine_version": engine.version,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "numba": numba.__version__,
+        "machine": platform.platform() + ", " + platform.processor(),
+        "settings": {"width": args.width, "height": args.height, "tiled": args.tiled, "pipelined": args.pipelined, "warmup_frames": warmupFrames},
+        "scenes": {},
+    }
+
+    for name in args.scenes.split(","):
+        buildStart = time.perf_counter()
+        size, target = scenes.build(name, args.size)
+        buildTime = time.perf_counter() - buildStart
+
+        scene = run_scene(target, args.frames)
+        scene["size"] = size
+        # (spawning is slow for big scenes, it's written down but not compared)
+        scene["build_s"] = buildTime
+        results["scenes"][name] = scene
+        print(name + " (" + str(size) + "): median", round(scene["frame_ms"]["p50"], 2), "ms, p95", round(scene["frame_ms"]["p95"], 2), "ms")
+
+    scenes.clear_scene()
+    engine.quit()
+
+    # (how long it took depends a lot on whether the compiled functions were already cached on disk, see kernels_compiled/kernels_cached)
+    results["startup"] = engine.getStartupStats()
+    print("startup: init", round(results["startup"]["init_ms"]), "ms, warmup", round(results["startup"]["warmup_ms"]), "ms, first frame",
+          round(results["startup"]["first_frame_ms"], 2), "ms (" + str(results["startup"]["kernels_compiled"]) + " compiled, " + str(results["startup"]["kernels_cached"]) + " from the cache)")
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print("written to", args.output)
+
+    if (args.baseline != None):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if (compare(results, baseline, args.threshold)):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
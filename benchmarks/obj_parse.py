@@ -0,0 +1,89 @@
+# how long it takes to read a big obj file
+# makes a grid mesh with about 1 million triangles (with uvs and normals), then reads it a few times
+# also times utils.optimize_mesh(), and how many vertices a 32 vertex cache would miss per triangle before/after it
+# run from the repo folder: python -m benchmarks.obj_parse [triangle count]
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from numba import njit
+from pg3d_scripts import pg3d_utils as utils
+from pg3d_scripts import pg3d_assets as assets
+
+# a square grid of quads, written the way blender writes them (v/vt/vn corners)
+def write_grid_obj(path, triangleCount):
+    side = int(np.ceil(np.sqrt(triangleCount / 2)))
+    points = side + 1
+
+    x, z = np.meshgrid(np.arange(points), np.arange(points), indexing="ij")
+    x = x.ravel()
+    z = z.ravel()
+    y = np.sin(x * 0.1) * np.cos(z * 0.1)
+
+    corner = (np.arange(side)[:,None] * points + np.arange(side)[None,:]).ravel() + 1
+    faces = np.stack([corner, corner + points, corner + points + 1, corner + 1], axis=1)
+
+    with open(path, "w") as f:
+        f.write("# synthetic grid, " + str(2 * side * side) + " triangles\n")
+        f.write("o Grid\n")
+        np.savetxt(f, np.stack([x, y, z], axis=1), fmt="v %.6f %.6f %.6f")
+        np.savetxt(f, np.stack([x / side, z / side], axis=1), fmt="vt %.6f %.6f")
+        f.write("vn 0.0000 1.0000 0.0000\n")
+        np.savetxt(f, np.repeat(faces, 2, axis=1), fmt="f %d/%d/1 %d/%d/1 %d/%d/1 %d/%d/1")
+
+# average vertex cache misses per triangle (with a first-in first-out cache), lower is better
+@njit()
+def cache_miss_ratio(triangles, cacheSize):
+    cache = np.full(cacheSize, -1)
+    next = 0
+    misses = 0
+    for t in range(len(triangles)):
+        for i in range(3):
+            v = triangles[t, i]
+            hit = False
+            for j in range(cacheSize):
+                if (cache[j] == v):
+                    hit = True
+                    break
+            if (not hit):
+                misses += 1
+                cache[next] = v
+                next = (next + 1) % cacheSize
+    return misses / len(triangles)
+
+def time_call(function, repeats):
+    times = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+if __name__ == "__main__":
+    triangleCount = 1000000
+    if (len(sys.argv) > 1):
+        triangleCount = int(sys.argv[1])
+
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, "grid.obj")
+
+    write_grid_obj(path, triangleCount)
+    print("file:", round(os.path.getsize(path) / 1024 / 1024, 1), "MB")
+
+    parseTime, mesh = time_call(lambda: utils.read_obj(path), 3)
+    print("read_obj:", len(mesh[0]), "vertices,", len(mesh[1]), "triangles in", round(parseTime * 1000, 1), "ms")
+
+    optimizeTime, optimized = time_call(lambda: utils.optimize_mesh(*mesh), 1)
+    print("optimize_mesh:", round(optimizeTime * 1000, 1), "ms,", len(optimized[0]), "vertices")
+    print("cache misses per triangle:", round(cache_miss_ratio(mesh[1], 32), 3), "->", round(cache_miss_ratio(optimized[1], 32), 3))
+
+    # first load compiles the mesh (see pg3d_assets.py), the ones after that just map it
+    assets.load_compiled_mesh(path)
+    compiledTime, mesh = time_call(lambda: assets.load_compiled_mesh(path), 3)
+    print("compiled load:", round(compiledTime * 1000, 2), "ms")
+
+    os.remove(path)
+    os.remove(assets.compiled_mesh_path(path))
+    os.rmdir(folder)
@@ -0,0 +1,115 @@
+# the standard scenes for benchmarks/frames.py, all made from the models that come with the repo
+# every scene is built the same way every time (random numbers are seeded), so runs can be compared with each other
+
+import random
+import numpy as np
+from pg3d_scripts import pg3d as engine
+from pg3d_scripts.pg3d import Color
+from pg3d_scripts.pg3d_particle import ParticleManager
+from pg3d_scripts import pg3d_assets as assets
+
+FOREST = ('3d models/forest level/forest.obj', '3d models/forest level/forest_texture.png')
+TREE = ('3d models/tree/tree.obj', '3d models/tree/tree_texture.png')
+PLATFORM = ('3d models/platform/platform.obj', '3d models/platform/platform_texture.png')
+
+# every scene function builds the scene, and returns what the camera should circle around: (center, radius, height)
+
+# a square grid of cubes, count of them (rounded up to a square)
+def cube_grid(count):
+    side = int(np.ceil(np.sqrt(count)))
+    spacing = 3.0
+
+    for i in range(count):
+        x = (i % side - (side - 1) / 2) * spacing
+        z = (i // side - (side - 1) / 2) * spacing
+        engine.spawnCube("cube", x, 0.0, z, [])
+
+    return np.asarray([0.0, 0.0, 0.0]), side * spacing * 0.6, side * spacing * 0.25
+
+# the forest level, with trees spread around on it
+def forest(treeCount):
+    engine.spawnScaledObjectWithTexture(FOREST[0], FOREST[1], "forest", 0.0, 0.0, 0.0, 4.0, 4.0, 4.0, [], Color.WHITE)
+
+    for i in range(treeCount):
+        x = random.uniform(-20.0, 20.0)
+        z = random.uniform(-20.0, 20.0)
+        tree = engine.spawnObjectWithTexture(TREE[0], TREE[1], "tree", x, 4.0, z, [], Color.WHITE)
+        tree.setAsTransparent()
+
+    return np.asarray([0.0, 2.0, 0.0]), 30.0, 10.0
+
+# count particles flying out from a few spots (each particle is its own model, so this is mostly a test of the per-model python work)
+def particle_storm(count):
+    engine.enableParticles()
+
+    emitters = 10
+    for i in range(emitters):
+        position = np.asarray([random.uniform(-10.0, 10.0), random.uniform(0.0, 5.0), random.uniform(-10.0, 10.0)])
+        direction = np.asarray([random.uniform(-1.0, 1.0), random.uniform(0.5, 1.0), random.uniform(-1.0, 1.0)])
+
+        # (a life time of -1 means the particles stay around for the whole benchmark)
+        manager = ParticleManager("storm" + str(i), count // emitters, count // emitters, 0.5, 1.0, position, True, assets.engine_asset('grid_16.png'), [], 0,
+                                  False, False, direction, 2.0, 8.0, 0, 0, 0, -1, -1)
+        manager.play()
+
+    return np.asarray([0.0, 0.0, 0.0]), 35.0, 8.0
+
+# count cubes with box colliders dropped into a pile on a platform
+def physics_pile(count):
+    engine.enablePhysics()
+
+    ground = engine.spawnObjectWithTexture(PLATFORM[0], PLATFORM[1], "ground", 0.0, 0.0, 0.0, [], Color.WHITE)
+    ground.set_scale(10.0, 1.0, 10.0)
+    ground.add_box_collider(20.0, 1.0, 20.0)
+
+    side = int(np.ceil(count ** (1 / 3)))
+    for i in range(count):
+        x = (i % side - (side - 1) / 2) * 2.5 + random.uniform(-0.3, 0.3)
+        z = (i // side % side - (side - 1) / 2) * 2.5 + random.uniform(-0.3, 0.3)
+        y = 3.0 + i // (side * side) * 2.5
+        cube = engine.spawnCube("box", x, y, z, ["physics", "gravity"])
+        cube.add_box_collider(2.0, 2.0, 2.0)
+
+    return np.asarray([0.0, 2.0, 0.0]), 20.0, 8.0
+
+# name -> function(size), and the size that's used if none is given
+scenes = {
+    "cube_grid": (cube_grid, 400),
+    "forest": (forest, 200),
+    "particle_storm": (particle_storm, 1000),
+    "physics_pile": (physics_pile, 64),
+}
+
+# the camera goes once around the scene over the whole run, looking at the center
+# (so every run sees exactly the same views, no matter how long each frame took)
+def camera_path(center, radius, height, frame, frameCount):
+    angle = 2 * np.pi * frame / frameCount
+    position = center + np.asarray([np.sin(angle) * radius, height, -np.cos(angle) * radius])
+
+    forward = center - position
+    forward = forward / np.linalg.norm(forward)
+    right = np.cross(np.asarray([0.0, 1.0, 0.0]), forward)
+    right = right / np.linalg.norm(right)
+    up = np.cross(forward, right)
+
+    return position, forward, up
+
+# empties the engine out, so the next scene starts from nothing
+def clear_scene():
+    engine.destroyAllObjects()
+    ParticleManager._registry.clear()
+    engine.disablePhysics()
+    engine.disableParticles()
+    engine.unParentCamera()
+    engine.resetCameraRotation()
+    engine.setCameraPosition(0.0, 0.0, 0.0)
+
+def build(name, size):
+    clear_scene()
+    random.seed(0)
+    np.random.seed(0)
+
+    function, defaultSize = scenes[name]
+    if (size == None):
+        size = defaultSize
+    return size, function(size)
@@ -0,0 +1,78 @@
+# how fast pg3d_simplify is, and how much it can take off a mesh without it looking different
+# uses the same grid as obj_parse.py (a bumpy height map), since for a height map the actual error is easy to measure:
+# every original vertex is looked up on the simplified surface, and the difference in height is how far the surface moved
+# run from the repo folder: python -m benchmarks.simplify [triangle count]
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from numba import njit
+from pg3d_scripts import pg3d_utils as utils
+from pg3d_scripts import pg3d_simplify as simplify
+from pg3d_scripts import pg3d_assets as assets
+from benchmarks.obj_parse import write_grid_obj, time_call
+
+# the biggest height difference between the grid's vertices (on whole-number x/z coords, height sin(x/10)cos(z/10)) and the simplified surface
+@njit()
+def height_error(vertices, triangles):
+    worst = 0.0
+    for t in range(len(triangles)):
+        x0 = vertices[triangles[t, 0], 0]
+        z0 = vertices[triangles[t, 0], 2]
+        x1 = vertices[triangles[t, 1], 0]
+        z1 = vertices[triangles[t, 1], 2]
+        x2 = vertices[triangles[t, 2], 0]
+        z2 = vertices[triangles[t, 2], 2]
+        area = (x1 - x0) * (z2 - z0) - (x2 - x0) * (z1 - z0)
+        if (area == 0):
+            continue
+
+        for x in range(int(np.floor(min(x0, x1, x2))), int(np.ceil(max(x0, x1, x2))) + 1):
+            for z in range(int(np.floor(min(z0, z1, z2))), int(np.ceil(max(z0, z1, z2))) + 1):
+                w1 = ((x - x0) * (z2 - z0) - (x2 - x0) * (z - z0)) / area
+                w2 = ((x1 - x0) * (z - z0) - (x - x0) * (z1 - z0)) / area
+                w0 = 1 - w1 - w2
+                if (w0 < -1e-9 or w1 < -1e-9 or w2 < -1e-9):
+                    continue
+                y = w0 * vertices[triangles[t, 0], 1] + w1 * vertices[triangles[t, 1], 1] + w2 * vertices[triangles[t, 2], 1]
+                worst = max(worst, np.abs(y - np.sin(x * 0.1) * np.cos(z * 0.1)))
+    return worst
+
+# how many corners ended up with a uv coord that doesn't belong to their vertex (should always be 0)
+def uv_mismatches(vertices, triangles, texture_uv, texture_map, side):
+    expected = np.stack([vertices[triangles, 0] / side, 1 - vertices[triangles, 2] / side], axis=2)
+    return int((np.abs(texture_uv[texture_map] - expected) > 1e-5).any(axis=2).sum())
+
+def report(name, mesh, seconds, side, originalCount):
+    print(name + ":", len(mesh[1]), "triangles (" + str(round(100 * len(mesh[1]) / originalCount, 1)) + "%) in", round(seconds, 2), "s,",
+          "max height error", round(height_error(mesh[0], mesh[1]), 5), ", uv mismatches", uv_mismatches(*mesh, side))
+
+if __name__ == "__main__":
+    triangleCount = 1000000
+    if (len(sys.argv) > 1):
+        triangleCount = int(sys.argv[1])
+
+    folder = tempfile.mkdtemp()
+    path = os.path.join(folder, "grid.obj")
+    write_grid_obj(path, triangleCount)
+    mesh = utils.read_obj(path)
+    os.remove(path)
+    os.rmdir(folder)
+
+    side = int(np.ceil(np.sqrt(triangleCount / 2)))
+    print("grid:", len(mesh[1]), "triangles")
+
+    # (compiling everything first, so it's not counted)
+    simplify.simplify_mesh(*utils.read_obj(assets.engine_asset("sphere.obj")), 0.5)
+
+    # speed, going down to a fixed number of triangles
+    for ratio in (0.5, 0.25, 0.1):
+        seconds, simplified = time_call(lambda: simplify.simplify_mesh(*mesh, ratio), 1)
+        report("ratio " + str(ratio), simplified, seconds, side, len(mesh[1]))
+
+    # how far it gets without going over an error
+    for maxError in (0.001, 0.005, 0.02):
+        seconds, simplified = time_call(lambda: simplify.simplify_mesh(*mesh, 0.0, maxError), 1)
+        report("max error " + str(maxError), simplified, seconds, side, len(mesh[1]))
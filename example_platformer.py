@@ -11,6 +11,8 @@ from pg3d_scripts.pg3d import Color
 def main():
     # Always start the engine by calling pg3d.init(). Pass in the render resolution, screen resolution, and VERTICAL fov.
     engine.init(200,150,800,600, 70)
+    # Compiling everything now means the first frame doesn't freeze (it's saved to disk, so this is a lot faster from the second run on).
+    engine.warmup()
 
     ping_sound = pg.mixer.Sound('ping.wav')
 
@@ -28,14 +30,15 @@ def main():
     # Something to note: objects cannot have the same name!
 
     # spawning a row of platforms
+    # the platforms never move, so they get the "static" tag, which lets the engine merge them into one mesh and draw them all at once
     platformCount = 5
     for i in range(platformCount):
-        engine.spawnObjectWithTexture('3d models/platform/platform.obj','3d models/platform/platform_texture.png',"platform" + str(i+1), 0.0 + i * 15,0.0,0.0, [], Color.GREEN)
+        engine.spawnObjectWithTexture('3d models/platform/platform.obj','3d models/platform/platform_texture.png',"platform" + str(i+1), 0.0 + i * 15,0.0,0.0, ["static"], Color.GREEN)
         engine.getObject("platform" + str(i+1)).add_box_collider(10.0,1.0,10.0)
         engine.getObject("platform" + str(i+1)).set_scale(5.0,1.0,5.0)
 
     # vertical wall to test collisions
-    engine.spawnObjectWithTexture('3d models/platform/platform.obj','3d models/platform/platform_texture.png',"platform" + str(6), 0.0 + i * 15,0.0,0.0, [], Color.GREEN)
+    engine.spawnObjectWithTexture('3d models/platform/platform.obj','3d models/platform/platform_texture.png',"platform" + str(6), 0.0 + i * 15,0.0,0.0, ["static"], Color.GREEN)
     engine.getObject("platform" + str(6)).add_box_collider(10.0,1.0,10.0)
     engine.getObject("platform" + str(6)).set_scale(5.0,1.0,5.0)
 
@@ -61,6 +64,9 @@ def main():
     engine.enablePhysics()
     engine.enableParticles()
 
+    # the next frame gets drawn while update() runs (the screen ends up one frame behind the game, which you can't really notice)
+    engine.enablePipelinedRendering()
+
     running = True
     while running:
         frame = engine.getFrame()
@@ -4,12 +4,25 @@
 import pygame as pg
 import numpy as np
 from numba import njit
+from numba.core.dispatcher import Dispatcher
 import random
+import numba
+import os
+import time
+import copy
+from concurrent.futures import ThreadPoolExecutor
 from .pg3d_model import Model
 from .pg3d_model import ModelTransform
 from . import pg3d_math as m
+from . import pg3d_utils as utils
 from . import pg3d_rendering
+from . import pg3d_assets as assets
 from .pg3d_particle import ParticleManager
+from .pg3d_skybox import Skybox
+from .pg3d_instancing import InstancedModel
+from . import pg3d_batching as batching
+from . import pg3d_profiler as profiler
+from . import pg3d_hud as hud
 
 # just to keep track of things, not actually used in code
 version = "0.4.1"
@@ -35,6 +48,8 @@ gravityCoefficient = 9.81 # small g, the acceleration of gravity
 clock = pg.time.Clock()
 hasClockStarted = False # fixing a weird timing issue that breaks physics
 timeSinceLastFrame = 0
+# if this is set (in seconds), update() pretends every frame took exactly that long, see setFixedTimeStep()
+fixedTimeStep = None
 
 # the camera
 # position (x,y,z), forward (x,y,z), up (x,y,z) (scale does nothing)
@@ -47,7 +62,15 @@ cameraParent = None
 physicsEnabled = False
 particlesEnabled = False
 
-sky_texture = None
+# see pg3d_skybox.py
+skybox = None
+
+# no window, mouse or screen, getFrame() still works (see init())
+headless = False
+
+# how long it took to get going, see getStartupStats()
+startupStats = {"init_ms": None, "warmup_ms": None, "first_frame_ms": None, "time_to_first_frame_ms": None}
+initStartTime = None
 
 # joystick stuff ************************
 # easier to include here, rather than in another class/script
@@ -61,10 +84,16 @@ firstPerson_camera_max_dot = 0.5
 firstPerson_camera_min_dot = 0.5
 
 # ********      main engine functions:     ********   
-def init(w, h, wActual, hActual, ver):
+# with headlessMode on, nothing is ever shown: there's no window, the mouse is left alone, and drawScreen()/update_display() do nothing
+# getFrame() still gives frames, so the engine can run on a server (or anything else without a screen), e.g. for benchmarks or rendering a bunch of images
+def init(w, h, wActual, hActual, ver, headlessMode=False):
     global clock
+    global headless
+    global initStartTime
 
-    global sky_texture
+    initStartTime = time.perf_counter()
+
+    global skybox
 
     global cameraLocalTransform
     global cameraWorldTransform
@@ -78,12 +107,21 @@ def init(w, h, wActual, hActual, ver):
     
     pg3d_rendering.init(w, h, horizontalFOV, verticalFOV, hA, vA, "texture", "solid color", wActual, hActual)
 
-    sky_texture = np.zeros((pg3d_rendering.renderConfig.screenWidth, pg3d_rendering.renderConfig.screenHeight * 3, 3)).astype('uint8')
-    pg.surfarray.surface_to_array(sky_texture, pg.transform.scale(pg.image.load("pg3d_assets/sky_better.png"), (pg3d_rendering.renderConfig.screenWidth, pg3d_rendering.renderConfig.screenHeight * 3)))
+    skybox = Skybox(assets.engine_asset("sky_better.png"), pg3d_rendering.renderConfig.screenWidth, pg3d_rendering.renderConfig.screenHeight, horizontalFOV)
+
+    headless = headlessMode
+
+    # SDL's "dummy" video driver doesn't need a display to exist (unless a different driver was picked on purpose)
+    if (headless):
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
 
     # required for pygame to work properly
     pg.init()
 
+    # starting numba's threads (for tiled rendering) here, on the main thread
+    # with the tbb threading layer, if they're started from another thread first (the render thread, warmup(True)), python hangs when it exits
+    numba.get_num_threads()
+
     clock = pg.time.Clock()
 
     # scale does nothing
@@ -91,10 +129,13 @@ def init(w, h, wActual, hActual, ver):
     cameraWorldTransform = ModelTransform(np.asarray([0.0, 0.0, 0.0]), np.asarray([0.0, 0.0, 1.0]), np.asarray([0.0, 1.0, 0.0]), np.asarray([0.0, 0.0, 0.0]))
     cameraParent = None
 
-    pg.display.set_mode((pg3d_rendering.renderConfig.screenWidth_actual, pg3d_rendering.renderConfig.screenHeight_actual),pg.FULLSCREEN)
+    if (not headless):
+        pg.display.set_mode((pg3d_rendering.renderConfig.screenWidth_actual, pg3d_rendering.renderConfig.screenHeight_actual),pg.FULLSCREEN)
+
+        pg.mouse.set_visible(0)
+        pg.mouse.set_pos(pg3d_rendering.renderConfig.screenWidth/2,pg3d_rendering.renderConfig.screenHeight/2)
 
-    pg.mouse.set_visible(0)
-    pg.mouse.set_pos(pg3d_rendering.renderConfig.screenWidth/2,pg3d_rendering.renderConfig.screenHeight/2)
+    startupStats["init_ms"] = (time.perf_counter() - initStartTime) * 1000
 
 def spawnParticleSystem(name, scale, position, use_gravity, texture_path, life_time):
     ParticleManager(name, 1, 1, scale, scale, position, use_gravity, texture_path, [], 0, False, False, Vector3.ZERO, 0, 0, 0, 0, 0, life_time, life_time)
@@ -328,6 +369,113 @@ def disableBackfaceCulling():
 def enableBackfaceCulling():
     pg3d_rendering.renderConfig.backfaceCulling = True
 
+# frustum culling skips drawing objects that are completely off screen, it's on by default
+def enableFrustumCulling():
+    pg3d_rendering.renderConfig.frustumCulling = True
+
+def disableFrustumCulling():
+    pg3d_rendering.renderConfig.frustumCulling = False
+
+# numbers about the last frame (how many models were drawn/culled, etc.)
+def getRenderStats():
+    stats = dict(pg3d_rendering.frameStats)
+    stats["triangles_per_lod"] = list(stats["triangles_per_lod"])
+    return stats
+
+# the profiler times every part of every frame (drawing, update(), drawScreen()...) and keeps the last historyLength frames, see pg3d_profiler.py
+# it's off by default, timing everything costs a little bit
+def enableProfiler(historyLength):
+    profiler.enable(historyLength)
+
+def disableProfiler():
+    profiler.disable()
+
+# the last frames the profiler saw (oldest first), each one a dict of times in milliseconds plus everything getRenderStats() has
+def getFrameStats():
+    return list(profiler.frames)
+
+# writes every frame the profiler sees to a file as it goes, ".csv" gets a spreadsheet, anything else gets one json object per line
+def startProfilerExport(path):
+    profiler.start_export(path)
+
+def stopProfilerExport():
+    profiler.stop_export()
+
+# fps, 1% low, a frame time graph and how long each part of the frame took, drawn on top of the frame getFrame() returns (see pg3d_hud.py)
+# it turns the profiler on while it's shown
+def togglePerformanceOverlay():
+    if (hud.enabled):
+        hud.disable()
+    else:
+        hud.enable()
+
+def enablePerformanceOverlay():
+    hud.enable()
+
+def disablePerformanceOverlay():
+    hud.disable()
+
+# draw the screen in tiles, spread over all cpu cores (looks exactly the same, just faster on multi-core machines)
+def enableTiledRendering(tileSize):
+    pg3d_rendering.renderConfig.tiledRendering = True
+    pg3d_rendering.renderConfig.tileSize = tileSize
+
+def disableTiledRendering():
+    pg3d_rendering.renderConfig.tiledRendering = False
+
+# getFrame() reuses the same frame every time, double buffering switches between two
+# so a frame can be kept around (e.g. drawn to the screen) while the next one is being made
+def enableDoubleBuffering():
+    pg3d_rendering.renderConfig.doubleBuffering = True
+
+def disableDoubleBuffering():
+    pg3d_rendering.renderConfig.doubleBuffering = False
+
+# mesh files are only read once and then shared (see pg3d_assets.py)
+# evicting one makes the next object that uses it read the file again
+def evictMesh(path):
+    assets.evict_mesh(path)
+
+def clearMeshCache():
+    assets.clear_meshes()
+
+# meshes get saved in a binary format next to the obj file the first time they're read (model.obj -> model.obj.pg3dmesh)
+# and are loaded from that afterwards, which is a lot faster for big meshes (on by default)
+def enableCompiledMeshes():
+    assets.compiledMeshes = True
+
+def disableCompiledMeshes():
+    assets.compiledMeshes = False
+
+# merging duplicate vertices and reordering triangles when a mesh is loaded, so it's faster to draw (on by default)
+# (only affects meshes loaded after this is called)
+def enableMeshOptimization():
+    assets.optimizeMeshes = True
+
+def disableMeshOptimization():
+    assets.optimizeMeshes = False
+
+# models with the "static" tag are merged into a few big meshes that are already in world space (see pg3d_batching.py)
+# which is a lot less work per frame for scenery that doesn't move (on by default)
+def enableStaticBatching():
+    batching.staticBatching = True
+
+def disableStaticBatching():
+    batching.staticBatching = False
+    batching.clear_static_batches()
+
+# textures work the same way, except they're kept loaded while any object uses them
+# unused ones stay around until they take up more than the budget (in bytes)
+def setTextureBudget(budget):
+    assets.set_texture_budget(budget)
+
+def clearTextureCache():
+    assets.clear_textures()
+
+# hits, misses, bytes_resident, textures_resident
+def getTextureCacheStats():
+    return assets.get_texture_stats()
+
 def enablePhysics():
     global physicsEnabled
     physicsEnabled = True
@@ -371,6 +519,13 @@ def setBackgroundMode(newMode):
     if (m.array_has_item(pg3d_rendering.backGroundModes, newMode)):
         pg3d_rendering.renderConfig.backgroundMode = newMode
 
+# with this on, the skybox turns left/right with the camera (not just up/down)
+def enableSkyboxScrolling():
+    skybox.set_yaw_scrolling(True)
+
+def disableSkyboxScrolling():
+    skybox.set_yaw_scrolling(False)
+
 def update():
     global timeSinceLastFrame
     global clock
@@ -379,13 +534,21 @@ def update():
     global physicsEnabled
     global gravityCoefficient
 
+    updateStart = time.perf_counter()
+
     timeSinceLastFrame = clock.tick()*0.001
 
     if (not hasClockStarted):
         timeSinceLastFrame = 0
         hasClockStarted = True
+    elif (fixedTimeStep != None):
+        timeSinceLastFrame = fixedTimeStep
+
+    # (there's no mouse to keep track of without a window)
+    if (not headless):
+        updateCursor()
 
-    updateCursor()
+    particlesStart = time.perf_counter()
 
     # could have made this use the same variable as physics, but ah well
     # this feels like a feature that's going to change lol
@@ -412,6 +575,10 @@ def update():
 
             i.add_local_position(i.linearVelocity[0] * timeSinceLastFrame,i.linearVelocity[1] * timeSinceLastFrame,i.linearVelocity[2] * timeSinceLastFrame)
 
+    physicsStart = time.perf_counter()
+    # how many pairs of colliders got checked against each other (for the profiler)
+    collisionPairs = 0
+
     if (physicsEnabled):
         for i in getObjectsWithTag("physics"):
             # objects can have physics, but still not have gravity applied
@@ -454,6 +621,8 @@ def update():
                     if (not j.shouldBePhysics):
                         continue
 
+                    collisionPairs += 1
+
                     closestPointOnOther = j.closest_point(worldSpaceMidpoint)
 
                     closestPointOnThis = i.closest_point(closestPointOnOther)
@@ -497,6 +666,8 @@ def update():
                     if (not j.shouldBePhysics): # colliddr isn't participating in interactions
                         continue
 
+                    collisionPairs += 1
+
                     # testing for an intersection is wayyy simpler, just a length check
                     # (the whole point of sphere colliders is that they're easier to compute btw)
 
@@ -519,65 +690,451 @@ def update():
                         i.add_local_position(pushVector[0] * differenceInRadius, pushVector[1] * differenceInRadius, pushVector[2] * differenceInRadius)
 
             i.add_local_position(i.linearVelocity[0] * timeSinceLastFrame,i.linearVelocity[1] * timeSinceLastFrame,i.linearVelocity[2] * timeSinceLastFrame)
-                
 
-def getFrame():
+    if (profiler.enabled):
+        updateEnd = time.perf_counter()
+        profiler.add_time("update", updateEnd - updateStart)
+        profiler.add_time("particles", physicsStart - particlesStart)
+        profiler.add_time("physics", updateEnd - physicsStart)
+        profiler.add_count("collision_pairs", collisionPairs)
+
+# ********  drawing frames  ********
+
+# a frame is made in two steps:
+#   1. snapshot_scene() goes through the scene (in python) and writes down everything that has to be drawn (which meshes, with what matrices and textures)
+#   2. render_snapshot() draws all of that, which is almost all compiled code
+
+# normally getFrame() does one right after the other
+# with pipelined rendering (enablePipelinedRendering()), step 2 happens on another thread: getFrame() hands the new snapshot off and returns the frame before it,
+# so the game's update() (physics, particles, your own code) runs while that frame is being drawn
+# (the compiled drawing code lets go of python's lock, that's what lets both actually run at the same time)
+# the catch is that what's on screen is one frame behind the game, see frame_latency_ms in getRenderStats()
+
+# everything needed to draw one frame
+# nothing in here changes after it's made, so the game can keep changing the scene while it's being drawn
+class FrameSnapshot:
+    def __init__(self):
+        self.startTime = time.perf_counter()
+
+        # the rendering settings as they were when the frame was started (rendering mode, culling, resolution...)
+        self.config = copy.copy(pg3d_rendering.renderConfig)
+        self.frameBuffer = None
+        self.cameraForward = None
+        self.skyColor = None
+        self.viewMatrix = None
+
+        # (points, triangles, texture_uv, texture_map, texture, textureType, matrix) for every model/batch that's drawn
+        self.meshes = []
+        # an InstanceSnapshot for every instanced object that's drawn
+        self.instances = []
+
+        self.stats = pg3d_rendering.new_frame_stats()
+        # whether to time each part of drawing the frame (see pg3d_profiler.py)
+        self.profile = profiler.enabled
+
+# step 1, always on the main thread
+# camera is the transform the frame is drawn from (see getFrame())
+def snapshot_scene(camera):
     global cameraWorldTransform
     global cameraLocalTransform
     global cameraParent
     global skyColor
 
-    global renderingMode
+    snapshot = FrameSnapshot()
+    stats = snapshot.stats
+
+    if (camera == None):
+        # refreshing the camera's transform
+        cameraWorldTransform.copy(cameraLocalTransform)
+        if (cameraParent != None):
+            cameraWorldTransform.add_self_to_other(cameraParent.worldTransform)
+        camera = cameraWorldTransform
+
+    snapshot.frameBuffer = pg3d_rendering.next_frame_buffer()
+    snapshot.cameraForward = camera.forward.copy()
+    snapshot.skyColor = skyColor.copy()
+
+    # the camera's rotation only has to be figured out once for the whole frame
+    viewMatrix = camera_view_matrix(camera)
+    snapshot.viewMatrix = viewMatrix
+
+    # static models are drawn as a few merged batches instead of one by one (see pg3d_batching.py)
+    staticModels = []
+    if (batching.staticBatching):
+        staticModels = [model for model in Model._registry if batching.is_batchable(model)]
+    batchedModels = set(staticModels)
+
+    for batch in batching.get_static_batches(staticModels):
+        # the batch is already in world space, so the camera's matrix is all it needs
+        if (pg3d_rendering.renderConfig.frustumCulling and not is_model_visible(batch, viewMatrix)):
+            continue
+        stats["static_batches_drawn"] += 1
+        stats["models_batched"] += batch.modelCount
+        pg3d_rendering.count_lod_triangles(stats, 0, len(batch.triangles))
+
+        snapshot.meshes.append((batch.points, batch.triangles, batch.texture_uv, batch.texture_map, batch.texture, batch.textureType, viewMatrix))
+
+    for model in Model._registry:
+        if (model.shouldBeDrawn and model not in batchedModels):
+            matrix = model_view_matrix(model, viewMatrix)
+
+            # if the model is completely off screen (or behind the camera), there's no point transforming/drawing it
+            if (pg3d_rendering.renderConfig.frustumCulling and not is_model_visible(model, matrix)):
+                stats["models_culled"] += 1
+                continue
+            stats["models_drawn"] += 1
+
+            # models with levels of detail draw whichever mesh fits how far away they are (see Model.select_lod())
+            mesh = model
+            lodLevel = 0
+            if (model.lods != None):
+                mesh = model.select_lod(matrix, pg3d_rendering.renderConfig.ver_fov_adjust)
+                lodLevel = model.currentLod
+            pg3d_rendering.count_lod_triangles(stats, lodLevel, len(mesh.triangles))
+
+            # (the points array is only scratch space for the camera-relative/projected points, the game never writes to it)
+            snapshot.meshes.append((mesh.points, mesh.triangles, mesh.texture_uv, mesh.texture_map, model.texture, model.textureType, matrix))
+
+    for instanced in InstancedModel._registry:
+        if (instanced.shouldBeDrawn and instanced.count > 0):
+            snapshot.instances.append(instanced.snapshot())
+
+    stats["snapshot_ms"] = (time.perf_counter() - snapshot.startTime) * 1000
+
+    return snapshot
+
+# step 2, on the main thread or the render thread, returns the finished frame
+def render_snapshot(snapshot):
+    renderStart = time.perf_counter()
 
     # like a directional light in unity
     light_dir = np.asarray([0.0,1.0,0.0])
     light_dir = light_dir/np.linalg.norm(light_dir)
 
-    # refreshing the camera's transform
-    cameraWorldTransform.copy(cameraLocalTransform)
-    if (cameraParent != None):
-        cameraWorldTransform.add_self_to_other(cameraParent.worldTransform)
+    # the frame and z buffer are reused from an earlier frame, so they have to be cleared first
+    frame = snapshot.frameBuffer.frame
+    z_buffer = snapshot.frameBuffer.z_buffer
+    config = snapshot.config
 
-    frame= np.ones((pg3d_rendering.renderConfig.screenWidth, pg3d_rendering.renderConfig.screenHeight, 3)).astype('uint8')
-    z_buffer = np.zeros((pg3d_rendering.renderConfig.screenWidth, pg3d_rendering.renderConfig.screenHeight)) # start with some SMALL value
-    # the value is small because the z buffer stores values of 1/z, so 0 represents the largest depth possible (it would be 1/infinity)
+    z_buffer.fill(0)
 
-    if (pg3d_rendering.renderConfig.backgroundMode == "skybox"):
-        startY = int(m.dot_3d(np.asarray([0.0,-1.0,0.0]), cameraWorldTransform.forward) * pg3d_rendering.renderConfig.screenHeight)
-        startY += pg3d_rendering.renderConfig.screenHeight
+    # (the skybox covers every pixel, so the frame doesn't need clearing there)
+    if (config.backgroundMode == "skybox"):
+        skybox.draw(frame, snapshot.cameraForward)
+    elif (config.backgroundMode == "solid color"):
+        frame[:,:] = snapshot.skyColor * 255
+    else:
+        frame.fill(1)
+
+    # (the parts are only timed with the profiler on, see pg3d_profiler.py)
+    profile = snapshot.profile
+    stats = snapshot.stats
+    if (profile):
+        transformTime = 0
+        drawTime = 0
+        partStart = time.perf_counter()
+        stats["clear_ms"] = (partStart - renderStart) * 1000
+
+    for points, triangles, texture_uv, texture_map, texture, textureType, matrix in snapshot.meshes:
+        # this function will move the points so that they are centered around the camera
+        # basically, handling the camera position/rotation stuff
+        transform_points(points, matrix, config)
+        if (profile):
+            transformEnd = time.perf_counter()
+        # this function will project the triangles onto the screen, and draw them
+        pg3d_rendering.draw_model(None, frame, points, triangles, None, light_dir, z_buffer,
+                        texture_uv, texture_map, texture, None, textureType, config, stats)
+        if (profile):
+            drawEnd = time.perf_counter()
+            transformTime += transformEnd - partStart
+            drawTime += drawEnd - transformEnd
+            partStart = drawEnd
+
+    # every instance of an instanced object is culled/transformed/drawn in one call
+    for instanced in snapshot.instances:
+        pg3d_rendering.draw_instances(instanced, frame, z_buffer, snapshot.viewMatrix, config, stats)
+
+    renderEnd = time.perf_counter()
+    stats["render_ms"] = (renderEnd - renderStart) * 1000
+    if (profile):
+        stats["transform_ms"] = transformTime * 1000
+        stats["draw_ms"] = drawTime * 1000
+        stats["instances_ms"] = (renderEnd - partStart) * 1000
 
-        # initialize the frame
-        for x in range(pg3d_rendering.renderConfig.screenWidth):
-            for y in range(pg3d_rendering.renderConfig.screenHeight):
-                frame[x,y] = sky_texture[x,startY + y]
+    return frame
+
+# the thread frames are drawn on with pipelined rendering, made the first time it's turned on
+renderThread = None
+# the frame that's being drawn on it right now (a Future), and its snapshot
+pendingFrame = None
+pendingSnapshot = None
+# when getFrame() last returned (for frame_interval_ms)
+lastFrameTime = None
+
+# draw each frame while the game is updating, on a second cpu core
+# getFrame() then returns the frame from the call before, so the screen is one frame behind (the very first frame is shown twice)
+def enablePipelinedRendering():
+    global renderThread
+
+    if (renderThread == None):
+        renderThread = ThreadPoolExecutor(max_workers=1)
+    pg3d_rendering.renderConfig.pipelined = True
+
+def disablePipelinedRendering():
+    global pendingFrame
+    global pendingSnapshot
+
+    # the frame that's being drawn has to be finished first, it's still using one of the frame buffers
+    if (pendingFrame != None):
+        pendingFrame.result()
+        pendingFrame = None
+        pendingSnapshot = None
+    pg3d_rendering.renderConfig.pipelined = False
+
+# ********  warming up:  ********
+
+# every compiled function (the @njit ones) gets compiled the first time it's called, which takes seconds for the drawing ones
+# they're cached on disk (in __pycache__, next to the scripts), so that only happens once per machine (and again whenever a script changes),
+# (numba only checks the script a function is in, so after changing e.g. pg3d_math.py, delete __pycache__ or the drawing functions will keep using the old math)
+# but even loading them from the cache takes a bit, and it'd all happen inside the first getFrame()/update() (a freeze on the first frame)
+# warmup() gets all of it done up front, by drawing a tiny scene nobody sees (the game's scene isn't touched)
+# with background on it happens on another thread, so a loading screen can keep going in the meantime (see isWarmupDone())
+# call it after init()
+def warmup(background=False):
+    global pendingWarmup
+
+    if (background):
+        thread = ThreadPoolExecutor(max_workers=1)
+        pendingWarmup = thread.submit(warm_up)
+        # (the thread goes away once it's done)
+        thread.shutdown(wait=False)
+    else:
+        warm_up()
+
+# with warmup(True), whether it's finished yet (getFrame() waits for it if it isn't)
+def isWarmupDone():
+    return pendingWarmup == None or pendingWarmup.done()
+
+# the one running in the background, if there is one
+pendingWarmup = None
+
+def warm_up():
+    warmupStart = time.perf_counter()
+
+    # the same kinds of arrays the game uses, every different kind gets compiled separately (read-only vs not, int vs float...)
+    mesh = assets.load_mesh(assets.engine_asset('cube_no-net.obj'))
+    texture = assets.load_texture(assets.engine_asset('grid_16.png'))
+
+    # a small frame, from a camera a bit behind the cube (so something actually gets drawn)
+    camera = ModelTransform(np.asarray([0.0, 0.0, -4.0]), np.asarray([0.0, 0.0, 1.0]), np.asarray([0.0, 1.0, 0.0]), np.asarray([0.0, 0.0, 0.0]))
+    viewMatrix = camera_view_matrix(camera)
+    frameBuffer = pg3d_rendering.FrameBuffer(64, 48)
+
+    # instances aren't in the registry, so they're never drawn with the game's scene
+    instanced = InstancedModel("warmup", assets.engine_asset('cube_no-net.obj'), assets.engine_asset('grid_16.png'), [])
+    InstancedModel._registry.remove(instanced)
+    instanced.add_instance(0.0, 0.0, 0.0)
+
+    for tiled in (False, True):
+        snapshot = FrameSnapshot()
+        snapshot.profile = False
+        snapshot.config.screenWidth = 64
+        snapshot.config.screenHeight = 48
+        snapshot.config.backgroundMode = "solid color"
+        snapshot.config.tiledRendering = tiled
+        snapshot.config.tileSize = 16
+        snapshot.frameBuffer = frameBuffer
+        snapshot.cameraForward = camera.forward.copy()
+        snapshot.skyColor = np.asarray([0.0, 0.0, 0.0])
+        snapshot.viewMatrix = viewMatrix
+
+        # a model (its own points, the mesh's read-only triangles/uvs) and a static batch (all of its own arrays)
+        snapshot.meshes.append((mesh.points.copy(), mesh.triangles, mesh.texture_uv, mesh.texture_map, texture, "opaque", viewMatrix))
+        snapshot.meshes.append((mesh.points.copy(), mesh.triangles.copy(), mesh.texture_uv.copy(), mesh.texture_map.copy(), texture, "alphaclip", viewMatrix))
+        snapshot.instances.append(instanced.snapshot())
+
+        render_snapshot(snapshot)
+
+    instanced.releaseAssets()
+
+    # frustum culling, for models and batches
+    is_model_visible(mesh, viewMatrix)
+    center, radius, boxMin, boxMax = utils.mesh_bounds(mesh.points.copy())
+    pg3d_rendering.mesh_in_frustum(viewMatrix, center, radius, boxMin, boxMax, 1.0, 1.0)
+
+    # loading meshes (for ones that aren't in the compiled mesh cache yet)
+    utils.optimize_mesh(*utils.read_obj(assets.engine_asset('cube_no-net.obj')))
+
+    # the math that moving/rotating things and physics use
+    a = np.asarray([1.0, 0.0, 0.0])
+    b = np.asarray([0.0, 1.0, 0.0])
+    m.clamp(0.5, 0.0, 1.0)
+    for function in (m.dot_3d, m.cross_3d, m.add_3d, m.subtract_3d, m.angle_3d, m.object_rotation_matrix_3d, m.camera_rotation_matrix_3d,
+                     m.dot_2d, m.add_2d, m.subtract_2d):
+        function(a, b)
+    for function in (m.length_3d, m.normalize_3d, m.length_2d):
+        function(a)
+    for function in (m.lerp_3d, m.lerp_2d, m.rotate_vector_3d, m.rotate_point_3d):
+        function(a, b, 0.5)
+    for function in (m.clamp_box_3d, m.point_in_box_3d):
+        function(a, b, a)
+    m.multiply_matrix_3d(m.rotation_matrix_3d(a, 0.5), m.rotation_matrix_3d(b, 0.5))
+    getFirstIndex("warmup", '(')
+
+    # the performance overlay (see pg3d_hud.py)
+    hud.draw_panel(np.zeros((200, 150, 3), dtype=np.uint8), 2, 2, 176, hud.textPixels, hud.textColors, hud.frameTimes, hud.frameCount,
+                   np.zeros(len(hud.stages)), hud.stageColors, hud.graphMs, hud.budgetMs)
+
+    startupStats["warmup_ms"] = (time.perf_counter() - warmupStart) * 1000
+
+# every compiled function the engine uses while running (pg3d_simplify.py is a tool, it isn't counted)
+def compiled_functions():
+    functions = [getFirstIndex]
+    for module in (m, utils, pg3d_rendering, hud):
+        functions += [value for value in vars(module).values() if isinstance(value, Dispatcher)]
+    # (dict.fromkeys, because modules import each other's functions)
+    return list(dict.fromkeys(functions))
+
+# how long starting up took (all in ms, None if it hasn't happened yet), apart from the frame times in getRenderStats()/getFrameStats():
+#   init_ms                 init()
+#   warmup_ms               warmup()
+#   first_frame_ms          the first getFrame() call (including anything that still had to be compiled)
+#   time_to_first_frame_ms  from init() being called to the first frame being returned
+# plus how many compiled functions were compiled from scratch (kernels_compiled) and how many were loaded from the cache on disk (kernels_cached)
+def getStartupStats():
+    stats = dict(startupStats)
+    stats["kernels_compiled"] = 0
+    stats["kernels_cached"] = 0
+    for function in compiled_functions():
+        stats["kernels_compiled"] += sum(function.stats.cache_misses.values())
+        stats["kernels_cached"] += sum(function.stats.cache_hits.values())
+    return stats
+
+# the frame that's returned gets drawn over by the next getFrame() call (unless double buffering is on, then it's the one after that)
+# camera is optional, it's a ModelTransform to draw the frame from instead of the engine's camera (which is left alone)
+# e.g. getFrame(ModelTransform(position, forward, up, scale)), handy for rendering the same scene from a bunch of places
+def getFrame(camera=None):
+    global pendingFrame
+    global pendingSnapshot
+    global lastFrameTime
+
+    frameStart = time.perf_counter()
+
+    # (drawing needs everything warmup() is compiling anyways, and two threads both drawing with tiled rendering doesn't work)
+    if (pendingWarmup != None):
+        pendingWarmup.result()
+
+    snapshot = snapshot_scene(camera)
+
+    waitTime = 0
+    if (pg3d_rendering.renderConfig.pipelined):
+        # last time's frame has (hopefully) been drawn while the game was updating
+        waitStart = time.perf_counter()
+        if (pendingFrame != None):
+            pendingFrame.result()
+        waitTime = time.perf_counter() - waitStart
+
+        finishedFrame = pendingFrame
+        finishedSnapshot = pendingSnapshot
+
+        pendingFrame = renderThread.submit(render_snapshot, snapshot)
+        pendingSnapshot = snapshot
+
+        # nothing was being drawn yet, so this frame is waited for right away
+        if (finishedFrame == None):
+            finishedFrame = pendingFrame
+            finishedSnapshot = pendingSnapshot
+            finishedFrame.result()
+
+        frame = finishedFrame.result()
+    else:
+        frame = render_snapshot(snapshot)
+        finishedSnapshot = snapshot
+
+    now = time.perf_counter()
+
+    # the numbers are for the frame that's returned, not for the one that was just snapshotted
+    stats = finishedSnapshot.stats
+    stats["pipelined"] = pg3d_rendering.renderConfig.pipelined
+    # time waiting on the render thread (it should be close to 0 if the game's update takes longer than drawing)
+    stats["wait_ms"] = waitTime * 1000
+    # from the scene being snapshotted to the frame being returned, how far behind the game the screen is
+    stats["frame_latency_ms"] = (now - finishedSnapshot.startTime) * 1000
+    # time between getFrame() calls returning, including the game's update
+    stats["frame_interval_ms"] = 0 if lastFrameTime == None else (now - lastFrameTime) * 1000
+    lastFrameTime = now
+
+    if (startupStats["first_frame_ms"] == None):
+        startupStats["first_frame_ms"] = (now - frameStart) * 1000
+        startupStats["time_to_first_frame_ms"] = (now - initStartTime) * 1000
+
+    pg3d_rendering.frameStats = stats
+
+    if (finishedSnapshot.profile):
+        profiler.finish_frame(stats)
+
+    if (hud.enabled):
+        hud.draw(frame, stats)
 
-    elif (pg3d_rendering.renderConfig.backgroundMode == "solid color"):
-        frame[:,:] = skyColor * 255
-   
-    # draw the frame
-    for model in Model._registry:
-        if (model.shouldBeDrawn):
-            # this function will move the points so that they are centered around the camera
-            # basically, handling the camera position/rotation stuff
-            transform_points(model, model.points, cameraWorldTransform)
-            # this function will project the triangles onto the screen, and draw them
-            pg3d_rendering.draw_model(model, frame, model.points, model.triangles, cameraWorldTransform, light_dir, z_buffer,
-                        model.texture_uv, model.texture_map, model.texture, model.color, model.textureType)
-    
     return frame
 
+# the frame gets copied into this surface (at the render resolution), which is then scaled straight onto the display
+# it's kept around, making a new surface (twice) every frame was surprisingly slow
+renderSurface = None
+
 def drawScreen(frame):
-    # turn the frame into a surface
-    surf = pg.transform.scale(pg.surfarray.make_surface(frame),(pg3d_rendering.renderConfig.screenWidth_actual,pg3d_rendering.renderConfig.screenHeight_actual))
-    # blit that (draw it) onto the screen
-    pg.display.get_surface().blit(surf, (0,0))
+    if (headless):
+        return
+
+    if (profiler.enabled):
+        drawStart = time.perf_counter()
+        draw_screen(frame)
+        profiler.add_time("drawScreen", time.perf_counter() - drawStart)
+    else:
+        draw_screen(frame)
+
+def draw_screen(frame):
+    global renderSurface
+
+    display = pg.display.get_surface()
+    displaySize = (pg3d_rendering.renderConfig.screenWidth_actual, pg3d_rendering.renderConfig.screenHeight_actual)
+    frameSize = (len(frame), len(frame[0]))
+
+    # no scaling needed, the frame can go straight onto the screen
+    if (frameSize == displaySize and display.get_size() == displaySize):
+        pg.surfarray.blit_array(display, frame)
+        return
+
+    # same pixel format as the display, so scaling can write directly into it
+    if (renderSurface == None or renderSurface.get_size() != frameSize or renderSurface.get_bitsize() != display.get_bitsize()):
+        renderSurface = pg.Surface(frameSize, 0, display)
+
+    pg.surfarray.blit_array(renderSurface, frame)
+
+    if (display.get_size() == displaySize):
+        pg.transform.scale(renderSurface, displaySize, display)
+    else:
+        # the window isn't the size it was asked to be (fullscreen can do that), so just draw it in the corner like before
+        display.blit(pg.transform.scale(renderSurface, displaySize), (0,0))
     
 def update_display():
-    pg.display.update()
+    if (not headless):
+        pg.display.update()
 
 def quit():
+    # (a frame might still be being drawn)
+    if (renderThread != None):
+        renderThread.shutdown()
+    profiler.stop_export()
     pg.quit()
 
+# physics/particles normally move by however long the last frame actually took
+# with a fixed time step they move the same amount every frame, so the same frames always play out the same way (handy for benchmarks and recordings)
+# None goes back to the actual frame time
+def setFixedTimeStep(seconds):
+    global fixedTimeStep
+    fixedTimeStep = seconds
+
 def setGravity(a):
     global gravityCoefficient
     gravityCoefficient = a
@@ -781,21 +1338,19 @@ def resetCameraRotation():
     cameraLocalTransform.up = np.asarray([0.0,1.0,0.0])
     cameraLocalTransform.forward = np.asarray([0.0,0.0,1.0])
 
+# this also tints the skybox
 def setBackGroundColor(r,g,b):
     global skyColor
     skyColor = np.asarray([r/255,g/255,b/255])
 
-    for x in range(pg3d_rendering.renderConfig.screenWidth):
-        for y in range(pg3d_rendering.renderConfig.screenHeight * 3):
-            texColor = sky_texture[x,y]
-            sky_texture[x,y] = np.asarray([texColor[0] * skyColor[0], texColor[1] * skyColor[1], texColor[2] * skyColor[2]])
+    skybox.set_tint(r, g, b)
 
 # ********   OBJECT functions:     ********
 
 # ********   cube:     ********
 def spawnCube(name, x,y,z, tags):
     objName = nameModel(name)
-    newObj = Model(objName,'pg3d_assets/cube_no-net.obj', 'pg3d_assets/grid_16.png',tags, Color.WHITE)
+    newObj = Model(objName,assets.engine_asset('cube_no-net.obj'), assets.engine_asset('grid_16.png'),tags, Color.WHITE)
 
     newObj.set_local_position(x,y,z)
 
@@ -803,7 +1358,7 @@ def spawnCube(name, x,y,z, tags):
 
 def spawnScaledCube(name, x,y,z, scale_x,scale_y,scale_z, tags):
     objName = nameModel(name)
-    newObj = Model(objName,'pg3d_assets/cube.obj', 'pg3d_assets/grid_16.png',tags, Color.WHITE)
+    newObj = Model(objName,assets.engine_asset('cube.obj'), assets.engine_asset('grid_16.png'),tags, Color.WHITE)
 
     newObj.set_local_position(x,y,z)
     newObj.set_scale(scale_x,scale_y,scale_z)
@@ -812,7 +1367,7 @@ def spawnScaledCube(name, x,y,z, scale_x,scale_y,scale_z, tags):
 
 def spawnCubeWithTexture(name, x,y,z, scale_x,scale_y,scale_z, tags, texture_path):
     objName = nameModel(name)
-    newObj = Model(objName,'pg3d_assets/cube.obj', texture_path,tags, Color.WHITE)
+    newObj = Model(objName,assets.engine_asset('cube.obj'), texture_path,tags, Color.WHITE)
 
     newObj.set_local_position(x,y,z)
     newObj.set_scale(scale_x,scale_y,scale_z)
@@ -822,14 +1377,14 @@ def spawnCubeWithTexture(name, x,y,z, scale_x,scale_y,scale_z, tags, texture_pat
 # ********   plane:     ********
 def spawnPlane(name,x,y,z,tags):
     objName = nameModel(name)
-    newObj = Model(objName,'pg3d_assets/plane.obj', 'pg3d_assets/grid_16.png',tags, Color.WHITE)
+    newObj = Model(objName,assets.engine_asset('plane.obj'), assets.engine_asset('grid_16.png'),tags, Color.WHITE)
 
     newObj.set_local_position(x,y,z)
     return newObj
 
 def spawnScaledPlane(name,x,y,z,scale_x,scale_y,scale_z,tags):
     objName = nameModel(name)
-    newObj = Model(objName,'pg3d_assets/plane.obj', 'pg3d_assets/grid_16.png',tags, Color.WHITE)
+    newObj = Model(objName,assets.engine_asset('plane.obj'), assets.engine_asset('grid_16.png'),tags, Color.WHITE)
 
     newObj.set_local_position(x,y,z)
     newObj.set_scale(scale_x,scale_y,scale_z)
@@ -838,7 +1393,7 @@ def spawnScaledPlane(name,x,y,z,scale_x,scale_y,scale_z,tags):
 
 def spawnPlaneWithTexture(name, x,y,z, scale_x,scale_y,scale_z, tags, texture_path):
     objName = nameModel(name)
-    newObj = Model(objName,'pg3d_assets/plane.obj', texture_path,tags, Color.WHITE)
+    newObj = Model(objName,assets.engine_asset('plane.obj'), texture_path,tags, Color.WHITE)
 
     newObj.set_local_position(x,y,z)
     newObj.set_scale(scale_x,scale_y,scale_z)
@@ -848,7 +1403,7 @@ def spawnPlaneWithTexture(name, x,y,z, scale_x,scale_y,scale_z, tags, texture_pa
 # ********   sphere:     ********
 def spawnSphere(name,x,y,z,tags):
     objName = nameModel(name)
-    newObj = Model(objName,'pg3d_assets/sphere.obj', 'pg3d_assets/grid_16.png',tags, Color.WHITE)
+    newObj = Model(objName,assets.engine_asset('sphere.obj'), assets.engine_asset('grid_16.png'),tags, Color.WHITE)
 
     newObj.set_local_position(x,y,z)
 
@@ -856,7 +1411,7 @@ def spawnSphere(name,x,y,z,tags):
 
 def spawnScaledSphere(name,x,y,z, scale_x,scale_y,scale_z,tags):
     objName = nameModel(name)
-    newObj = Model(objName,'pg3d_assets/sphere.obj', 'pg3d_assets/grid_16.png',tags, Color.WHITE)
+    newObj = Model(objName,assets.engine_asset('sphere.obj'), assets.engine_asset('grid_16.png'),tags, Color.WHITE)
 
     newObj.set_local_position(x,y,z)
     newObj.set_scale(scale_x,scale_y,scale_z)
@@ -865,7 +1420,7 @@ def spawnScaledSphere(name,x,y,z, scale_x,scale_y,scale_z,tags):
 
 def spawnSphereWithTexture(name, x,y,z, scale_x,scale_y,scale_z, tags, texture_path):
     objName = nameModel(name)
-    newObj = Model(objName,'pg3d_assets/sphere.obj', texture_path,tags, Color.WHITE)
+    newObj = Model(objName,assets.engine_asset('sphere.obj'), texture_path,tags, Color.WHITE)
 
     newObj.set_local_position(x,y,z)
     newObj.set_scale(scale_x,scale_y,scale_z)
@@ -892,6 +1447,7 @@ def destroyObjectWithName(objectName):
     # not quite as simple as removing it from the registry, even though that's step 1
     objIndex = getObjectIndex(objectName)
     Model._registry.pop(objIndex)
+    obj.releaseAssets()
 
     # that's because some levels might still have a reference to the object
     for i in Level._registry:
@@ -916,6 +1472,7 @@ def destroyObject(obj):
     # not quite as simple as removing it from the registry, even though that's step 1
     objIndex = getObjectIndex(obj.name)
     Model._registry.pop(objIndex)
+    obj.releaseAssets()
 
     # that's because some levels might still have a reference to the object
     for i in Level._registry:
@@ -993,6 +1550,20 @@ def spawnObjectWithColor(objPath, name, x, y, z, tags, colorR, colorG, colorB):
 
     return newObj
 
+# lots of copies of one mesh, drawn in one go (see pg3d_instancing.py)
+# add the copies with add_instance()/add_instances() on what this returns
+def spawnInstancedObject(objPath, texturePath, name, tags):
+    return InstancedModel(name, objPath, texturePath, tags)
+
+def getInstancedObject(name):
+    for i in InstancedModel._registry:
+        if (i.name == name):
+            return i
+
+def destroyInstancedObject(instanced):
+    InstancedModel._registry.remove(instanced)
+    instanced.releaseAssets()
+
 def getObjectsWithTag(tag):
     toReturn = []
     for i in Model._registry:
@@ -1039,13 +1610,11 @@ def namesMatch(a,b):
 # ********  UI functions! (the annoying stuff)       ********
 
 def draw_image(frameArray, imgPath, xPos, yPos):
-    rawImg = pg.image.load(imgPath)
-
-    w = rawImg.get_width()
-    h = rawImg.get_height()
+    # (the image is only read from disk the first time)
+    tex = assets.load_texture(imgPath)
 
-    tex = np.zeros((w, h, 3)).astype('uint8')
-    pg.surfarray.surface_to_array(tex, rawImg)
+    w = len(tex)
+    h = len(tex[0])
 
     for i in range(w):
         for j in range(h):
@@ -1059,9 +1628,8 @@ def draw_rect(frameArray, xPos, yPos, xSize, ySize, color):
     minY = int(yPos-ySize/2)
     maxY = int(yPos+ySize/2)
     
-    for x in range(max(0,minX),min(pg3d_rendering.renderConfig.screenWidth-1,maxX)):
-        for y in range(max(0,minY),min(pg3d_rendering.renderConfig.screenHeight-1,maxY)):
-            frameArray[x,y] = color.astype('uint8')
+    # (one numpy fill instead of a python loop over every pixel)
+    frameArray[max(0,minX):min(pg3d_rendering.renderConfig.screenWidth-1,maxX), max(0,minY):min(pg3d_rendering.renderConfig.screenHeight-1,maxY)] = color.astype('uint8')
 
     return frameArray
 
@@ -1101,12 +1669,34 @@ def draw_circle(frameArray, xPos, yPos, radius, color):
 #         pg.display.get_surface().blit(letterImg, (xPos + xOffset,yPos))
 
 # this version messes with the frame array directly
-# is it slow? yeah, but it can handle colors
+# it used to load every letter from disk every time, now the letters (and whole strings) are kept around as masks, see text_mask()
 def draw_text(frameArray, text_string, xPos, yPos, color, scale, spacing):
-    xOffset = 0
+    mask = text_mask(text_string, scale, spacing)
+
+    # only the part that's on the screen
+    x = int(xPos)
+    y = int(yPos)
+    minX = max(x, 0)
+    minY = max(y, 0)
+    maxX = min(x + len(mask), len(frameArray))
+    maxY = min(y + len(mask[0]), len(frameArray[0]))
+    if (minX >= maxX or minY >= maxY):
+        return frameArray
+
+    frameArray[minX:maxX, minY:maxY][mask[minX - x:maxX - x, minY - y:maxY - y]] = color
+
+    return frameArray
+
+# (character, scale) -> where the letter's pixels are (True where it's drawn), read from disk the first time
+glyphCache = {}
+# (text, scale, spacing) -> the same thing for a whole string, so text that stays the same doesn't have to be put together every frame
+textCache = {}
 
-    for k in text_string:
-        rawImg = pg.image.load("pg3d_assets/font/" + get_character_file_name(k) + ".png")
+def get_glyph(character, scale):
+    key = (character, scale)
+
+    if (key not in glyphCache):
+        rawImg = pg.image.load(assets.engine_asset("font/" + get_character_file_name(character) + ".png"))
 
         w = rawImg.get_width()
         h = rawImg.get_height()
@@ -1116,14 +1706,39 @@ def draw_text(frameArray, text_string, xPos, yPos, color, scale, spacing):
         # copying the data from the text file to the array
         pg.surfarray.surface_to_array(text_texture, pg.transform.scale(rawImg, (w * scale, h * scale)))
 
-        for i in range(int(w*scale)):
-            for j in range(int(h*scale)):
-                if (text_texture[int(i/scale),int(j/scale)][0] > 0):
-                    frameArray[int(xPos) + int(xOffset) + i, int(yPos) + j] = color
-        
-        xOffset += w * scale + spacing
+        # (picking the pixels the same way the old per-pixel loop did)
+        i = np.arange(w * scale) // scale
+        j = np.arange(h * scale) // scale
+        glyphCache[key] = text_texture[i[:,None], j[None,:], 0] > 0
 
-    return frameArray
+    return glyphCache[key]
+
+def text_mask(text_string, scale, spacing):
+    key = (text_string, scale, spacing)
+
+    if (key not in textCache):
+        glyphs = [get_glyph(k, scale) for k in text_string]
+
+        width = 0
+        height = 0
+        xOffset = 0
+        for glyph in glyphs:
+            width = max(width, xOffset + len(glyph))
+            height = max(height, len(glyph[0]))
+            xOffset += len(glyph) + spacing
+
+        mask = np.zeros((width, height), dtype=np.bool_)
+        xOffset = 0
+        for glyph in glyphs:
+            mask[xOffset:xOffset + len(glyph), 0:len(glyph[0])] |= glyph
+            xOffset += len(glyph) + spacing
+
+        # text that changes every frame (like a timer) would fill this up forever, so it just starts over once in a while
+        if (len(textCache) > 512):
+            textCache.clear()
+        textCache[key] = mask
+
+    return textCache[key]
 
 def get_character_file_name(character):
     if (character == "1" or character == "2" or character == "3" or character == "4" or character == "5" or character == "6" or character == "7" or character == "8" or character == "9" or character == "0"):
@@ -1152,6 +1767,8 @@ def get_character_file_name(character):
         return "space"
     elif (character == "."):
         return "period"
+    elif (character == "%"):
+        return "percent"
     # no slash characters for now
     else:
         return character + "_l"
@@ -1159,57 +1776,41 @@ def get_character_file_name(character):
 # ********  drawing functions! (the annoying stuff)       ********  
 
 # this function will move the points so that they are centered around the camera
-def transform_points(mesh, points, cameraTransform):
-    # first, go through the points to figure out where the point is in world space
-    # (using the mesh's transforms)
-    for i in points:
-        j = mesh.transform_point(i)
-
-        i[3] = j[3]
-        i[4] = j[4]
-        i[5] = j[5]
-
-    # the rest of this function turns the world=relative points into camera-relative points
-
-    # translate to have camera as origin
-    points[:,3] -= cameraTransform.position[0]
-    points[:,4] -= cameraTransform.position[1]
-    points[:,5] -= cameraTransform.position[2]
-
-    camZ = cameraTransform.forward
-    forwardVectorAxis = m.normalize_3d(m.cross_3d(camZ,np.asarray([0.0,0.0,1.0])))
-    forwardVectorAngle = m.angle_3d(np.asarray([0.0,0.0,1.0]),camZ)
-
-    if (forwardVectorAngle > 0):
-        for i in points:
-            j = m.rotate_point_3d(i, forwardVectorAxis, forwardVectorAngle)
-            i[3] = j[3]
-            i[4] = j[4]
-            i[5] = j[5]
-    else:
-        forwardVectorAxis = camZ
+# matrix comes from model_view_matrix()
+# config is the renderConfig the frame was started with
+def transform_points(points, matrix, config):
+    # transforming + projecting every point happens in one compiled call
+    # the projected points are stored in indices 6,7,8 so as to not overwrite the other sets of points
+    pg3d_rendering.transform_vertices(points, matrix, config.screenWidth, config.screenHeight, config.hor_fov_adjust, config.ver_fov_adjust)
 
-    upVectorAxis = m.normalize_3d(m.cross_3d(m.rotate_vector_3d(cameraTransform.up,forwardVectorAxis,forwardVectorAngle),np.asarray([0.0,1.0,0.0])))
-    upVectorAngle = m.angle_3d(np.asarray([0.0,1.0,0.0]), m.rotate_vector_3d(cameraTransform.up,forwardVectorAxis,forwardVectorAngle))
+    # there's no need to return anything here, because we're just modifying the array we were given
 
-    if (upVectorAngle > 0):
-        for i in points:
-            j = m.rotate_point_3d(i, upVectorAxis, upVectorAngle)
-            i[3] = j[3]
-            i[4] = j[4]
-            i[5] = j[5]
+# one matrix that goes from the mesh file's coordinates straight to camera-relative ones
+# (first the mesh's transforms, then the camera's, viewMatrix comes from camera_view_matrix())
+def model_view_matrix(mesh, viewMatrix):
+    worldMatrix = mesh.world_matrix()
 
-    # this will be used for projection
-    hor_fov_adjust = 0.5*pg3d_rendering.renderConfig.screenWidth/ np.tan(pg3d_rendering.renderConfig.horizontalFOV * 0.5) 
-    ver_fov_adjust = 0.5*pg3d_rendering.renderConfig.screenHeight/ np.tan(pg3d_rendering.renderConfig.verticalFOV * 0.5)
-    
-    # the projected points are stored in indices 6,7,8 so as to not overwrite the other sets of points
-    points[:,6] = (-hor_fov_adjust*points[:,3]/np.abs(points[:,5]) + 0.5*pg3d_rendering.renderConfig.screenWidth).astype(np.int32)
-    points[:,7] = (-ver_fov_adjust*points[:,4]/np.abs(points[:,5]) + 0.5*pg3d_rendering.renderConfig.screenHeight).astype(np.int32)
-    points[:,8] = points[:,5]
+    matrix = np.zeros((3,4))
+    matrix[:,0:3] = viewMatrix[:,0:3] @ worldMatrix[:,0:3]
+    matrix[:,3] = viewMatrix[:,0:3] @ worldMatrix[:,3] + viewMatrix[:,3]
+
+    return matrix
+
+# whether a model is (at least partly) inside of the camera's view
+def is_model_visible(mesh, matrix):
+    return pg3d_rendering.mesh_in_frustum(matrix, mesh.boundsCenter, mesh.boundsRadius, mesh.boundsMin, mesh.boundsMax, np.tan(pg3d_rendering.renderConfig.horizontalFOV * 0.5), np.tan(pg3d_rendering.renderConfig.verticalFOV * 0.5))
+
+# the matrix that turns world-space points into camera-relative ones (3x4, rotation and then the translation column)
+def camera_view_matrix(cameraTransform):
+    rotation = m.camera_rotation_matrix_3d(cameraTransform.forward, cameraTransform.up)
+
+    matrix = np.zeros((3,4))
+    matrix[:,0:3] = rotation
+    # translate to have camera as origin, then rotate
+    matrix[:,3] = -(rotation @ cameraTransform.position)
+
+    return matrix
 
-    # there's no need to return anything here, because we're just modifying the array we were given
-    
 # drawing the box that represents a collider (or trigger)
 # triggers are drawn in RED, colliders in GREEN, for now
 # z-buffering is not used here because draw_triangle() is called with the wireframe mode
@@ -1263,7 +1864,7 @@ def rotate_camera(axis,angle):
     cameraLocalTransform.up[2] = upNew[2]
 
 # ********  string helpers:       ********
-@njit()
+@njit(cache=True)
 def getFirstIndex(string, char):
     
     for i in range(len(string)):
@@ -1333,6 +1934,13 @@ def createLevelWithobjects(levelName, objectNames):
     # return a value so you can store the level class in a script
     return getLevel(levelName)
 
+# same as above, but every object in the level is made static (see Level.makeStatic())
+def createStaticLevelWithObjects(levelName, objectNames):
+    level = createLevelWithobjects(levelName, objectNames)
+    level.makeStatic()
+
+    return level
+
 # grab a level class using the name
 def getLevel(levelName):
     for i in Level._registry:
@@ -1498,6 +2106,12 @@ class Level:
         if (not m.array_has_item(self.objectNames, objName)):
             self.objectNames.append(objName)
 
+    # gives every object in the level the "static" tag, so they get batched together (see pg3d_batching.py)
+    # only do this for levels where nothing moves!
+    def makeStatic(self):
+        for i in self.objectNames:
+            getObject(i).add_tag("static")
+
 # more helpers
 class Rotation:
     DEG_TO_RAD = np.pi / 180
@@ -0,0 +1,291 @@
+import os
+import stat
+import tempfile
+import numpy as np
+import pygame as pg
+from . import pg3d_utils as utils
+
+# shared copies of things loaded from disk, so that spawning the same model 100 times doesn't read the same file 100 times
+
+# the engine's own files (the default cube/plane/sphere, the font, the skybox) are in the pg3d_assets folder next to pg3d_scripts
+# they're found from here instead of from the folder the game was started in, so the engine works no matter where it's run from
+engineAssetFolder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pg3d_assets")
+
+def engine_asset(name):
+    return os.path.join(engineAssetFolder, name)
+
+# ********  MESHES:  ********
+
+# a mesh file, as read by utils.read_obj()
+# ALL of these arrays are shared between every model using the mesh, so they're read-only
+# models copy the points though, since the camera-relative/projected parts get written to every frame
+class MeshAsset:
+    def __init__(self, path, points, triangles, texture_uv, texture_map):
+        self.path = path
+
+        self.points = points
+        self.triangles = triangles
+        self.texture_uv = texture_uv
+        self.texture_map = texture_map
+
+        # the bounding sphere/box of the mesh, for frustum culling
+        self.boundsCenter, self.boundsRadius, self.boundsMin, self.boundsMax = utils.mesh_bounds(self.points)
+
+        for i in (self.points, self.triangles, self.texture_uv, self.texture_map, self.boundsCenter, self.boundsMin, self.boundsMax):
+            i.flags.writeable = False
+
+# path -> MeshAsset
+meshRegistry = {}
+
+# the same file can be written different ways ("a/b.obj", "./a/b.obj", ...), so it's stored under its full path
+def asset_key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+# reads the mesh the first time, and hands out the same one after that
+def load_mesh(path):
+    key = asset_key(path)
+
+    if (key not in meshRegistry):
+        if (compiledMeshes):
+            points, triangles, texture_uv, texture_map = load_compiled_mesh(path)
+        else:
+            points, triangles, texture_uv, texture_map = read_mesh(path)
+        meshRegistry[key] = MeshAsset(path, points, triangles, texture_uv, texture_map)
+
+    return meshRegistry[key]
+
+# merging duplicate vertices and reordering the triangles so they're cheaper to draw (see utils.optimize_mesh())
+# turned off by disableMeshOptimization() in the engine
+optimizeMeshes = True
+
+# reads an obj file (and optimizes it, if that's on)
+def read_mesh(path):
+    arrays = utils.read_obj(path)
+    if (optimizeMeshes):
+        arrays = utils.optimize_mesh(*arrays)
+    return arrays
+
+# forgets a mesh, so the next model that uses it reads the file again (e.g. if it changed)
+# models that already use it keep their copy
+def evict_mesh(path):
+    meshRegistry.pop(asset_key(path), None)
+
+def clear_meshes():
+    meshRegistry.clear()
+
+# ********  COMPILED MESHES:  ********
+
+# reading an obj file means parsing text, which gets slow for big meshes
+# so the first time a mesh is read, the arrays are also saved next to it in a binary file (model.obj -> model.obj.pg3dmesh)
+# after that the binary file is memory-mapped instead, there's nothing to parse
+
+# the file is a header, then the four arrays (points, triangles, texture_uv, texture_map), each starting at a multiple of 64 bytes
+# header (all little-endian int64s after the magic):
+#   magic (8 bytes), version, source file size, source file modification time (ns), flags (1 = optimized),
+#   then for each array: offset, rows, columns (-1 for 1d arrays)
+# the arrays themselves are float64 (points, texture_uv) or int64 (triangles, texture_map)
+
+# turned off by disableCompiledMeshes() in the engine
+compiledMeshes = True
+
+compiledMeshExtension = ".pg3dmesh"
+compiledMeshMagic = b"PG3DMESH"
+# (bump this whenever read_obj() changes what it returns, so old files get recompiled)
+compiledMeshVersion = 5
+compiledMeshAlignment = 64
+compiledMeshHeaderSize = 8 + 8 * (4 + 4 * 3)
+
+compiledMeshDtypes = (np.dtype("<f8"), np.dtype("<i8"), np.dtype("<f8"), np.dtype("<i8"))
+
+# (meshes compiled with optimization on aren't used with it off, and the other way around)
+def compiled_mesh_flags():
+    if (optimizeMeshes):
+        return 1
+    return 0
+
+def compiled_mesh_path(path):
+    return path + compiledMeshExtension
+
+# loads the compiled version of a mesh, (re)compiling it first if it's missing or the obj changed since
+def load_compiled_mesh(path):
+    source = os.stat(path)
+    compiledPath = compiled_mesh_path(path)
+
+    arrays = read_compiled_mesh(compiledPath, source.st_size, source.st_mtime_ns)
+    if (arrays != None):
+        return arrays
+
+    arrays = read_mesh(path)
+
+    # not being able to save it (read-only folder, etc.) just means it gets parsed again next time
+    try:
+        write_compiled_mesh(compiledPath, arrays, source.st_size, source.st_mtime_ns, stat.S_IMODE(source.st_mode))
+    except OSError:
+        pass
+
+    return arrays
+
+def write_compiled_mesh(compiledPath, arrays, sourceSize, sourceTime, sourceMode):
+    header = np.zeros(4 + 4 * 3, dtype="<i8")
+    header[0] = compiledMeshVersion
+    header[1] = sourceSize
+    header[2] = sourceTime
+    header[3] = compiled_mesh_flags()
+
+    offset = compiledMeshHeaderSize
+    data = []
+    for i in range(4):
+        array = np.ascontiguousarray(arrays[i], dtype=compiledMeshDtypes[i])
+
+        offset += (-offset) % compiledMeshAlignment
+        header[4 + i * 3] = offset
+        header[5 + i * 3] = array.shape[0]
+        header[6 + i * 3] = array.shape[1] if array.ndim == 2 else -1
+
+        data.append((offset, array))
+        offset += array.nbytes
+
+    # written to a temporary file first, so a half-written file is never picked up by another run
+    # (every write gets its own one, two games loading the same obj at the same time would write over each other's otherwise)
+    handle, tempPath = tempfile.mkstemp(prefix=os.path.basename(compiledPath) + ".", suffix=".tmp", dir=os.path.dirname(compiledPath) or ".")
+    try:
+        with os.fdopen(handle, "wb") as f:
+            f.write(compiledMeshMagic)
+            f.write(header.tobytes())
+            for i in data:
+                f.write(bytes(i[0] - f.tell()))
+                f.write(i[1].tobytes())
+        # mkstemp() makes files only the owner can read, this one should be as readable as the obj it came from
+        os.chmod(tempPath, sourceMode)
+        os.replace(tempPath, compiledPath)
+    except BaseException:
+        # (not leaving a broken temporary file lying around next to the obj)
+        try:
+            os.remove(tempPath)
+        except OSError:
+            pass
+        raise
+
+# returns the four arrays, or None if the file is missing, broken, or was made from a different version of the obj
+def read_compiled_mesh(compiledPath, sourceSize, sourceTime):
+    try:
+        fileSize = os.path.getsize(compiledPath)
+        if (fileSize < compiledMeshHeaderSize):
+            return None
+
+        with open(compiledPath, "rb") as f:
+            if (f.read(len(compiledMeshMagic)) != compiledMeshMagic):
+                return None
+            header = np.frombuffer(f.read(compiledMeshHeaderSize - len(compiledMeshMagic)), dtype="<i8")
+    except OSError:
+        return None
+
+    if (header[0] != compiledMeshVersion or header[1] != sourceSize or header[2] != sourceTime or header[3] != compiled_mesh_flags()):
+        return None
+
+    arrays = []
+    for i in range(4):
+        offset = int(header[4 + i * 3])
+        shape = (int(header[5 + i * 3]),)
+        if (header[6 + i * 3] != -1):
+            shape = (int(header[5 + i * 3]), int(header[6 + i * 3]))
+
+        size = int(np.prod(shape)) * compiledMeshDtypes[i].itemsize
+        if (offset + size > fileSize):
+            return None
+
+        if (size == 0):
+            arrays.append(np.zeros(shape, dtype=compiledMeshDtypes[i]))
+        else:
+            # (np.asarray turns the memmap into a normal array that still reads from the file, numba doesn't take memmaps)
+            arrays.append(np.asarray(np.memmap(compiledPath, dtype=compiledMeshDtypes[i], mode="r", offset=offset, shape=shape)))
+
+    return tuple(arrays)
+
+# ********  TEXTURES:  ********
+
+# a texture file, as an array of colors (the same thing pg.surfarray.array3d() gives)
+# like meshes, the array is shared and read-only
+class TextureAsset:
+    def __init__(self, path, pixels):
+        self.path = path
+        self.pixels = pixels
+        self.pixels.flags.writeable = False
+
+        # how many models are using it right now, it won't be thrown out while this is above 0
+        self.refCount = 0
+
+# path -> TextureAsset, the least recently used one is first
+textureRegistry = {}
+
+# textures nothing is using are kept around until they take up more than this many bytes (then the oldest ones go first)
+textureBudget = 64 * 1024 * 1024
+
+textureStats = {"hits": 0, "misses": 0, "bytes_resident": 0}
+
+def get_texture_asset(path):
+    key = asset_key(path)
+
+    if (key in textureRegistry):
+        textureStats["hits"] += 1
+        # moving it to the end, so it's the last one to be thrown out
+        asset = textureRegistry.pop(key)
+        textureRegistry[key] = asset
+        return asset
+
+    textureStats["misses"] += 1
+    asset = TextureAsset(path, pg.surfarray.array3d(pg.image.load(path)))
+    textureRegistry[key] = asset
+    textureStats["bytes_resident"] += asset.pixels.nbytes
+
+    trim_textures()
+
+    return asset
+
+# for one-off uses (ui images, the skybox), doesn't keep the texture from being thrown out later
+def load_texture(path):
+    return get_texture_asset(path).pixels
+
+# for models, the texture stays loaded until release_texture() is called with the same path
+def acquire_texture(path):
+    asset = get_texture_asset(path)
+    asset.refCount += 1
+    return asset.pixels
+
+def release_texture(path):
+    key = asset_key(path)
+
+    if (key in textureRegistry):
+        asset = textureRegistry[key]
+        asset.refCount = max(asset.refCount - 1, 0)
+
+    trim_textures()
+
+# throwing out unused textures (oldest first) until they fit in the budget
+def trim_textures():
+    for key in list(textureRegistry.keys()):
+        if (textureStats["bytes_resident"] <= textureBudget):
+            break
+
+        asset = textureRegistry[key]
+        if (asset.refCount == 0):
+            del textureRegistry[key]
+            textureStats["bytes_resident"] -= asset.pixels.nbytes
+
+def set_texture_budget(budget):
+    global textureBudget
+    textureBudget = budget
+    trim_textures()
+
+# throws out every texture nothing is using
+def clear_textures():
+    for key in list(textureRegistry.keys()):
+        asset = textureRegistry[key]
+        if (asset.refCount == 0):
+            del textureRegistry[key]
+            textureStats["bytes_resident"] -= asset.pixels.nbytes
+
+def get_texture_stats():
+    stats = dict(textureStats)
+    stats["textures_resident"] = len(textureRegistry)
+    return stats
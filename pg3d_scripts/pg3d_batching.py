@@ -0,0 +1,94 @@
+import numpy as np
+from . import pg3d_utils as utils
+
+# static batching: merging models that never move into a few big meshes
+
+# every model normally costs a trip through python every frame (matrices, culling, transforming, drawing),
+# and all of its points get run through its world transform again, even if it hasn't moved since it was spawned
+# models with the "static" tag are instead baked into world space once, and every static model with the same texture ends up in one batch
+# each batch then only needs the camera's transform every frame (see getFrame() in pg3d.py)
+
+# the batches are rebuilt whenever the set of static models changes: one is added/destroyed/shown/hidden, gets a new texture,
+# or moves anyways (static models CAN still move, it's just slow because it rebuilds every batch)
+
+# one merged mesh, laid out exactly like a model's so it can go through the same drawing code
+class StaticBatch:
+    def __init__(self, models):
+        self.modelCount = len(models)
+
+        self.texture = models[0].texture
+        self.textureType = models[0].textureType
+
+        pointList = []
+        triangleList = []
+        uvList = []
+        mapList = []
+        pointOffset = 0
+        uvOffset = 0
+
+        for model in models:
+            # into world space, once
+            matrix = model.world_matrix()
+            points = np.ones((len(model.points), 9))
+            points[:,0:3] = model.meshAsset.points[:,0:3] @ matrix[:,0:3].T + matrix[:,3]
+
+            pointList.append(points)
+            triangleList.append(model.triangles + pointOffset)
+            uvList.append(model.texture_uv)
+            mapList.append(model.texture_map + uvOffset)
+
+            pointOffset += len(model.points)
+            uvOffset += len(model.texture_uv)
+
+        self.points = np.concatenate(pointList)
+        self.triangles = np.concatenate(triangleList)
+        self.texture_uv = np.concatenate(uvList)
+        self.texture_map = np.concatenate(mapList)
+
+        # the whole batch is culled as one thing, so a batch spread across the level is almost always drawn
+        self.boundsCenter, self.boundsRadius, self.boundsMin, self.boundsMax = utils.mesh_bounds(self.points)
+
+# the current batches, and what they were built from (see static_signature())
+staticBatches = []
+staticSignature = None
+
+# turned off by disableStaticBatching() in the engine, static models are then drawn like any other model
+staticBatching = True
+
+def is_batchable(model):
+    # meshes without uv coords can't share the uv arrays with other meshes
+    # and models with levels of detail change meshes depending on the camera, so they're left out too
+    return model.hasTag("static") and model.lods == None and len(model.texture_map) == len(model.triangles)
+
+# everything about the static models that would change the batches
+# if this is the same as last frame, the batches are still good
+# (models go by serial and not id(), a model spawned after one was destroyed can get the old one's id() and look exactly the same)
+def static_signature(models):
+    return tuple((i.serial, i.shouldBeDrawn, i.transformVersion, i.texturePath, i.textureType, id(i.meshAsset)) for i in models)
+
+# the batches for this set of static models, rebuilt if anything about them changed
+def get_static_batches(models):
+    global staticBatches
+    global staticSignature
+
+    signature = static_signature(models)
+    if (signature == staticSignature):
+        return staticBatches
+
+    # models with the same texture (and texture type) go in the same batch, hidden models don't go in at all
+    groups = {}
+    for i in models:
+        if (i.shouldBeDrawn):
+            groups.setdefault((i.texturePath, i.textureType), []).append(i)
+
+    staticBatches = [StaticBatch(i) for i in groups.values()]
+    staticSignature = signature
+
+    return staticBatches
+
+def clear_static_batches():
+    global staticBatches
+    global staticSignature
+
+    staticBatches = []
+    staticSignature = None
@@ -0,0 +1,243 @@
+import time
+import numpy as np
+from numba import njit
+from . import pg3d as engine
+from . import pg3d_profiler as profiler
+
+# the performance overlay, drawn in the top left corner of the frame getFrame() returns (see togglePerformanceOverlay() in pg3d.py)
+# it shows:
+#   fps             going by the last second or so of frames
+#   1% low          the frame time that 1% of the last 600 frames were slower than (so a stall stays up there for a while)
+#   a graph         the time of every frame, newest on the right, with a line at the frame budget
+#                   green is under the budget, yellow is under twice the budget, red is over that (stalls, like loading a texture)
+#   stage bars      how long each part of the last frame took (see pg3d_profiler.py), including the overlay itself
+
+# it has to be cheap, or it'd be measuring itself:
+#   the text only changes a few times a second, so it's drawn (with draw_text()) once and kept as a list of pixels until then
+#   and putting those pixels on the frame, the graph, and the bars are all done in compiled calls
+#   nothing is drawn behind the text (that's a lot of pixels), it gets a black shadow instead so it can be read on top of anything
+
+enabled = False
+# turning the overlay on turns the profiler on (the stage bars need it), and turning it off only turns it back off if it wasn't on before
+enabledProfiler = False
+
+# frame times (ms) from one getFrame() to the next, the last 600 of them going around in a circle
+# frameCount is how many there have been in total, so the newest one is at (frameCount - 1) % 600
+frameTimes = np.zeros(600)
+frameCount = 0
+
+# the frame budget (a line on the graph), and how many ms the full height of the graph (and the full length of a bar) is
+budgetMs = 1000 / 60
+graphMs = 50.0
+
+# how often the numbers get rewritten (a number that changes every frame can't be read anyway)
+textInterval = 0.5
+lastTextTime = None
+# the text drawn at the last update (see update_text()): where each pixel goes (relative to the corner of the overlay) and its color
+textPixels = np.zeros((0, 2), dtype=np.int64)
+textColors = np.zeros((0, 3), dtype=np.uint8)
+textSize = None
+
+# how long drawing the overlay took last frame
+overlayMs = 0.0
+
+# (name, key in the frame stats, color)
+stages = (
+    ("update", "update_ms", np.asarray([80, 160, 255]).astype('uint8')),
+    ("snapshot", "snapshot_ms", np.asarray([255, 200, 60]).astype('uint8')),
+    ("render", "render_ms", np.asarray([90, 220, 90]).astype('uint8')),
+    ("wait", "wait_ms", np.asarray([200, 200, 200]).astype('uint8')),
+    ("screen", "drawScreen_ms", np.asarray([220, 110, 255]).astype('uint8')),
+    ("overlay", "overlay_ms", np.asarray([255, 90, 90]).astype('uint8')),
+)
+
+textColor = np.asarray([255, 255, 255]).astype('uint8')
+stageColors = np.asarray([color for name, key, color in stages])
+
+def enable():
+    global enabled
+    global enabledProfiler
+
+    if (not profiler.enabled):
+        profiler.enable(profiler.frames.maxlen)
+        enabledProfiler = True
+    enabled = True
+
+def disable():
+    global enabled
+    global enabledProfiler
+
+    if (enabledProfiler):
+        profiler.disable()
+        enabledProfiler = False
+    enabled = False
+
+# called by getFrame() with the frame it's about to return
+def draw(frame, stats):
+    global overlayMs
+    global frameCount
+
+    start = time.perf_counter()
+
+    if (stats["frame_interval_ms"] > 0):
+        frameTimes[frameCount % len(frameTimes)] = stats["frame_interval_ms"]
+        frameCount += 1
+
+    # the numbers for the stages, the profiler's frame has update() and drawScreen() too
+    frameStats = profiler.frames[-1] if (profiler.enabled and len(profiler.frames) > 0) else stats
+    times = [frameStats.get(key, 0) for name, key, color in stages[:-1]]
+    times.append(overlayMs)
+
+    draw_overlay(frame, times)
+
+    overlayMs = (time.perf_counter() - start) * 1000
+
+lineHeight = 10
+labelWidth = 80
+graphHeight = 24
+barHeight = 4
+
+def draw_overlay(frame, times):
+    width = len(frame)
+    height = len(frame[0])
+
+    panelWidth = min(176, width - 4)
+    panelHeight = 2 * lineHeight + graphHeight + 4 + len(stages) * lineHeight
+    # (too small to show anything useful)
+    if (panelWidth < labelWidth + 16 or panelHeight > height - 4):
+        return
+
+    update_text(times, panelWidth, panelHeight)
+
+    # (the bars change every frame so stalls show up right away, only the numbers next to them wait for the text)
+    draw_panel(frame, 2, 2, panelWidth, textPixels, textColors, frameTimes, frameCount, np.asarray(times), stageColors, graphMs, budgetMs)
+
+def update_text(times, panelWidth, panelHeight):
+    global lastTextTime
+    global textPixels
+    global textColors
+    global textSize
+
+    now = time.perf_counter()
+    if (textSize == (panelWidth, panelHeight) and now - lastTextTime < textInterval):
+        return
+    lastTextTime = now
+    textSize = (panelWidth, panelHeight)
+
+    count = min(frameCount, len(frameTimes))
+    if (count == 0):
+        lines = [("fps -", textColor), ("1% low -", textColor)]
+    else:
+        recent = frameTimes[np.arange(frameCount - min(count, 60), frameCount) % len(frameTimes)]
+        lines = [("fps " + str(round(1000 / recent.mean(), 1)), textColor), ("1% low " + str(round(float(np.percentile(frameTimes[:count], 99)), 1)) + " ms", textColor)]
+    for i in range(len(stages)):
+        name, key, color = stages[i]
+        lines.append((name + " " + str(round(times[i], 1)), color))
+
+    pixels = []
+    colors = []
+    y = 1
+    for i in range(len(lines)):
+        # (the graph goes between the fps lines and the stages)
+        if (i == 2):
+            y += graphHeight + 4
+
+        line, color = lines[i]
+        text, shadow = line_pixels(line)
+        pixels += [shadow + (2, y), text + (2, y)]
+        colors += [np.zeros((len(shadow), 3), dtype=np.uint8), np.tile(color, (len(text), 1))]
+        y += lineHeight
+
+    # (anything that doesn't fit in the overlay is cut off)
+    pixels = np.concatenate(pixels)
+    inside = (pixels[:, 0] < panelWidth) & (pixels[:, 1] < panelHeight)
+    textPixels = pixels[inside]
+    textColors = np.concatenate(colors)[inside]
+
+# line of text -> where its pixels are, and where its shadow's pixels are (the text moved one pixel down and right)
+# the text is put together from the same cached letters draw_text() uses (see text_mask() in pg3d.py)
+# and a lot of lines come back (a stage that takes 0.0 ms, the same fps...), so they're kept too
+lineCache = {}
+
+def line_pixels(line):
+    if (line not in lineCache):
+        mask = engine.text_mask(line, 1, 1)
+
+        text = np.zeros((len(mask) + 1, len(mask[0]) + 1), dtype=np.bool_)
+        text[:-1, :-1] = mask
+        shadow = np.zeros_like(text)
+        shadow[1:, 1:] = mask
+        shadow &= ~text
+
+        if (len(lineCache) > 256):
+            lineCache.clear()
+        lineCache[line] = (np.argwhere(text), np.argwhere(shadow))
+
+    return lineCache[line]
+
+# everything that gets drawn every frame, in one compiled call
+@njit(cache=True)
+def draw_panel(frame, x, y, panelWidth, textPixels, textColors, frameTimes, frameCount, times, stageColors, graphMs, budgetMs):
+    draw_pixels(frame, x, y, textPixels, textColors)
+    draw_graph(frame, x + 2, y + 2 * lineHeight, panelWidth - 4, graphHeight, frameTimes, frameCount, graphMs, budgetMs)
+    draw_bars(frame, x + labelWidth, y + 2 * lineHeight + graphHeight + 4 + 3, lineHeight, barHeight, times, graphMs, panelWidth - labelWidth - 4, stageColors)
+
+@njit(cache=True)
+def draw_pixels(frame, x, y, pixels, colors):
+    for k in range(len(pixels)):
+        for c in range(3):
+            frame[x + pixels[k, 0], y + pixels[k, 1], c] = colors[k, c]
+
+# one bar per stage, spacing pixels apart (going down), each one times[k] / maxMs of width long
+@njit(cache=True)
+def draw_bars(frame, x, y, spacing, height, times, maxMs, width, colors):
+    for k in range(len(times)):
+        length = int(min(times[k] / maxMs, 1.0) * width)
+        for i in range(length):
+            for j in range(height):
+                for c in range(3):
+                    frame[x + i, y + k * spacing + j, c] = colors[k, c]
+
+# the frame time graph, one column per frame (the newest on the right)
+# a column's height is its time out of maxMs, anything over that is a full height column
+# times is the circle of frame times (see frameTimes above)
+@njit(cache=True)
+def draw_graph(frame, x, y, width, height, times, count, maxMs, budgetMs):
+    # darkening what's behind it, so it stands out from the scene
+    for i in range(width):
+        for j in range(height):
+            for c in range(3):
+                frame[x + i, y + j, c] = frame[x + i, y + j, c] // 2
+
+    for i in range(width):
+        k = count - width + i
+        if (k < 0 or k < count - len(times)):
+            continue
+
+        t = times[k % len(times)]
+        h = min(height, int(t / maxMs * height + 0.5))
+
+        r, g, b = 60, 220, 60
+        if (t > 2 * budgetMs):
+            r, g, b = 255, 60, 60
+        elif (t > budgetMs):
+            r, g, b = 255, 220, 60
+
+        for j in range(height - h, height):
+            frame[x + i, y + j, 0] = r
+            frame[x + i, y + j, 1] = g
+            frame[x + i, y + j, 2] = b
+
+    # the budget line, dotted so the columns can still be seen through it
+    budgetY = y + height - int(budgetMs / maxMs * height + 0.5)
+    if (budgetY >= y):
+        for i in range(0, width, 2):
+            frame[x + i, budgetY, 0] = 255
+            frame[x + i, budgetY, 1] = 255
+            frame[x + i, budgetY, 2] = 255
+
+    # the bottom of the graph
+    for i in range(width):
+        frame[x + i, y + height - 1, 0] = 128
+        frame[x + i, y + height - 1, 1] = 128
+        frame[x + i, y + height - 1, 2] = 128
@@ -0,0 +1,194 @@
+import numpy as np
+from . import pg3d_math as m
+from . import pg3d_assets as assets
+
+# lots of copies of the same mesh (trees, rocks, grass, coins...), drawn all at once
+
+# a normal Model has its own copy of the points array and its own transform, and gets drawn with its own python calls
+# for 500 trees that's 500 copies of the tree's points and 500 trips through python every frame
+# an InstancedModel has the mesh once, plus one row per instance in a few arrays (position, forward, up, scale, color),
+# and every instance gets transformed and drawn in one compiled call (see render_instances() in pg3d_rendering.py)
+
+# instances are NOT models! they don't have names, tags, physics, colliders or parents
+# they're just places where the mesh gets drawn, so they're meant for scenery
+class InstancedModel:
+    # separate registry, like particle managers
+    _registry = []
+
+    def __init__(self, name, path_obj, path_texture, tags):
+        self.name = name
+        self.tags = tags
+
+        self._registry.append(self)
+
+        # the mesh is shared with every model using the same file (see pg3d_assets.py)
+        self.meshAsset = assets.load_mesh(path_obj)
+        self.triangles = self.meshAsset.triangles
+        self.texture_uv = self.meshAsset.texture_uv
+        self.texture_map = self.meshAsset.texture_map
+        self.boundsCenter = self.meshAsset.boundsCenter
+        self.boundsRadius = self.meshAsset.boundsRadius
+        self.boundsMin = self.meshAsset.boundsMin
+        self.boundsMax = self.meshAsset.boundsMax
+        # the points are scratch space, each instance is transformed into them right before it's drawn
+        # so there's one copy of them no matter how many instances there are
+        self.points = self.meshAsset.points.copy()
+
+        self.texturePath = path_texture
+        self.texture = assets.acquire_texture(path_texture)
+
+        # either opaque or alphaclip, same as models
+        self.textureType = "opaque"
+
+        self.shouldBeDrawn = True
+
+        # the instances, one row each
+        # only the first count rows are actual instances, the rest is room to grow (so adding one doesn't copy everything)
+        self.count = 0
+        self.positions = np.zeros((0, 3))
+        self.forwards = np.zeros((0, 3))
+        self.ups = np.zeros((0, 3))
+        self.scales = np.zeros((0, 3))
+        # 0-255, multiplied with the texture (255, 255, 255 leaves it as-is)
+        self.colors = np.zeros((0, 3))
+
+    # making sure there's room for n more instances
+    def reserve(self, n):
+        if (self.count + n <= len(self.positions)):
+            return
+
+        # doubling, so adding instances one at a time doesn't copy the arrays every time
+        capacity = max(self.count + n, 2 * len(self.positions), 16)
+
+        for name in ("positions", "forwards", "ups", "scales", "colors"):
+            grown = np.zeros((capacity, 3))
+            grown[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, grown)
+
+    # adds one instance, returns its index
+    def add_instance(self, x, y, z):
+        self.reserve(1)
+
+        i = self.count
+        self.positions[i] = (x, y, z)
+        self.forwards[i] = (0.0, 0.0, 1.0)
+        self.ups[i] = (0.0, 1.0, 0.0)
+        self.scales[i] = (1.0, 1.0, 1.0)
+        self.colors[i] = (255.0, 255.0, 255.0)
+
+        self.count += 1
+        return i
+
+    # adds one instance for every row of positions (an (n, 3) array), returns the index of the first one
+    # way faster than calling add_instance() in a loop for big numbers of instances
+    def add_instances(self, positions):
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        n = len(positions)
+        self.reserve(n)
+
+        start = self.count
+        self.positions[start:start + n] = positions
+        self.forwards[start:start + n] = (0.0, 0.0, 1.0)
+        self.ups[start:start + n] = (0.0, 1.0, 0.0)
+        self.scales[start:start + n] = (1.0, 1.0, 1.0)
+        self.colors[start:start + n] = (255.0, 255.0, 255.0)
+
+        self.count += n
+        return start
+
+    # removes an instance by moving the last one into its place
+    # (so the last instance's index changes to this one, keep that in mind if you're holding on to indices)
+    def remove_instance(self, index):
+        last = self.count - 1
+        for array in (self.positions, self.forwards, self.ups, self.scales, self.colors):
+            array[index] = array[last]
+        self.count -= 1
+
+    def clear_instances(self):
+        self.count = 0
+
+    def set_instance_position(self, index, x, y, z):
+        self.positions[index] = (x, y, z)
+
+    def add_instance_position(self, index, x, y, z):
+        self.positions[index] += (x, y, z)
+
+    def set_instance_scale(self, index, a, b, c):
+        self.scales[index] = (a, b, c)
+
+    def set_instance_scale_to_number(self, index, n):
+        self.scales[index] = (n, n, n)
+
+    def set_instance_color(self, index, r, g, b):
+        self.colors[index] = (r, g, b)
+
+    # forward and up should be unit vectors at right angles to each other, same as models
+    def set_instance_rotation(self, index, forward_vector, up_vector):
+        self.forwards[index] = forward_vector
+        self.ups[index] = up_vector
+
+    # rotate around any axis, using a CC angle (same as Model.rotate())
+    def rotate_instance(self, index, angle, axis):
+        self.forwards[index] = m.rotate_vector_3d(self.forwards[index].copy(), axis, angle)
+        self.ups[index] = m.rotate_vector_3d(self.ups[index].copy(), axis, angle)
+
+    # the arrays of the actual instances (not the spare room), for changing lots of them at once
+    # these are views, so writing to them changes the instances
+    def get_positions(self):
+        return self.positions[:self.count]
+    def get_scales(self):
+        return self.scales[:self.count]
+    def get_colors(self):
+        return self.colors[:self.count]
+
+    # a copy of the instances as they are right now, for drawing (see snapshot_scene() in pg3d.py)
+    # the mesh and texture are shared (they're read-only), the instance arrays are copied so the game can keep changing them
+    def snapshot(self):
+        return InstanceSnapshot(self)
+
+    def show(self):
+        self.shouldBeDrawn = True
+    def hide(self):
+        self.shouldBeDrawn = False
+
+    def setTextureType(self, newType):
+        self.textureType = newType
+    def setAsOpaque(self):
+        self.textureType = "opaque"
+    def setAsTransparent(self):
+        self.textureType = "alphaclip"
+
+    def setTexture(self, texture_path):
+        newTexture = assets.acquire_texture(texture_path)
+        # (there's nothing to let go of once releaseAssets() has been called)
+        if (self.texturePath != None):
+            assets.release_texture(self.texturePath)
+
+        self.texturePath = texture_path
+        self.texture = newTexture
+
+    def releaseAssets(self):
+        if (self.texturePath != None):
+            assets.release_texture(self.texturePath)
+            self.texturePath = None
+
+# what draw_instances() in pg3d_rendering.py needs from an InstancedModel, frozen at one point in time
+class InstanceSnapshot:
+    def __init__(self, instanced):
+        self.points = instanced.points
+        self.triangles = instanced.triangles
+        self.texture_uv = instanced.texture_uv
+        self.texture_map = instanced.texture_map
+        self.boundsCenter = instanced.boundsCenter
+        self.boundsRadius = instanced.boundsRadius
+        self.boundsMin = instanced.boundsMin
+        self.boundsMax = instanced.boundsMax
+        self.texture = instanced.texture
+        self.textureType = instanced.textureType
+
+        self.count = instanced.count
+        self.positions = instanced.positions[:self.count].copy()
+        self.forwards = instanced.forwards[:self.count].copy()
+        self.ups = instanced.ups[:self.count].copy()
+        self.scales = instanced.scales[:self.count].copy()
+        self.colors = instanced.colors[:self.count].copy()
@@ -1,11 +1,11 @@
 import numpy as np
 from numba import njit
 
-@njit()
+@njit(cache=True)
 def clamp(val, lower, upper):
     return min(max(val, lower), upper)
 
-@njit()
+@njit(cache=True)
 def average_point_3d(list):
     toReturn = np.asarray([0.0,0.0,0.0])
     for i in list:
@@ -23,7 +23,7 @@ def array_has_item(array, item):
     return False
 
 # the box's bounds represent SIZE, NOT EXTENTS
-@njit()
+@njit(cache=True)
 def clamp_box_3d(point, boxCenter, boxSizes):
     newX = min(max(point[0], boxCenter[0] - boxSizes[0]/2), boxCenter[0] + boxSizes[0]/2)
     newY = min(max(point[1], boxCenter[1] - boxSizes[1]/2), boxCenter[1] + boxSizes[1]/2)
@@ -33,27 +33,27 @@ def clamp_box_3d(point, boxCenter, boxSizes):
 
 # ********  2D vector helpers:  ********  
 
-@njit()
+@njit(cache=True)
 def dot_2d(arr1, arr2): 
     return arr1[0]*arr2[0] + arr1[1]*arr2[1]
 
 # linearly interpolate from one point to another, using parameter t
-@njit()
+@njit(cache=True)
 def lerp_2d(a, b, t):
     return np.asarray([a[0] + (b[0]-a[0]) * t, a[1] + (b[1]-a[1]) * t])
 
 # add b to a
-@njit()
+@njit(cache=True)
 def add_2d(a, b):
     return np.asarray([a[0] + b[0],a[1] + b[1]])
 
 # subtract b from a 
-@njit()
+@njit(cache=True)
 def subtract_2d(a, b):
     return np.asarray([a[0] - b[0], a[1] - b[1]])
 
 # length of a vector, using pythagorean theorem
-@njit()
+@njit(cache=True)
 def length_2d(a):
     return np.sqrt(a[0] * a[0] + a[1] * a[1])
 
@@ -68,7 +68,7 @@ def normalize_2d(a):
 
 # ********  3D vector helpers:       ********
 
-@njit()
+@njit(cache=True)
 def dot_3d(arr1, arr2): 
     return arr1[0]*arr2[0] + arr1[1]*arr2[1] + arr1[2]*arr2[2]
 
@@ -81,27 +81,27 @@ def slerp_3d(a,b,t):
     return rotate_vector_3d(a,rotationAxis, rotationAngle * t)
 
 # linearly interpolate from one point to another, using parameter t
-@njit()
+@njit(cache=True)
 def lerp_3d(a, b, t):
     return np.asarray([a[0] + (b[0]-a[0]) * t, a[1] + (b[1]-a[1]) * t, a[2] + (b[2]-a[2]) * t])
 
 # add b to a
-@njit()
+@njit(cache=True)
 def add_3d(a, b):
     return np.asarray([a[0] + b[0],a[1] + b[1], a[2] + b[2]])
 
 # subtract b from a 
-@njit()
+@njit(cache=True)
 def subtract_3d(a, b):
     return np.asarray([a[0] - b[0], a[1] - b[1], a[2] - b[2]])
 
 # length of a vector, using pythagorean theorem
-@njit()
+@njit(cache=True)
 def length_3d(a):
     return np.sqrt(a[0] * a[0] + a[1] * a[1] + a[2] * a[2])
 
 # calculate the angle in RADIANS between two vectors
-@njit()
+@njit(cache=True)
 def angle_3d(a, b):
     dp = dot_3d(a,b)
     la = length_3d(a)
@@ -111,12 +111,12 @@ def angle_3d(a, b):
 
 # calculate the cross product between two vectors
 # (there is no cross in 2d)
-@njit()
+@njit(cache=True)
 def cross_3d(a,b):
     return np.asarray([a[1]*b[2] - a[2]*b[1],a[2]*b[0]-a[0]*b[2],a[0]*b[1]-a[1]*b[0]])
 
 # takes in a vector, outputs that vector as a unit vector
-@njit()
+@njit(cache=True)
 def normalize_3d(a):
     l = length_3d(a)
 
@@ -127,7 +127,7 @@ def normalize_3d(a):
 
 # whether a point is in an AABB (axis aligned bounding box)
 # again, the sizes are SIZES, NOT EXTENTS in each direction
-@njit()
+@njit(cache=True)
 def point_in_box_3d(point, boxCenter, boxSizes):
     if (point[0] > boxCenter[0] - boxSizes[0]/2 and point[1] > boxCenter[1] - boxSizes[1]/2 and point[2] > boxCenter[2] - boxSizes[2]/2 and point[0] < boxCenter[0] + boxSizes[0]/2 and point[1] < boxCenter[1] + boxSizes[1]/2 and point[2] < boxCenter[2] + boxSizes[2]/2):
         return True
@@ -135,7 +135,7 @@ def point_in_box_3d(point, boxCenter, boxSizes):
         return False
 
 # rotate a vector (x,y,z) around another vector, by an angle
-@njit()
+@njit(cache=True)
 def rotate_vector_3d(vector, axis, angle):
     i = np.asarray([0.0,0.0,0.0])
     i[0] = vector[0] * (     (axis[0] * axis[0]) * (1 - np.cos(angle)) + np.cos(angle)                  ) + vector[1] * (        (axis[1] * axis[0]) * (1 - np.cos(angle)) - (axis[2] * np.sin(angle))         ) + vector[2] * (        (axis[0] * axis[2]) * (1 - np.cos(angle)) + (axis[1] * np.sin(angle))     )
@@ -147,7 +147,7 @@ def rotate_vector_3d(vector, axis, angle):
 # the difference between this and the above function?
 # "points" are different than "vectors", because points have more indices for projection (6, or 9, it's dumb)
 
-@njit()
+@njit(cache=True)
 def rotate_point_3d(vector, axis, angle):
     # rotate around x axis
     i = np.asarray([0.0,0.0,0.0,0.0,0.0,0.0])
@@ -155,4 +155,79 @@ def rotate_point_3d(vector, axis, angle):
     i[4] = vector[3] * (     (axis[0] * axis[1]) * (1 - np.cos(angle)) + (axis[2] * np.sin(angle))     ) + vector[4] * (        (axis[1] * axis[1]) * (1 - np.cos(angle)) + np.cos(angle)                      ) + vector[5] * (        (axis[1] * axis[2]) * (1 - np.cos(angle)) - (axis[0] * np.sin(angle))     )
     i[5] = vector[3] * (     (axis[0] * axis[2]) * (1 - np.cos(angle)) - (axis[1] * np.sin(angle))     ) + vector[4] * (        (axis[1] * axis[2]) * (1 - np.cos(angle)) + (axis[0] * np.sin(angle))         ) + vector[5] * (        (axis[2] * axis[2]) * (1 - np.cos(angle)) + np.cos(angle)                  )
     
-    return i 
\ No newline at end of file
+    return i 
+# ********  matrix helpers:       ********
+# matrices are used so that a whole mesh can be transformed in one go, instead of rotating every point separately
+
+# the matrix version of rotate_vector_3d()
+# multiplying a vector by this gives the same thing as rotate_vector_3d(vector, axis, angle)
+@njit(cache=True)
+def rotation_matrix_3d(axis, angle):
+    c = np.cos(angle)
+    s = np.sin(angle)
+    matrix = np.zeros((3,3))
+
+    matrix[0,0] = (axis[0] * axis[0]) * (1 - c) + c
+    matrix[0,1] = (axis[1] * axis[0]) * (1 - c) - (axis[2] * s)
+    matrix[0,2] = (axis[0] * axis[2]) * (1 - c) + (axis[1] * s)
+    matrix[1,0] = (axis[0] * axis[1]) * (1 - c) + (axis[2] * s)
+    matrix[1,1] = (axis[1] * axis[1]) * (1 - c) + c
+    matrix[1,2] = (axis[1] * axis[2]) * (1 - c) - (axis[0] * s)
+    matrix[2,0] = (axis[0] * axis[2]) * (1 - c) - (axis[1] * s)
+    matrix[2,1] = (axis[1] * axis[2]) * (1 - c) + (axis[0] * s)
+    matrix[2,2] = (axis[2] * axis[2]) * (1 - c) + c
+
+    return matrix
+
+# a times b, for 3x3 matrices
+# (written out because numba needs scipy for np.dot)
+@njit(cache=True)
+def multiply_matrix_3d(a, b):
+    toReturn = np.zeros((3,3))
+    for i in range(3):
+        for j in range(3):
+            toReturn[i,j] = a[i,0] * b[0,j] + a[i,1] * b[1,j] + a[i,2] * b[2,j]
+
+    return toReturn
+
+# the rotation an object with these forward/up vectors applies to its points
+# first the z axis is rotated onto the forward vector, then the rotated y axis onto the up vector (same steps as Model.transform_point())
+@njit(cache=True)
+def object_rotation_matrix_3d(forward, up):
+    forwardRotationAxis = normalize_3d(cross_3d(np.asarray([0.0,0.0,1.0]), forward))
+    forwardRotationAngle = angle_3d(np.asarray([0.0,0.0,1.0]), forward)
+    if (forwardRotationAngle <= 0):
+        forwardRotationAxis = forward
+    rotatedUpAxis = rotate_vector_3d(np.asarray([0.0,1.0,0.0]), forwardRotationAxis, forwardRotationAngle)
+    upRotationAxis = normalize_3d(cross_3d(rotatedUpAxis, up))
+    upRotationAngle = angle_3d(rotatedUpAxis, up)
+
+    matrix = np.eye(3)
+    if (forwardRotationAngle > 0):
+        matrix = rotation_matrix_3d(forwardRotationAxis, forwardRotationAngle)
+    if (upRotationAngle > 0):
+        matrix = multiply_matrix_3d(rotation_matrix_3d(upRotationAxis, upRotationAngle), matrix)
+
+    return matrix
+
+# the rotation that turns world-space directions into camera-space ones, for a camera with these forward/up vectors
+# (the forward vector ends up on the z axis, the up vector on the y axis)
+@njit(cache=True)
+def camera_rotation_matrix_3d(forward, up):
+    forwardVectorAxis = normalize_3d(cross_3d(forward, np.asarray([0.0,0.0,1.0])))
+    forwardVectorAngle = angle_3d(np.asarray([0.0,0.0,1.0]), forward)
+
+    matrix = np.eye(3)
+    if (forwardVectorAngle > 0):
+        matrix = rotation_matrix_3d(forwardVectorAxis, forwardVectorAngle)
+    else:
+        forwardVectorAxis = forward
+
+    rotatedUp = rotate_vector_3d(up, forwardVectorAxis, forwardVectorAngle)
+    upVectorAxis = normalize_3d(cross_3d(rotatedUp, np.asarray([0.0,1.0,0.0])))
+    upVectorAngle = angle_3d(np.asarray([0.0,1.0,0.0]), rotatedUp)
+
+    if (upVectorAngle > 0):
+        matrix = multiply_matrix_3d(rotation_matrix_3d(upVectorAxis, upVectorAngle), matrix)
+
+    return matrix
@@ -1,11 +1,14 @@
+import itertools
 import numpy as np
 from . import pg3d_math as m
 from . import pg3d as engine
-from . import pg3d_utils as utils
+from . import pg3d_assets as assets
 import pygame as pg
 
 class Model:
     _registry = []
+    # every model gets the next number from here, which (unlike id()) is never given to another model after it's destroyed
+    _serials = itertools.count()
 
     def __init__(self, name, path_obj, path_texture, tags, color):
 
@@ -16,6 +19,7 @@ class Model:
         # by that I mean there will be one instance of the variable for ALL models, not for each
 
         self.name = name
+        self.serial = next(Model._serials)
 
         # there are some tags that the engine looks for, like the 'physics' tag
         self.tags = tags
@@ -23,15 +27,34 @@ class Model:
         # the world and local transforms of an object
         # both the same, since obj doesn't start out as a child
         self.localTransform = ModelTransform(np.asarray([0.0,0.0,0.0]), np.asarray([0.0,0.0,1.0]), np.asarray([0.0,1.0,0.0]), np.asarray([1.0,1.0,1.0]))
-        self.worldTransform = ModelTransform(np.asarray([0.0,0.0,0.0]), np.asarray([0.0,0.0,1.0]), np.asarray([0.0,1.0,0.0]), np.asarray([1.0,1.0,1.0]))
+        # (read this through self.worldTransform, which makes sure it's up to date first)
+        self._worldTransform = ModelTransform(np.asarray([0.0,0.0,0.0]), np.asarray([0.0,0.0,1.0]), np.asarray([0.0,1.0,0.0]), np.asarray([1.0,1.0,1.0]))
+
+        # whether the world transform is out of date (see markTransformDirty())
+        self.transformDirty = False
+        # goes up every time the transform changes, so static batches can tell when a static model moved (see pg3d_batching.py)
+        self.transformVersion = 0
 
         self._registry.append(self)
         # points are stored using nine numbers
         # the first three is the point as it appears in the mesh file
         # the next three is the point as it appears in the scene, RELATIVE TO THE CAMERA
         # the final three is the point as it appears projected onto the screen
-        self.points, self.triangles, self.texture_uv, self.texture_map =  utils.read_obj(path_obj)
-        self.texture = pg.surfarray.array3d(pg.image.load(path_texture))
+        # the mesh file is only read once, every model using it shares the triangles/uvs (see pg3d_assets.py)
+        # the points are this model's own copy though, because the last six numbers get written to every frame
+        self.meshAsset = assets.load_mesh(path_obj)
+        self.points = self.meshAsset.points.copy()
+        self.triangles = self.meshAsset.triangles
+        self.texture_uv = self.meshAsset.texture_uv
+        self.texture_map = self.meshAsset.texture_map
+        # the bounding sphere/box of the mesh, for frustum culling
+        self.boundsCenter = self.meshAsset.boundsCenter
+        self.boundsRadius = self.meshAsset.boundsRadius
+        self.boundsMin = self.meshAsset.boundsMin
+        self.boundsMax = self.meshAsset.boundsMax
+        # textures are shared too, and stay loaded until the model is destroyed (see releaseAssets())
+        self.texturePath = path_texture
+        self.texture = assets.acquire_texture(path_texture)
 
         # average of all vertices
         self.rawMidpoint = self.calculateRawMidpoint()
@@ -73,6 +96,14 @@ class Model:
         # either opaque or alphaclip, changes how the renderer deals with transparency
         self.textureType = "opaque"
 
+        # level of detail: simpler versions of the mesh, drawn instead when the model is far away (see add_lod())
+        # None until the first one is added, level 0 is always the model's own mesh
+        self.lods = None
+        self.currentLod = 0
+        # how far past a switch distance the camera has to go before switching (as a fraction of the distance)
+        # stops the model from flickering between two levels when the camera sits right at the switch distance
+        self.lodHysteresis = 0.0
+
     # only used for particle objects, advances the sprite to create an animation
     def checkAnimation(self):
         # time between frames is in millis
@@ -94,7 +125,20 @@ class Model:
     
     # changes the texture on the model
     def setTexture(self, texture_path):
-        self.texture = pg.surfarray.array3d(pg.image.load(texture_path))
+        # grabbing the new one before letting go of the old one, in case they're the same
+        newTexture = assets.acquire_texture(texture_path)
+        # (there's nothing to let go of once releaseAssets() has been called)
+        if (self.texturePath != None):
+            assets.release_texture(self.texturePath)
+
+        self.texturePath = texture_path
+        self.texture = newTexture
+
+    # lets go of the (shared) texture, called when the model is destroyed
+    def releaseAssets(self):
+        if (self.texturePath != None):
+            assets.release_texture(self.texturePath)
+            self.texturePath = None
 
     # switching between texture types ***********
     def setTextureType(self, newType):
@@ -105,24 +149,93 @@ class Model:
         self.textureType = "alphaclip"
     # ********************************************
 
+    # level of detail stuff ********************************************
+
+    # adds a simpler mesh, which gets drawn once the camera is more than switch_distance away from the model
+    # add them from most to least detailed (each one farther away than the last)
+    # the texture stays the same, so the simpler meshes should use the same texture layout
+    def add_lod(self, path_obj, switch_distance):
+        self.add_lod_level(ModelLOD(assets.load_mesh(path_obj), switch_distance, 0))
+
+    # same as above, but switching once the model is less than screen_size pixels tall on screen (at the render resolution)
+    def add_lod_screen_size(self, path_obj, screen_size):
+        self.add_lod_level(ModelLOD(assets.load_mesh(path_obj), 0, screen_size))
+
+    def add_lod_level(self, lod):
+        if (self.lods == None):
+            self.lods = [ModelLOD(self.meshAsset, 0, 0)]
+            # level 0 uses the model's own points, so it doesn't need its own copy
+            self.lods[0].points = self.points
+        self.lods.append(lod)
+
+    def set_lod_hysteresis(self, fraction):
+        self.lodHysteresis = fraction
+
+    # picks the level to draw this frame, and returns it
+    # matrix is the model -> camera matrix (model_view_matrix() in pg3d.py), ver_fov_adjust is the renderer's projection number
+    def select_lod(self, matrix, ver_fov_adjust):
+        # how far the middle of the model is from the camera
+        center = matrix[:,0:3] @ self.boundsCenter + matrix[:,3]
+        distance = np.sqrt(center[0] * center[0] + center[1] * center[1] + center[2] * center[2])
+
+        # screen sizes are turned into distances: something with radius r is 2 * r * ver_fov_adjust / distance pixels tall
+        radius = self.boundsRadius * np.max(np.sqrt(np.sum(matrix[:,0:3] * matrix[:,0:3], axis=0)))
+
+        level = self.currentLod
+        # going to simpler levels while past their switch distance
+        while (level + 1 < len(self.lods) and distance > self.lods[level + 1].switch_distance(radius, ver_fov_adjust) * (1 + self.lodHysteresis)):
+            level += 1
+        # and back to more detailed ones while closer than the current level's switch distance
+        while (level > 0 and distance < self.lods[level].switch_distance(radius, ver_fov_adjust) * (1 - self.lodHysteresis)):
+            level -= 1
+
+        self.currentLod = level
+        return self.lods[level]
+
+    # ********************************************
+
     # transform stuff ********************************************
 
+    # the world transform isn't recalculated every time the object moves,
+    # it's recalculated the next time something actually reads it (if anything changed since the last time)
+    @property
+    def worldTransform(self):
+        if (self.transformDirty):
+            self.syncTransformWithParent()
+        return self._worldTransform
+
+    # called whenever the local transform changes
+    # marks the world transform as out of date, along with all the children's (because theirs depend on this one)
+    def markTransformDirty(self):
+        # if this one is already dirty, the children are too
+        if (self.transformDirty):
+            return
+
+        self.transformDirty = True
+        self.transformVersion += 1
+        self.localTransform.mark_dirty()
+
+        for i in self.children:
+            i.markTransformDirty()
+
     # set the transform based on the parent
     def syncTransformWithParent(self):
         # DO NOT CHANGE THE LOCAL TRANSFORM
 
+        self.transformDirty = False
+
         if (self.parent == None): 
             # can't really do much without a parent lol
             # but we do need to make sure the world and local transforms are the same
-            self.worldTransform.copy(self.localTransform)
+            self._worldTransform.copy(self.localTransform)
 
             return
         
         # okay, so we do actually have a parent cuz the func didnt return
 
         # first, copy the local to the world
-        self.worldTransform.copy(self.localTransform)
-        self.worldTransform.add_self_to_other(self.parent.worldTransform) # as mentioned basically everywhere, the parent's world transform HAS TO BE DONE FIRST
+        self._worldTransform.copy(self.localTransform)
+        self._worldTransform.add_self_to_other(self.parent.worldTransform) # as mentioned basically everywhere, the parent's world transform HAS TO BE DONE FIRST
 
     def setParent(self, otherObject):
         if (otherObject == None):
@@ -132,10 +245,13 @@ class Model:
 
             self.parent = None
             self.childLevel = 0
+            self.markTransformDirty()
             # that way, you can call setParent(None) to make it not a child
             return
         self.parent = otherObject
         self.childLevel = otherObject.childLevel + 1
+        # the world transform (this one's and the children's) moves with the new parent
+        self.markTransformDirty()
 
         self.syncChildren()
 
@@ -240,20 +356,9 @@ class Model:
         localPoint = np.asarray([foreignPoint[0] - worldSpaceMidpoint[0],foreignPoint[1] - worldSpaceMidpoint[1],foreignPoint[2] - worldSpaceMidpoint[2]])
 
         # now, we rotate it using the opposite rotation we would use to transform a point
-        forwardRotationAxis = m.normalize_3d(m.cross_3d(np.asarray([0.0,0.0,1.0]), self.worldTransform.forward))
-        forwardRotationAngle = m.angle_3d(np.asarray([0.0,0.0,1.0]), self.worldTransform.forward)
-        rotatedPoint = localPoint
-        if forwardRotationAngle > 0:
-            rotatedPoint = m.rotate_vector_3d(localPoint, forwardRotationAxis, forwardRotationAngle)
-        else:
-            forwardRotationAxis = self.worldTransform.forward
-            
-        rotatedUpAxis = m.rotate_vector_3d(np.asarray([0.0,1.0,0.0]), forwardRotationAxis, forwardRotationAngle)
-        upRotationAxis = m.normalize_3d(m.cross_3d(rotatedUpAxis, self.worldTransform.up))
-        upRotationAngle = m.angle_3d(rotatedUpAxis, self.worldTransform.up)
-        
-        if upRotationAngle > 0:
-            rotatedPoint = m.rotate_vector_3d(rotatedPoint, upRotationAxis, upRotationAngle)
+        # (the transpose of a rotation matrix is its inverse)
+        rotation = self.worldTransform.get_rotation_matrix()
+        rotatedPoint = rotation.T @ localPoint
 
         colliderBounds = self.data["collider_bounds"]
 
@@ -261,13 +366,8 @@ class Model:
         # this function takes in (point, point point) and (box, box, box)
         clampedPoint = m.clamp_box_3d(rotatedPoint,np.asarray([0.0,0.0,0.0]),colliderBounds)
 
-        rotatedPoint = clampedPoint
-
         # UNROTATE THE POINT
-        if upRotationAngle > 0:
-            rotatedPoint = m.rotate_vector_3d(clampedPoint, upRotationAxis, -upRotationAngle)
-        if forwardRotationAngle > 0:
-            rotatedPoint = m.rotate_vector_3d(rotatedPoint, forwardRotationAxis, -forwardRotationAngle)
+        rotatedPoint = rotation @ clampedPoint
 
         # add the position back
         return np.asarray([rotatedPoint[0] + worldSpaceMidpoint[0],rotatedPoint[1] + worldSpaceMidpoint[1],rotatedPoint[2] + worldSpaceMidpoint[2]])
@@ -278,20 +378,7 @@ class Model:
         localPoint = np.asarray([foreignPoint[0] - worldSpaceMidpoint[0],foreignPoint[1] - worldSpaceMidpoint[1],foreignPoint[2] - worldSpaceMidpoint[2]])
 
         # now, we rotate it using the opposite rotation we would use to transform a point
-        forwardRotationAxis = m.normalize_3d(m.cross_3d(np.asarray([0.0,0.0,1.0]), self.worldTransform.forward))
-        forwardRotationAngle = m.angle_3d(np.asarray([0.0,0.0,1.0]), self.worldTransform.forward)
-        rotatedPoint = localPoint
-        if forwardRotationAngle > 0:
-            rotatedPoint = m.rotate_vector_3d(localPoint, forwardRotationAxis, forwardRotationAngle)
-        else:
-            forwardRotationAxis = self.worldTransform.forward
-
-        rotatedUpAxis = m.rotate_vector_3d(np.asarray([0.0,1.0,0.0]), forwardRotationAxis, forwardRotationAngle)
-        upRotationAxis = m.normalize_3d(m.cross_3d(rotatedUpAxis, self.worldTransform.up))
-        upRotationAngle = m.angle_3d(rotatedUpAxis, self.worldTransform.up)
-
-        if upRotationAngle > 0:
-            rotatedPoint = m.rotate_vector_3d(rotatedPoint, upRotationAxis, upRotationAngle)
+        rotatedPoint = self.worldTransform.get_rotation_matrix().T @ localPoint
 
         return m.point_in_box_3d(rotatedPoint,np.asarray([0.0,0.0,0.0]),bounds)
         
@@ -475,8 +562,7 @@ class Model:
         self.localTransform.position[1] = y
         self.localTransform.position[2] = z
 
-        self.syncTransformWithParent() # refreshing the world transform
-        self.syncChildren()
+        self.markTransformDirty() # the world transform gets refreshed when it's next needed
     
     # translate with individual numbers
     def add_local_position(self, x, y, z):
@@ -484,8 +570,7 @@ class Model:
         self.localTransform.position[1] += y
         self.localTransform.position[2] += z
 
-        self.syncTransformWithParent() # refreshing the world transform
-        self.syncChildren()
+        self.markTransformDirty() # the world transform gets refreshed when it's next needed
 
     # rotate around any axis, using a CC angle
     # why tf did I decide to put angle first??
@@ -503,8 +588,7 @@ class Model:
             self.localTransform.up[1] = newUp[1]
             self.localTransform.up[2] = newUp[2]
 
-        self.syncTransformWithParent() # refreshing the world transform
-        self.syncChildren()
+        self.markTransformDirty() # the world transform gets refreshed when it's next needed
 
     def get_forward(self):
         return self.localTransform.forward
@@ -520,8 +604,7 @@ class Model:
             self.localTransform.forward = m.rotate_vector_3d(self.localTransform.forward, appliedRotationAxis, appliedRotationAngle)
             self.localTransform.up = m.rotate_vector_3d(self.localTransform.up, appliedRotationAxis, appliedRotationAngle)
 
-        self.syncTransformWithParent() # refreshing the world transform
-        self.syncChildren()
+        self.markTransformDirty() # the world transform gets refreshed when it's next needed
 
     def set_local_up(self, forward_vector):
         appliedRotationAxis = m.normalize_3d(m.cross_3d(self.localTransform.up, forward_vector))
@@ -531,8 +614,7 @@ class Model:
             self.localTransform.forward = m.rotate_vector_3d(self.localTransform.forward, appliedRotationAxis, appliedRotationAngle)
             self.localTransform.up = m.rotate_vector_3d(self.localTransform.up, appliedRotationAxis, appliedRotationAngle)
 
-            self.syncTransformWithParent() # refreshing the world transform
-            self.syncChildren()
+            self.markTransformDirty() # the world transform gets refreshed when it's next needed
 
     # set scale with three numbers
     def set_scale(self, a, b, c):
@@ -540,16 +622,14 @@ class Model:
         self.localTransform.scale[1] = b
         self.localTransform.scale[2] = c
 
-        self.syncTransformWithParent() # refreshing the world transform
-        self.syncChildren()
+        self.markTransformDirty() # the world transform gets refreshed when it's next needed
 
     def set_scale_vector(self, new_scale_vector):
         self.localTransform.scale[0] += new_scale_vector[0]
         self.localTransform.scale[1] += new_scale_vector[1]
         self.localTransform.scale[2] += new_scale_vector[2]
 
-        self.syncTransformWithParent() # refreshing the world transform
-        self.syncChildren()
+        self.markTransformDirty() # the world transform gets refreshed when it's next needed
 
     # same as above, but with one number
     def set_scale_to_number(self, n):
@@ -557,63 +637,63 @@ class Model:
         self.localTransform.scale[1] = n
         self.localTransform.scale[2] = n
 
-        self.syncTransformWithParent() # refreshing the world transform
-        self.syncChildren()
+        self.markTransformDirty() # the world transform gets refreshed when it's next needed
     # not usually gonna be used, but hey? someone might want it
     def add_scale(self, a, b, c):
         self.localTransform.scale[0] += a
         self.localTransform.scale[1] += b
         self.localTransform.scale[2] += c
         
-        self.syncTransformWithParent() # refreshing the world transform
-        self.syncChildren()
+        self.markTransformDirty() # the world transform gets refreshed when it's next needed
 
     def add_scale_vector(self, vector_to_add):
         self.localTransform.scale[0] += vector_to_add[0]
         self.localTransform.scale[1] += vector_to_add[1]
         self.localTransform.scale[2] += vector_to_add[2]
         
-        self.syncTransformWithParent() # refreshing the world transform
-        self.syncChildren()
+        self.markTransformDirty() # the world transform gets refreshed when it's next needed
 
     def add_number_to_scale(self, n):
         self.localTransform.scale[0] += n
         self.localTransform.scale[1] += n
         self.localTransform.scale[2] += n
         
-        self.syncTransformWithParent() # refreshing the world transform
-        self.syncChildren()
+        self.markTransformDirty() # the world transform gets refreshed when it's next needed
 
+    # the whole world transform (scale, then rotation, then position) as a 3x4 matrix
+    # the first three columns are the rotation/scale, the last one is the position
+    def world_matrix(self):
+        return self.worldTransform.get_matrix()
+
+    # scale, then rotation, then position (reads indices 0,1,2 and writes 3,4,5)
     def transform_point(self, point):
-        # scale first
-        point[3] = point[0] * self.worldTransform.scale[0]
-        point[4] = point[1] * self.worldTransform.scale[1]
-        point[5] = point[2] * self.worldTransform.scale[2]
-
-        # then rotation
-        forwardRotationAxis = m.normalize_3d(m.cross_3d(np.asarray([0.0,0.0,1.0]), self.worldTransform.forward))
-        forwardRotationAngle = m.angle_3d(np.asarray([0.0,0.0,1.0]), self.worldTransform.forward)
-        if (forwardRotationAngle <= 0):
-            forwardRotationAxis = self.worldTransform.forward
-        rotatedUpAxis = m.rotate_vector_3d(np.asarray([0.0,1.0,0.0]), forwardRotationAxis, forwardRotationAngle)
-        upRotationAxis = m.normalize_3d(m.cross_3d(rotatedUpAxis, self.worldTransform.up))
-        upRotationAngle = m.angle_3d(rotatedUpAxis, self.worldTransform.up)
-        rotatedPoint = point
-        if forwardRotationAngle > 0:
-            rotatedPoint = m.rotate_point_3d(point, forwardRotationAxis, forwardRotationAngle)
-        if upRotationAngle > 0:
-            rotatedPoint = m.rotate_point_3d(rotatedPoint, upRotationAxis, upRotationAngle)
-        point[3] = rotatedPoint[3]
-        point[4] = rotatedPoint[4]
-        point[5] = rotatedPoint[5]
-
-        # then position
-        point[3] += self.worldTransform.position[0]
-        point[4] += self.worldTransform.position[1]
-        point[5] += self.worldTransform.position[2]
+        matrix = self.worldTransform.get_matrix()
+
+        point[3:6] = matrix[:,0:3] @ point[0:3] + matrix[:,3]
 
         return point
     
+# one level of detail of a model: a mesh, and when to switch to it
+# either switchDistance (in world units) or screenSize (in pixels) is used, whichever isn't 0
+class ModelLOD:
+    def __init__(self, meshAsset, switchDistance, screenSize):
+        self.meshAsset = meshAsset
+        self.switchDistance = switchDistance
+        self.screenSize = screenSize
+
+        # like models, every level has its own copy of the points (they get written to when drawing)
+        self.points = meshAsset.points.copy()
+        self.triangles = meshAsset.triangles
+        self.texture_uv = meshAsset.texture_uv
+        self.texture_map = meshAsset.texture_map
+
+    # the camera distance past which this level gets used
+    # radius is the model's bounding radius (scaled), for turning a screen size into a distance
+    def switch_distance(self, radius, ver_fov_adjust):
+        if (self.screenSize > 0):
+            return 2 * radius * ver_fov_adjust / self.screenSize
+        return self.switchDistance
+
 # essentially a unity transform component:
 # since objects now have parents and children, every object will have a WORLD set of transforms and a set of LOCAL transforms
 class ModelTransform:
@@ -635,8 +715,60 @@ class ModelTransform:
 
         self.scale = scl
 
+        # the matrices are only rebuilt when they're asked for AND something changed (see mark_dirty())
+        self.dirty = True
+        self.rotationMatrix = None
+        self.matrix = None
+        self.inverseMatrix = None
+
+    # call this after changing the position/rotation/scale, so that the matrices get rebuilt
+    def mark_dirty(self):
+        self.dirty = True
+
+    def rebuild_matrices(self):
+        rotation = m.object_rotation_matrix_3d(self.forward, self.up)
+
+        # scale, then rotation, then position
+        matrix = np.zeros((3,4))
+        matrix[:,0:3] = rotation * self.scale
+        matrix[:,3] = self.position
+
+        # going backwards: un-position, un-rotate, un-scale
+        # (a scale of 0 can't be undone, it just stays 0)
+        inverseScale = np.zeros(3)
+        np.divide(1.0, self.scale, out=inverseScale, where=self.scale != 0)
+
+        inverseMatrix = np.zeros((3,4))
+        inverseMatrix[:,0:3] = rotation.T * inverseScale[:,None]
+        inverseMatrix[:,3] = -(inverseMatrix[:,0:3] @ self.position)
+
+        self.rotationMatrix = rotation
+        self.matrix = matrix
+        self.inverseMatrix = inverseMatrix
+        self.dirty = False
+
+    # the rotation only, as a 3x3 matrix
+    def get_rotation_matrix(self):
+        if (self.dirty):
+            self.rebuild_matrices()
+        return self.rotationMatrix
+
+    # 3x4, multiply a point by the first three columns and add the last one to transform it
+    def get_matrix(self):
+        if (self.dirty):
+            self.rebuild_matrices()
+        return self.matrix
+
+    # same layout as get_matrix(), but going from world space back into this transform's space
+    def get_inverse_matrix(self):
+        if (self.dirty):
+            self.rebuild_matrices()
+        return self.inverseMatrix
+
     # literally just ctrl+c, ctrl+v the data from another transform
     def copy(self, otherTransform):
+        self.dirty = True
+
         self.position[0] = otherTransform.position[0]
         self.position[1] = otherTransform.position[1]
         self.position[2] = otherTransform.position[2]
@@ -673,6 +805,8 @@ class ModelTransform:
     # the parent's world space transform will have already been calculated
 
     def add_self_to_other(self, otherTransform):
+        self.dirty = True
+
         # positions can just be added (because a + b = b + a)
 
         otherRight = otherTransform.get_right()
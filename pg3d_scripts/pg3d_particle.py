@@ -4,6 +4,7 @@ import numpy as np
 import pygame as pg
 import random
 from . import pg3d_math as m
+from . import pg3d_assets as assets
 
 # TODO: the entire particle system
 
@@ -57,6 +58,10 @@ class ParticleManager:
         self.animationFrames = animation_frames
         self.timeBetweenFrames = time_between_frames
 
+        # reading the frames now, so the particles don't have to load them from disk while they're animating
+        for i in self.animationFrames:
+            assets.load_texture(i)
+
         # if destroy_when_finish is true, the particle will destroy itself as soon as the animation finishes playing
         # if not, then it depends:
         # if loop_animation is true, it will just restart
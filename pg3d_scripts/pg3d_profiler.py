@@ -0,0 +1,110 @@
+import collections
+import json
+
+# timing how long each part of a frame takes, and keeping the numbers for the last bunch of frames
+# it's off by default, and when it's off the engine doesn't time anything (the counters in getRenderStats() are always there though, they're basically free)
+
+# a frame here is one trip around the game loop, from one getFrame() to the next:
+#   snapshot_ms     going through the scene (culling, levels of detail...), see snapshot_scene() in pg3d.py
+#   clear_ms        clearing the z buffer and drawing the background
+#   transform_ms    transform_points() for every model
+#   draw_ms         draw_model() for every model (clipping + rasterizing)
+#   instances_ms    drawing instanced objects
+#   render_ms       all of the drawing together (clear + transform + draw + instances)
+#   wait_ms         waiting for the render thread (pipelined rendering only)
+#   drawScreen_ms   copying/scaling the frame onto the screen
+#   update_ms       all of update(), which includes:
+#   particles_ms    moving the particles
+#   physics_ms      moving physics objects and checking collisions
+# plus everything in getRenderStats(), and collision_pairs (how many pairs of colliders were checked against each other)
+
+# with pipelined rendering the drawing numbers are for the frame that was returned (the one before the scene was snapshotted)
+
+enabled = False
+
+# the last frames, oldest first (every frame is a dict with the numbers above)
+frames = collections.deque(maxlen=300)
+
+# the times/counts from outside of getFrame() (update(), drawScreen()) since the last frame was finished
+pending = {}
+
+# the file frames are being written to (see start_export())
+exportFile = None
+exportFormat = ""
+exportColumns = None
+exportedFrames = 0
+
+def enable(historyLength):
+    global enabled
+    global frames
+
+    if (frames.maxlen != historyLength):
+        frames = collections.deque(frames, maxlen=historyLength)
+    enabled = True
+
+def disable():
+    global enabled
+
+    enabled = False
+    pending.clear()
+
+def add_time(stage, seconds):
+    key = stage + "_ms"
+    pending[key] = pending.get(key, 0) + seconds * 1000
+
+def add_count(name, count):
+    pending[name] = pending.get(name, 0) + count
+
+# called by getFrame() with the stats of the frame it's returning
+def finish_frame(stats):
+    # (0 for anything that didn't happen this frame, e.g. update() not being called)
+    frame = dict.fromkeys(("clear_ms", "transform_ms", "draw_ms", "instances_ms", "drawScreen_ms", "update_ms", "particles_ms", "physics_ms", "collision_pairs"), 0)
+    frame.update(stats)
+    frame["triangles_per_lod"] = list(frame["triangles_per_lod"])
+    frame.update(pending)
+    pending.clear()
+
+    frames.append(frame)
+
+    if (exportFile != None):
+        write_frame(frame)
+
+# ********  EXPORTING:  ********
+
+# every frame gets written to the file as it's finished, so it can be watched while the game is running (e.g. with tail -f)
+# ".csv" files get one row per frame (triangles_per_lod is left out), anything else gets one json object per line
+def start_export(path):
+    global exportFile
+    global exportFormat
+    global exportColumns
+
+    stop_export()
+
+    exportFile = open(path, "w", newline="")
+    exportFormat = "csv" if path.lower().endswith(".csv") else "jsonl"
+    exportColumns = None
+
+def stop_export():
+    global exportFile
+
+    if (exportFile != None):
+        exportFile.close()
+        exportFile = None
+
+def write_frame(frame):
+    global exportColumns
+    global exportedFrames
+
+    if (exportFormat == "csv"):
+        # the columns are whatever the first frame had, so the header only gets written once
+        if (exportColumns == None):
+            exportColumns = [i for i in frame if i != "triangles_per_lod"]
+            exportFile.write(",".join(exportColumns) + "\n")
+        exportFile.write(",".join(str(frame.get(i, "")) for i in exportColumns) + "\n")
+    else:
+        exportFile.write(json.dumps(frame) + "\n")
+
+    # writes are buffered, this just makes sure nothing sits in the buffer for more than a second or so
+    exportedFrames += 1
+    if (exportedFrames % 60 == 0):
+        exportFile.flush()
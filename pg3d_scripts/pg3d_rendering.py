@@ -1,6 +1,6 @@
 import numpy as np
 from . import pg3d_math as m
-from numba import njit
+from numba import njit, prange
 
 renderConfig = None
 
@@ -14,6 +14,16 @@ renderConfig = None
     # blue is
 renderingModes = ["texture","uv","wireframe","states"]
 
+# the same modes as numbers (their place in renderingModes), which is what the compiled rasterizer gets
+# comparing strings for every pixel was a big part of the drawing time
+RENDER_TEXTURE = 0
+RENDER_UV = 1
+RENDER_WIREFRAME = 2
+RENDER_STATES = 3
+
+def render_mode_index(mode):
+    return renderingModes.index(mode)
+
 # possible background modes
 backGroundModes = ["solid color","skybox"]
 
@@ -43,6 +53,20 @@ class RenderingConfig:
     screenWidth_actual = 0
     screenHeight_actual = 0
 
+    # skipping objects that are entirely outside of the camera's view
+    frustumCulling = True
+
+    # splitting the screen into tiles and drawing those on all cpu cores, instead of drawing on one core
+    tiledRendering = False
+    # how big (in pixels) each square tile is
+    tileSize = 32
+
+    # keeping two frames around, so the one returned by getFrame() isn't drawn over by the next call
+    doubleBuffering = False
+
+    # drawing frames on another thread while the game updates (see enablePipelinedRendering() in pg3d.py)
+    pipelined = False
+
     def __init__(self, rMode, bfCulling, sWidth, sHeight, vFov, hFov, hFovA, vFovA, bMode, sWA, sHA):
         self.renderingMode = rMode
         self.backgroundMode = bMode
@@ -56,6 +80,89 @@ class RenderingConfig:
         self.screenWidth_actual = sWA
         self.screenHeight_actual = sHA
 
+        self.frustumCulling = True
+
+        self.tiledRendering = False
+        self.tileSize = 32
+
+        self.doubleBuffering = False
+
+        self.pipelined = False
+
+# some numbers about a frame, every frame gets a new set from new_frame_stats() which is filled in while it's drawn
+# frameStats is the set for the last frame that was finished (what getRenderStats() in pg3d.py gives)
+def new_frame_stats():
+    stats = {}
+    stats["models_drawn"] = 0
+    stats["models_culled"] = 0
+    # every triangle of every mesh that wasn't frustum culled (the same as adding up triangles_per_lod)
+    stats["triangles_submitted"] = 0
+    stats["triangles_backface_culled"] = 0
+    # triangles that crossed the camera's near plane and had to be cut down (see setup_triangles())
+    stats["triangles_clipped"] = 0
+    # triangles that made it to the rasterizer (after throwing out the ones behind the camera/facing away, and clipping)
+    stats["triangles_rasterized"] = 0
+    # pixels that were actually written (passed the z test)
+    stats["pixels_shaded"] = 0
+    stats["instances_drawn"] = 0
+    stats["instances_culled"] = 0
+    stats["static_batches_drawn"] = 0
+    stats["models_batched"] = 0
+    # how many triangles were sent to be drawn at each level of detail (index 0 is the full meshes, which is everything without levels of detail too)
+    stats["triangles_per_lod"] = [0]
+    # timings in milliseconds, filled in by getFrame() in pg3d.py
+    stats["snapshot_ms"] = 0
+    stats["render_ms"] = 0
+    stats["wait_ms"] = 0
+    stats["frame_latency_ms"] = 0
+    stats["frame_interval_ms"] = 0
+    stats["pipelined"] = False
+    return stats
+
+frameStats = new_frame_stats()
+
+def count_lod_triangles(stats, level, count):
+    trianglesPerLod = stats["triangles_per_lod"]
+    while (len(trianglesPerLod) <= level):
+        trianglesPerLod.append(0)
+    trianglesPerLod[level] += count
+    stats["triangles_submitted"] += count
+
+# a frame and the z buffer that goes with it
+class FrameBuffer:
+    def __init__(self, width, height):
+        self.frame = np.ones((width, height, 3), dtype=np.uint8)
+        # start with some SMALL value
+        # the value is small because the z buffer stores values of 1/z, so 0 represents the largest depth possible (it would be 1/infinity)
+        self.z_buffer = np.zeros((width, height))
+
+# the buffers getFrame() draws into, made once and then reused every frame (allocating new ones every frame adds up)
+# there's one of them, plus one for double buffering and one for pipelining (getFrame() takes turns between them)
+frameBuffers = []
+currentFrameBuffer = 0
+
+# the buffer the next frame should be drawn into
+# it still has whatever was drawn into it last time, clearing it is up to the caller
+def next_frame_buffer():
+    global currentFrameBuffer
+
+    bufferCount = 1
+    if (renderConfig.doubleBuffering):
+        bufferCount += 1
+    # (pipelined, one more frame is being drawn while the last one is shown)
+    if (renderConfig.pipelined):
+        bufferCount += 1
+
+    # (re)making the buffers if the resolution or the number of buffers changed
+    size = (renderConfig.screenWidth, renderConfig.screenHeight)
+    if (len(frameBuffers) != bufferCount or frameBuffers[0].z_buffer.shape != size):
+        frameBuffers.clear()
+        for i in range(bufferCount):
+            frameBuffers.append(FrameBuffer(renderConfig.screenWidth, renderConfig.screenHeight))
+
+    currentFrameBuffer = (currentFrameBuffer + 1) % bufferCount
+    return frameBuffers[currentFrameBuffer]
+
 def init(w, h, horfov, vertfov, horfovA, vertfovA, r, b, swa, sha):
     global renderConfig
 
@@ -63,6 +170,7 @@ def init(w, h, horfov, vertfov, horfovA, vertfovA, r, b, swa, sha):
 
 
 # figuring out whether a triangle is in front of the camera (return 0), behind (return 1), or both (return 2, needs to be clipped)
+@njit(cache=True)
 def triangle_state(points, triangle):
     state0 = True
     state1 = True
@@ -82,344 +190,721 @@ def triangle_state(points, triangle):
         return 2 # both
 
 # z-buffering is still used EVEN during wireframe
-def draw_model(mesh, frame, points, triangles, cameraTransform, light_dir, z_buffer, texture_uv, texture_map, texture, color, textureType):
-    global renderConfig
-
+# config is the renderConfig the frame was started with (see FrameSnapshot in pg3d.py), the numbers about what got drawn go into stats (see new_frame_stats())
+def draw_model(mesh, frame, points, triangles, cameraTransform, light_dir, z_buffer, texture_uv, texture_map, texture, color, textureType, config, stats):
     textureTypeIndex = 0
 
     if (textureType == "alphaclip"):
         textureTypeIndex = 1
 
-    # for the first part of things, we're gonna use the set of points that's transformed to be camera-relative
-    # in other words, indices 3,4 and 5
-
     # the size of the mesh's texture
-    text_size = [len(texture)-1, len(texture[0])-1]
-    for index in range(len(triangles)):
-        
-        triangle = triangles[index]
+    text_size = np.asarray([len(texture)-1, len(texture[0])-1])
 
-        # ******* STEP 1: *******
-        # we have to figure out which triangles are behind the camera, in front of the camera, or both (some verts behind, some in front)
+    # everything else (figuring out what's in front of the camera, clipping, drawing) happens in one compiled call
+    # doing this triangle by triangle from python was slower than the actual drawing
+    # back-facing triangles are thrown away before drawing, but wireframe still shows them (it always has)
+    rejectBackfaces = config.backfaceCulling and config.renderingMode != "wireframe"
 
-        # 0 if in front, 1 if behind, 2 if both
-        triangleState = triangle_state(points, triangle)
+    renderModeIndex = render_mode_index(config.renderingMode)
 
-        # only draw the triangle if state is 1, meaning entirely in front
-        if (triangleState == 0):
-            # ******* STEP 2: *******
-            # once we've confirmed we're drawing the shape, we have to project it onto the screen
-
-            # defining the points the triangle is made of
-            projpoints = []
-            projpoints.append(points[triangle[0]])
-            projpoints.append(points[triangle[1]])
-            projpoints.append(points[triangle[2]])
-            # (the points have their projected versions stored as indices 6,7,8)
-
-            # getting the depth values of each point (using 8, the projected depth)
-            z0 = 1 / projpoints[0][8]
-            z1 = 1 / projpoints[1][8]
-            z2 = 1 / projpoints[2][8]
-            # keep in mind that these are always positive here, because of the triangle state check
-
-            # figuring out the uv coordinates of each point
-            uv_points = texture_uv[texture_map[index]]
-            uv_points[0], uv_points[1], uv_points[2] = uv_points[0]*z0, uv_points[1]*z1, uv_points[2]*z2
-
-            # the bounding box that the triangle occupies
-            minX = np.min([projpoints[0][6],projpoints[1][6],projpoints[2][6]])
-            maxX = np.max([projpoints[0][6],projpoints[1][6],projpoints[2][6]])
-
-            minY = np.min([projpoints[0][7],projpoints[1][7],projpoints[2][7]])
-            maxY = np.max([projpoints[0][7],projpoints[1][7],projpoints[2][7]])
-
-            draw_triangle(renderConfig.screenWidth, renderConfig.screenHeight, frame, z_buffer, texture, projpoints, uv_points, minX, maxX, minY, maxY, text_size, z0, z1, z2,renderConfig.renderingMode, np.asarray([1,1,1]), renderConfig.backfaceCulling, textureTypeIndex)
-        elif(triangleState == 2):
-            # here, the triangle is both behind and in front, and we need to clip it
-
-            # defining the points the triangle is made of
-            projpoints = []
-            projpoints.append(points[triangle[0]])
-            projpoints.append(points[triangle[1]])
-            projpoints.append(points[triangle[2]])
-            # (the points have their projected versions stored as indices 6,7,8)
-
-            # getting the depth values of each point (using 8, the projected depth)
-            z0 = projpoints[0][8]
-            z1 = projpoints[1][8]
-            z2 = projpoints[2][8]
-            # these are NOT always positive! at least one will be <0
-
-            # ******* STEP 3: *******
-            # this step only applies to type-2 triangles
-            # we CANNOT, UNDER ANY CIRCUMSTANCES, render triangles behind the camera with our method
-            # don't try.
-            # instead:
-            # we have to clip the triangle, and then render the new 1 or 2 triangles
-            # these new triangles will be in front
-
-            # in other words:
-            # 1. figure out the problem vertices
-            # 2. figure out where the line segments intersect the z-plane
-            # 3. build new triangles, including things like uv coordinates
-            # 4. feed those triangles to draw_triangle
-
-            problemVertices = []
-            goodVertices = []
-            goodUV = []
-            problemUV = []
-
-            rawUVs = texture_uv[texture_map[index]]
-
-            # null value
-            v0state = 0
-            v1state = 0
-            v2state = 0
-
-            # add any <0 vertices to a list
-            # using the same index convention as normal points
-            if (z0 <= 0):
-                v0state = -1
-                problemVertices.append(np.asarray([0.0,0.0,0.0,projpoints[0][3],projpoints[0][4],projpoints[0][5],projpoints[0][6],projpoints[0][7],projpoints[0][8]]))
-                problemUV.append(rawUVs[0])
-            else:
-                v0state = 1
-                goodVertices.append(np.asarray([0.0,0.0,0.0,projpoints[0][3],projpoints[0][4],projpoints[0][5],projpoints[0][6],projpoints[0][7],projpoints[0][8]]))
-                goodUV.append(rawUVs[0])
-            if (z1 <= 0):
-                # vertex 1 is not valid
-                v1state = -1
-                problemVertices.append(np.asarray([0.0,0.0,0.0,projpoints[1][3],projpoints[1][4],projpoints[1][5],projpoints[1][6],projpoints[1][7],projpoints[1][8]]))
-                problemUV.append(rawUVs[1])
-            else:
-                # vertex 1 is valid
-                v1state = 1
-                goodVertices.append(np.asarray([0.0,0.0,0.0,projpoints[1][3],projpoints[1][4],projpoints[1][5],projpoints[1][6],projpoints[1][7],projpoints[1][8]]))
-                goodUV.append(rawUVs[1])
-            if (z2 <= 0):
-                v2state = -1
-                problemVertices.append(np.asarray([0.0,0.0,0.0,projpoints[2][3],projpoints[2][4],projpoints[2][5],projpoints[2][6],projpoints[2][7],projpoints[2][8]]))
-                problemUV.append(rawUVs[2])
-            else:
-                v2state = 1
-                goodVertices.append(np.asarray([0.0,0.0,0.0,projpoints[2][3],projpoints[2][4],projpoints[2][5],projpoints[2][6],projpoints[2][7],projpoints[2][8]]))
-                goodUV.append(rawUVs[2])
-
-            if (len(problemVertices) == 2):
-                # first case, where two vertices are behind
-                # here we will end up with one clipped triangle
-
-                # getting the intersect point in camera-relative space
-                # using 3, 4, 5 because we want cam-relative
-
-                # here is our triangle as-is
-                if (v1state == 1):
-                    p1 = np.asarray([goodVertices[0][3],goodVertices[0][4],goodVertices[0][5]])
-                    p2 = np.asarray([problemVertices[1][3],problemVertices[1][4],problemVertices[1][5]])
-                    p3 = np.asarray([problemVertices[0][3],problemVertices[0][4],problemVertices[0][5]])
-
-                    parameter = (0.01 - p2[2]) / (p1[2] - p2[2])
-                    intersect1 = m.add_3d(p2, np.asarray([(p1[0]-p2[0]) * parameter,(p1[1]-p2[1]) * parameter,(p1[2]-p2[2]) * parameter]))
-                    goodVertices.append(np.asarray([0.0,0.0,0.0,intersect1[0],intersect1[1],intersect1[2],0.0,0.0,0.0]))
-                    goodUV.append(np.asarray([problemUV[1][0] + (goodUV[0][0] - problemUV[1][0]) * parameter, problemUV[1][1] + (goodUV[0][1] - problemUV[1][1]) * parameter]))
-
-                    parameter = (0.01 - p3[2]) / (p1[2] - p3[2])
-                    intersect1 = m.add_3d(p3, np.asarray([(p1[0]-p3[0]) * parameter,(p1[1]-p3[1]) * parameter,(p1[2]-p3[2]) * parameter]))
-                    goodVertices.append(np.asarray([0.0,0.0,0.0,intersect1[0],intersect1[1],intersect1[2],0.0,0.0,0.0]))
-                    goodUV.append(np.asarray([problemUV[0][0] + (goodUV[0][0] - problemUV[0][0]) * parameter, problemUV[0][1] + (goodUV[0][1] - problemUV[0][1]) * parameter]))
-                else:
-                    p1 = np.asarray([goodVertices[0][3],goodVertices[0][4],goodVertices[0][5]])
-                    p2 = np.asarray([problemVertices[0][3],problemVertices[0][4],problemVertices[0][5]])
-                    p3 = np.asarray([problemVertices[1][3],problemVertices[1][4],problemVertices[1][5]])
-
-                    parameter = (0.01 - p2[2]) / (p1[2] - p2[2])
-                    intersect1 = m.add_3d(p2, np.asarray([(p1[0]-p2[0]) * parameter,(p1[1]-p2[1]) * parameter,(p1[2]-p2[2]) * parameter]))
-                    goodVertices.append(np.asarray([0.0,0.0,0.0,intersect1[0],intersect1[1],intersect1[2],0.0,0.0,0.0]))
-                    goodUV.append(np.asarray([problemUV[0][0] + (goodUV[0][0] - problemUV[0][0]) * parameter, problemUV[0][1] + (goodUV[0][1] - problemUV[0][1]) * parameter]))
-
-                    parameter = (0.01 - p3[2]) / (p1[2] - p3[2])
-                    intersect1 = m.add_3d(p3, np.asarray([(p1[0]-p3[0]) * parameter,(p1[1]-p3[1]) * parameter,(p1[2]-p3[2]) * parameter]))
-                    goodVertices.append(np.asarray([0.0,0.0,0.0,intersect1[0],intersect1[1],intersect1[2],0.0,0.0,0.0]))
-                    goodUV.append(np.asarray([problemUV[1][0] + (goodUV[0][0] - problemUV[1][0]) * parameter, problemUV[1][1] + (goodUV[0][1] - problemUV[1][1]) * parameter]))
-
-                # the good vertices array will have items with ONLY SIX VALUES, representing the cam-relative points and then the projected points
-                # however, right now the projected part is all zeros
-
-                goodVertices[1][6] = (-renderConfig.hor_fov_adjust*goodVertices[1][3]/np.abs(goodVertices[1][5]) + 0.5*renderConfig.screenWidth).astype(np.int32)
-                goodVertices[1][7] = (-renderConfig.ver_fov_adjust*goodVertices[1][4]/np.abs(goodVertices[1][5]) + 0.5*renderConfig.screenHeight).astype(np.int32)
-                goodVertices[1][8] = goodVertices[1][5] 
-
-                goodVertices[2][6] = (-renderConfig.hor_fov_adjust*goodVertices[2][3]/np.abs(goodVertices[2][5]) + 0.5*renderConfig.screenWidth).astype(np.int32)
-                goodVertices[2][7] = (-renderConfig.ver_fov_adjust*goodVertices[2][4]/np.abs(goodVertices[2][5]) + 0.5*renderConfig.screenHeight).astype(np.int32)
-                goodVertices[2][8] = goodVertices[2][5]     
-
-                # the bounding box that the triangle occupies
-                minX = np.min([goodVertices[0][6],goodVertices[1][6],goodVertices[2][6]])
-                maxX = np.max([goodVertices[0][6],goodVertices[1][6],goodVertices[2][6]])
-
-                minY = np.min([goodVertices[0][7],goodVertices[1][7],projpoints[2][7]])
-                maxY = np.max([goodVertices[0][7],goodVertices[1][7],projpoints[2][7]])
-
-                # new z values!
-                z0 = 1 / goodVertices[0][8]
-                z1 = 1 / goodVertices[1][8]
-                z2 = 1 / goodVertices[2][8]
-
-                goodUV[0] = goodUV[0] * z0
-                goodUV[1] = goodUV[1] * z1
-                goodUV[2] = goodUV[2] * z2
-
-                # now that we have our three triangle points (not behind the camera anymore), we can draw them
-
-                draw_triangle(renderConfig.screenWidth, renderConfig.screenHeight, frame, z_buffer, texture, goodVertices, goodUV, minX, maxX, minY, maxY, text_size, z0, z1, z2,renderConfig.renderingMode, np.asarray([1,1,1]), renderConfig.backfaceCulling, textureTypeIndex)
-            elif (len(problemVertices) == 1):
-                # here only one vertex is an issue
-                # the procedure is similar, but we end up with two triangles
-
-                if (v1state == -1):
-                    rColor = np.asarray([0,255,0])
-                elif (v0state == -1):
-                    rColor = np.asarray([255,0,0])
-                elif (v2state == -1):
-                    rColor = np.asarray([0,0,255])
-
-                # here is our triangle as-is
-                p1 = np.asarray([goodVertices[0][3],goodVertices[0][4],goodVertices[0][5]])
-                p2 = np.asarray([goodVertices[1][3],goodVertices[1][4],goodVertices[1][5]])
-                p3 = np.asarray([problemVertices[0][3],problemVertices[0][4],problemVertices[0][5]])
-
-                parameter = (0.01 - p3[2]) / (p1[2] - p3[2])
-                intersect1 = m.add_3d(p3, np.asarray([(p1[0]-p3[0]) * parameter,(p1[1]-p3[1]) * parameter,(p1[2]-p3[2]) * parameter]))
-                goodVertices.append(np.asarray([0.0,0.0,0.0,intersect1[0],intersect1[1],intersect1[2],0.0,0.0,0.0]))
-                goodUV.append(np.asarray([problemUV[0][0] + (goodUV[0][0] - problemUV[0][0]) * parameter, problemUV[0][1] + (goodUV[0][1] - problemUV[0][1]) * parameter]))
-
-                parameter = (0.01 - p3[2]) / (p2[2] - p3[2])
-                intersect1 = m.add_3d(p3, np.asarray([(p2[0]-p3[0]) * parameter,(p2[1]-p3[1]) * parameter,(p2[2]-p3[2]) * parameter]))
-                goodVertices.append(np.asarray([0.0,0.0,0.0,intersect1[0],intersect1[1],intersect1[2],0.0,0.0,0.0]))
-                goodUV.append(np.asarray([problemUV[0][0] + (goodUV[1][0] - problemUV[0][0]) * parameter, problemUV[0][1] + (goodUV[1][1] - problemUV[0][1]) * parameter]))
-
-                goodVertices[2][6] = (-renderConfig.hor_fov_adjust*goodVertices[2][3]/np.abs(goodVertices[2][5]) + 0.5*renderConfig.screenWidth).astype(np.int32)
-                goodVertices[2][7] = (-renderConfig.ver_fov_adjust*goodVertices[2][4]/np.abs(goodVertices[2][5]) + 0.5*renderConfig.screenHeight).astype(np.int32)
-                goodVertices[2][8] = goodVertices[2][5] 
-
-                goodVertices[3][6] = (-renderConfig.hor_fov_adjust*goodVertices[3][3]/np.abs(goodVertices[3][5]) + 0.5*renderConfig.screenWidth).astype(np.int32)
-                goodVertices[3][7] = (-renderConfig.ver_fov_adjust*goodVertices[3][4]/np.abs(goodVertices[3][5]) + 0.5*renderConfig.screenHeight).astype(np.int32)
-                goodVertices[3][8] = goodVertices[3][5] 
-
-                # this is where we have to turn our array of four points into two triangles
-
-                if (v1state == -1):
-                    good1 = np.asarray([goodVertices[0],goodVertices[2],goodVertices[1]])
-                    good2 = np.asarray([goodVertices[1],goodVertices[2],goodVertices[3]])
-                else:
-                    good1 = np.asarray([goodVertices[0],goodVertices[1],goodVertices[2]])
-                    good2 = np.asarray([goodVertices[1],goodVertices[3],goodVertices[2]])
-
-                # the bounding box that the triangle occupies
-                minX1 = np.min([good1[0][6],good1[1][6],good1[2][6]])
-                maxX1 = np.max([good1[0][6],good1[1][6],good1[2][6]])
-
-                minY1 = np.min([good1[0][7],good1[1][7],good1[2][7]])
-                maxY1 = np.max([good1[0][7],good1[1][7],good1[2][7]])
-
-                minX2 = np.min([good2[0][6],good2[1][6],good2[2][6]])
-                maxX2 = np.max([good2[0][6],good2[1][6],good2[2][6]])
-
-                minY2 = np.min([good2[0][7],good2[1][7],good2[2][7]])
-                maxY2 = np.max([good2[0][7],good2[1][7],good2[2][7]])
+    if (config.tiledRendering):
+        backfaceCount, clippedCount, rasterizedCount, pixels = render_mesh_tiled(config.screenWidth, config.screenHeight, config.hor_fov_adjust, config.ver_fov_adjust, frame, z_buffer, points, triangles, texture_uv, texture_map, texture, text_size, renderModeIndex, np.asarray([1,1,1]), config.backfaceCulling, textureTypeIndex, config.tileSize, rejectBackfaces)
+    else:
+        backfaceCount, clippedCount, rasterizedCount, pixels = render_mesh(config.screenWidth, config.screenHeight, config.hor_fov_adjust, config.ver_fov_adjust, frame, z_buffer, points, triangles, texture_uv, texture_map, texture, text_size, renderModeIndex, np.asarray([1,1,1]), config.backfaceCulling, textureTypeIndex, rejectBackfaces)
+
+    stats["triangles_backface_culled"] += backfaceCount
+    stats["triangles_clipped"] += clippedCount
+    stats["triangles_rasterized"] += rasterizedCount
+    stats["pixels_shaded"] += pixels
 
-                # new z values!
-                z01 = 1 / good1[0][8]
-                z11 = 1 / good1[1][8]
-                z21 = 1 / good1[2][8]
+# draws every instance of an InstancedModel (see render_instances())
+# viewMatrix comes from camera_view_matrix() in pg3d.py
+def draw_instances(instanced, frame, z_buffer, viewMatrix, config, stats):
+    textureTypeIndex = 0
+    if (instanced.textureType == "alphaclip"):
+        textureTypeIndex = 1
+
+    text_size = np.asarray([len(instanced.texture)-1, len(instanced.texture[0])-1])
+
+    rejectBackfaces = config.backfaceCulling and config.renderingMode != "wireframe"
+
+    drawn, culled, backfaceCount, clippedCount, rasterizedCount, pixels = render_instances(config.screenWidth, config.screenHeight, config.hor_fov_adjust, config.ver_fov_adjust, frame, z_buffer,
+                                   instanced.points, instanced.triangles, instanced.texture_uv, instanced.texture_map, instanced.texture, text_size,
+                                   render_mode_index(config.renderingMode), config.backfaceCulling, textureTypeIndex, rejectBackfaces,
+                                   viewMatrix, instanced.positions, instanced.forwards, instanced.ups, instanced.scales, instanced.colors, instanced.count,
+                                   config.frustumCulling, instanced.boundsCenter, instanced.boundsRadius, instanced.boundsMin, instanced.boundsMax,
+                                   np.tan(config.horizontalFOV * 0.5), np.tan(config.verticalFOV * 0.5),
+                                   config.tiledRendering, config.tileSize, instanceBatchSize)
+
+    stats["instances_drawn"] += drawn
+    count_lod_triangles(stats, 0, drawn * len(instanced.triangles))
+    stats["instances_culled"] += culled
+    stats["triangles_backface_culled"] += backfaceCount
+    stats["triangles_clipped"] += clippedCount
+    stats["triangles_rasterized"] += rasterizedCount
+    stats["pixels_shaded"] += pixels
+
+# with tiled rendering, instances are set up until this many triangles are waiting, then drawn all together
+instanceBatchSize = 65536
+
+# whether any part of a mesh could end up on the screen
+# matrix is the same 3x4 model -> camera matrix that transform_vertices() uses, the bounds come from utils.mesh_bounds()
+
+# if this says no, every triangle of the mesh would have been skipped anyways (all behind the camera, or all off one edge of the screen),
+# so skipping the whole thing doesn't change what gets drawn
+@njit(cache=True)
+def mesh_in_frustum(matrix, center, radius, boxMin, boxMax, tanHalfHorizontal, tanHalfVertical):
+    # the sphere, in camera space
+    x = matrix[0,0] * center[0] + matrix[0,1] * center[1] + matrix[0,2] * center[2] + matrix[0,3]
+    y = matrix[1,0] * center[0] + matrix[1,1] * center[1] + matrix[1,2] * center[2] + matrix[1,3]
+    z = matrix[2,0] * center[0] + matrix[2,1] * center[1] + matrix[2,2] * center[2] + matrix[2,3]
+
+    # scaling stretches the sphere by (at most) the biggest column of the matrix
+    biggestScale = 0.0
+    for j in range(3):
+        biggestScale = max(biggestScale, np.sqrt(matrix[0,j] * matrix[0,j] + matrix[1,j] * matrix[1,j] + matrix[2,j] * matrix[2,j]))
+    # a tiny bit of slack, so rounding errors never cull something that's right on the edge
+    r = radius * biggestScale * 1.000001 + 0.000001
+
+    # entirely behind the camera
+    if (z + r < 0):
+        return False
+
+    # the side planes of the view pyramid, as (cos, sin) pairs
+    cosH = 1 / np.sqrt(1 + tanHalfHorizontal * tanHalfHorizontal)
+    sinH = tanHalfHorizontal * cosH
+    cosV = 1 / np.sqrt(1 + tanHalfVertical * tanHalfVertical)
+    sinV = tanHalfVertical * cosV
+
+    if (x * cosH - z * sinH > r or -x * cosH - z * sinH > r):
+        return False
+    if (y * cosV - z * sinV > r or -y * cosV - z * sinV > r):
+        return False
+
+    # the sphere can be pretty loose for long/flat meshes, so if it's still in view, try the box too
+    # if all 8 corners are outside the same plane, so is everything in between
+    outside = np.zeros(5, dtype=np.int64)
+    for corner in range(8):
+        cx = boxMax[0] if (corner & 1) else boxMin[0]
+        cy = boxMax[1] if (corner & 2) else boxMin[1]
+        cz = boxMax[2] if (corner & 4) else boxMin[2]
+
+        x = matrix[0,0] * cx + matrix[0,1] * cy + matrix[0,2] * cz + matrix[0,3]
+        y = matrix[1,0] * cx + matrix[1,1] * cy + matrix[1,2] * cz + matrix[1,3]
+        z = matrix[2,0] * cx + matrix[2,1] * cy + matrix[2,2] * cz + matrix[2,3]
+
+        slack = 0.000001 * (np.abs(x) + np.abs(y) + np.abs(z)) + 0.000001
+        if (z < -slack):
+            outside[0] += 1
+        if (x - z * tanHalfHorizontal > slack):
+            outside[1] += 1
+        if (-x - z * tanHalfHorizontal > slack):
+            outside[2] += 1
+        if (y - z * tanHalfVertical > slack):
+            outside[3] += 1
+        if (-y - z * tanHalfVertical > slack):
+            outside[4] += 1
+
+    for i in range(5):
+        if (outside[i] == 8):
+            return False
+
+    return True
+
+# moves a mesh's points into camera space and projects them onto the screen, all at once
+# matrix is 3x4, and goes straight from the mesh file's coordinates to camera-relative ones (see transform_points() in pg3d.py)
+# reads indices 0,1,2 of every point, writes 3,4,5 (camera-relative) and 6,7,8 (projected)
+@njit(nogil=True, cache=True)
+def transform_vertices(points, matrix, sW, sH, hor_fov_adjust, ver_fov_adjust):
+    for i in range(len(points)):
+        x = points[i,0]
+        y = points[i,1]
+        z = points[i,2]
+
+        camX = matrix[0,0] * x + matrix[0,1] * y + matrix[0,2] * z + matrix[0,3]
+        camY = matrix[1,0] * x + matrix[1,1] * y + matrix[1,2] * z + matrix[1,3]
+        camZ = matrix[2,0] * x + matrix[2,1] * y + matrix[2,2] * z + matrix[2,3]
+
+        points[i,3] = camX
+        points[i,4] = camY
+        points[i,5] = camZ
+
+        points[i,6] = project_coordinate(-hor_fov_adjust * camX, np.abs(camZ), 0.5 * sW)
+        points[i,7] = project_coordinate(-ver_fov_adjust * camY, np.abs(camZ), 0.5 * sH)
+        points[i,8] = camZ
+
+# (a / b + offset) rounded towards 0, for projecting onto the screen
+# points sitting exactly on the camera plane (b = 0) or way off screen give the same garbage value numpy's int32 cast does,
+# instead of numba throwing a ZeroDivisionError
+@njit(cache=True)
+def project_coordinate(a, b, offset):
+    if (b == 0):
+        return -2147483648
+    value = a / b + offset
+    if (not (value > -2147483648.0 and value < 2147483648.0)):
+        return -2147483648
+    return int(value)
+
+# 1 / z, except numba throws an error when dividing by zero (numpy just gives infinity, which is what we want here)
+@njit(cache=True)
+def inverse_depth(z):
+    if (z == 0):
+        return np.copysign(np.inf, z)
+    return 1 / z
+
+# writes a triangle into the setup buffers (see setup_triangles())
+# each corner is a projected screen position (sx, sy), a camera-relative depth z and a uv coordinate
+# returns 1 if the triangle was written, or 0 if it was thrown out for facing away from the camera (only when rejectBackfaces is true)
+@njit(cache=True)
+def emit_triangle(tri_screen, tri_uv, tri_bounds, slot, sx0, sy0, z0, sx1, sy1, z1, sx2, sy2, z2, u0, v0, u1, v1, u2, v2, rejectBackfaces):
+    if (rejectBackfaces):
+        # twice the signed area of the triangle on screen
+        # this is what the three edge checks in draw_triangle() add up to for ANY pixel, so if it's negative no pixel can pass all three
+        if ((sx2 - sx0) * (sy1 - sy0) - (sy2 - sy0) * (sx1 - sx0) < 0):
+            return 0
+
+    iz0 = inverse_depth(z0)
+    iz1 = inverse_depth(z1)
+    iz2 = inverse_depth(z2)
+
+    tri_screen[slot, 0, 0] = sx0
+    tri_screen[slot, 0, 1] = sy0
+    tri_screen[slot, 0, 2] = iz0
+    tri_screen[slot, 1, 0] = sx1
+    tri_screen[slot, 1, 1] = sy1
+    tri_screen[slot, 1, 2] = iz1
+    tri_screen[slot, 2, 0] = sx2
+    tri_screen[slot, 2, 1] = sy2
+    tri_screen[slot, 2, 2] = iz2
+
+    # the uv coords are divided by z here so they can be interpolated in screen space (perspective correction)
+    tri_uv[slot, 0, 0] = u0 * iz0
+    tri_uv[slot, 0, 1] = v0 * iz0
+    tri_uv[slot, 1, 0] = u1 * iz1
+    tri_uv[slot, 1, 1] = v1 * iz1
+    tri_uv[slot, 2, 0] = u2 * iz2
+    tri_uv[slot, 2, 1] = v2 * iz2
+
+    # the bounding box that the triangle occupies
+    tri_bounds[slot, 0] = int(min(sx0, sx1, sx2))
+    tri_bounds[slot, 1] = int(max(sx0, sx1, sx2))
+    tri_bounds[slot, 2] = int(min(sy0, sy1, sy2))
+    tri_bounds[slot, 3] = int(max(sy0, sy1, sy2))
+
+    return 1
+
+# figures out every triangle of a mesh that has to be drawn, and where on the screen it goes
+# triangles that are partly behind the camera get clipped into 1 or 2 new triangles here
+# (clipping algorithm --> https://gabrielgambetta.com/computer-graphics-from-scratch/11-clipping.html)
+
+# the results go into tri_screen (x, y, 1/z for each corner), tri_uv (uv / z for each corner) and tri_bounds (minX, maxX, minY, maxY)
+# these need room for 2 triangles per mesh triangle, since clipping can turn one into two
+# with rejectBackfaces, triangles facing away from the camera are thrown out here (instead of pixel by pixel in draw_triangle())
+# returns how many triangles were written, how many were thrown out for facing away, and how many had to be clipped
+@njit(cache=True)
+def setup_triangles(points, triangles, texture_uv, texture_map, sW, sH, hor_fov_adjust, ver_fov_adjust, tri_screen, tri_uv, tri_bounds, rejectBackfaces):
+    count = 0
+    backfaceCount = 0
+    clippedCount = 0
+
+    # scratch space for the clipped points, camera-relative (x, y, z), then projected (x, y), then uv (u, v)
+    clipped = np.zeros((2, 7))
+
+    for index in range(len(triangles)):
+        triangle = triangles[index]
 
-                z02 = 1 / good2[0][8]
-                z12 = 1 / good2[1][8]
-                z22 = 1 / good2[2][8]
+        # 0 if in front, 1 if behind, 2 if both
+        triangleState = triangle_state(points, triangle)
 
-                if (v1state == -1):
-                    uv1 = np.asarray([goodUV[0] * z01,goodUV[2] * z11,goodUV[1] * z21])
-                    uv2 = np.asarray([goodUV[1] * z02,goodUV[2] * z12,goodUV[3] * z22])
-                else:
-                    uv1 = np.asarray([goodUV[0] * z01,goodUV[1] * z11,goodUV[2] * z21])
-                    uv2 = np.asarray([goodUV[1] * z02,goodUV[3] * z12,goodUV[2] * z22])
+        # we do nothing if the triangle is all behind, we just skip those
+        if (triangleState == 1):
+            continue
 
-                draw_triangle(renderConfig.screenWidth, renderConfig.screenHeight, frame, z_buffer, texture, good1, uv1, minX1, maxX1, minY1, maxY1, text_size, z01, z11, z21,renderConfig.renderingMode, np.asarray([1,1,1]), renderConfig.backfaceCulling, textureTypeIndex)
-                draw_triangle(renderConfig.screenWidth, renderConfig.screenHeight, frame, z_buffer, texture, good2, uv2, minX2, maxX2, minY2, maxY2, text_size, z02, z12, z22,renderConfig.renderingMode, np.asarray([1,1,1]), renderConfig.backfaceCulling, textureTypeIndex)
+        uvs = texture_map[index]
 
+        if (triangleState == 0):
+            a = points[triangle[0]]
+            b = points[triangle[1]]
+            c = points[triangle[2]]
+            written = emit_triangle(tri_screen, tri_uv, tri_bounds, count,
+                          a[6], a[7], a[8], b[6], b[7], b[8], c[6], c[7], c[8],
+                          texture_uv[uvs[0]][0], texture_uv[uvs[0]][1], texture_uv[uvs[1]][0], texture_uv[uvs[1]][1], texture_uv[uvs[2]][0], texture_uv[uvs[2]][1], rejectBackfaces)
+            count += written
+            backfaceCount += 1 - written
+            continue
+
+        # here, the triangle is both behind and in front, and we need to clip it
+        # we CANNOT, UNDER ANY CIRCUMSTANCES, render triangles behind the camera with our method
+        clippedCount += 1
+
+        # figure out which corners are the problem (at or behind the camera)
+        problemCount = 0
+        for k in range(3):
+            if (points[triangle[k]][8] <= 0):
+                problemCount += 1
+
+        if (problemCount == 2):
+            # two vertices are behind, so we end up with one clipped triangle
+            good = 0
+            for k in range(3):
+                if (not points[triangle[k]][8] <= 0):
+                    good = k
+
+            g = points[triangle[good]]
+            gu = texture_uv[uvs[good]][0]
+            gv = texture_uv[uvs[good]][1]
+
+            # walking around the triangle starting at the good corner keeps the winding order the same
+            for n in range(2):
+                problem = (good + 1 + n) % 3
+                p = points[triangle[problem]]
+                pu = texture_uv[uvs[problem]][0]
+                pv = texture_uv[uvs[problem]][1]
+
+                # where the edge crosses the clipping plane (using 3, 4, 5 because we want cam-relative)
+                parameter = (0.01 - p[5]) / (g[5] - p[5])
+                clip_edge(clipped, n, p[3], p[4], p[5], g[3], g[4], g[5], pu, pv, gu, gv, parameter, sW, sH, hor_fov_adjust, ver_fov_adjust)
+
+            written = emit_triangle(tri_screen, tri_uv, tri_bounds, count,
+                          g[6], g[7], g[8], clipped[0, 3], clipped[0, 4], clipped[0, 2], clipped[1, 3], clipped[1, 4], clipped[1, 2],
+                          gu, gv, clipped[0, 5], clipped[0, 6], clipped[1, 5], clipped[1, 6], rejectBackfaces)
+            count += written
+            backfaceCount += 1 - written
+        elif (problemCount == 1):
+            # here only one vertex is an issue
+            # the procedure is similar, but we end up with two triangles
+            problem = 0
+            for k in range(3):
+                if (points[triangle[k]][8] <= 0):
+                    problem = k
+
+            # the two good corners, in order
+            goodA = 0 if problem != 0 else 1
+            goodB = 2 if problem != 2 else 1
+
+            p = points[triangle[problem]]
+            pu = texture_uv[uvs[problem]][0]
+            pv = texture_uv[uvs[problem]][1]
+
+            ga = points[triangle[goodA]]
+            gau = texture_uv[uvs[goodA]][0]
+            gav = texture_uv[uvs[goodA]][1]
+
+            gb = points[triangle[goodB]]
+            gbu = texture_uv[uvs[goodB]][0]
+            gbv = texture_uv[uvs[goodB]][1]
+
+            parameter = (0.01 - p[5]) / (ga[5] - p[5])
+            clip_edge(clipped, 0, p[3], p[4], p[5], ga[3], ga[4], ga[5], pu, pv, gau, gav, parameter, sW, sH, hor_fov_adjust, ver_fov_adjust)
+            parameter = (0.01 - p[5]) / (gb[5] - p[5])
+            clip_edge(clipped, 1, p[3], p[4], p[5], gb[3], gb[4], gb[5], pu, pv, gbu, gbv, parameter, sW, sH, hor_fov_adjust, ver_fov_adjust)
+
+            # this is where we have to turn our four points into two triangles
+            if (problem == 1):
+                written = emit_triangle(tri_screen, tri_uv, tri_bounds, count,
+                              ga[6], ga[7], ga[8], clipped[0, 3], clipped[0, 4], clipped[0, 2], gb[6], gb[7], gb[8],
+                              gau, gav, clipped[0, 5], clipped[0, 6], gbu, gbv, rejectBackfaces)
+                count += written
+                backfaceCount += 1 - written
+                written = emit_triangle(tri_screen, tri_uv, tri_bounds, count,
+                              gb[6], gb[7], gb[8], clipped[0, 3], clipped[0, 4], clipped[0, 2], clipped[1, 3], clipped[1, 4], clipped[1, 2],
+                              gbu, gbv, clipped[0, 5], clipped[0, 6], clipped[1, 5], clipped[1, 6], rejectBackfaces)
+                count += written
+                backfaceCount += 1 - written
+            else:
+                written = emit_triangle(tri_screen, tri_uv, tri_bounds, count,
+                              ga[6], ga[7], ga[8], gb[6], gb[7], gb[8], clipped[0, 3], clipped[0, 4], clipped[0, 2],
+                              gau, gav, gbu, gbv, clipped[0, 5], clipped[0, 6], rejectBackfaces)
+                count += written
+                backfaceCount += 1 - written
+                written = emit_triangle(tri_screen, tri_uv, tri_bounds, count,
+                              gb[6], gb[7], gb[8], clipped[1, 3], clipped[1, 4], clipped[1, 2], clipped[0, 3], clipped[0, 4], clipped[0, 2],
+                              gbu, gbv, clipped[1, 5], clipped[1, 6], clipped[0, 5], clipped[0, 6], rejectBackfaces)
+                count += written
+                backfaceCount += 1 - written
+
+    return count, backfaceCount, clippedCount
+
+# moves point p along the edge towards point g by the parameter, and projects the result onto the screen
+# the result goes into row n of clipped, as (x, y, z, screen x, screen y, u, v)
+@njit(cache=True)
+def clip_edge(clipped, n, px, py, pz, gx, gy, gz, pu, pv, gu, gv, parameter, sW, sH, hor_fov_adjust, ver_fov_adjust):
+    x = px + (gx - px) * parameter
+    y = py + (gy - py) * parameter
+    z = pz + (gz - pz) * parameter
+
+    clipped[n, 0] = x
+    clipped[n, 1] = y
+    clipped[n, 2] = z
+    clipped[n, 3] = int(-hor_fov_adjust * x / np.abs(z) + 0.5 * sW)
+    clipped[n, 4] = int(-ver_fov_adjust * y / np.abs(z) + 0.5 * sH)
+    clipped[n, 5] = pu + (gu - pu) * parameter
+    clipped[n, 6] = pv + (gv - pv) * parameter
+
+# draws the triangles that setup_triangles() produced, in order
+# returns how many pixels were drawn (see raster_triangle())
+@njit(cache=True)
+def rasterize_triangles(sW, sH, frame, z_buffer, texture, text_size, tri_screen, tri_uv, tri_bounds, count, renderMode, color, cullBack, textureType):
+    pixels = 0
+    for t in range(count):
+        pixels += draw_triangle(sW, sH, frame, z_buffer, texture, tri_screen[t], tri_uv[t], tri_bounds[t, 0], tri_bounds[t, 1], tri_bounds[t, 2], tri_bounds[t, 3], text_size, tri_screen[t, 0, 2], tri_screen[t, 1, 2], tri_screen[t, 2, 2], renderMode, color, cullBack, textureType)
+    return pixels
+
+# the whole mesh in one go: classify + clip every triangle, then draw them
+# points have to already be transformed/projected (see transform_points() in pg3d.py)
+# (nogil lets these run on another thread while python keeps going, see enablePipelinedRendering() in pg3d.py)
+@njit(nogil=True, cache=True)
+# returns how many triangles were thrown out for facing away from the camera, how many were clipped, how many were sent to be drawn, and how many pixels were drawn
+def render_mesh(sW, sH, hor_fov_adjust, ver_fov_adjust, frame, z_buffer, points, triangles, texture_uv, texture_map, texture, text_size, renderMode, color, cullBack, textureType, rejectBackfaces):
+    # clipping can turn one triangle into two, so there has to be room for that
+    tri_screen = np.empty((2 * len(triangles), 3, 3))
+    tri_uv = np.empty((2 * len(triangles), 3, 2))
+    tri_bounds = np.empty((2 * len(triangles), 4), dtype=np.int64)
+
+    count, backfaceCount, clippedCount = setup_triangles(points, triangles, texture_uv, texture_map, sW, sH, hor_fov_adjust, ver_fov_adjust, tri_screen, tri_uv, tri_bounds, rejectBackfaces)
+    pixels = rasterize_triangles(sW, sH, frame, z_buffer, texture, text_size, tri_screen, tri_uv, tri_bounds, count, renderMode, color, cullBack, textureType)
+
+    return backfaceCount, clippedCount, count, pixels
+
+# same as render_mesh(), but drawing with rasterize_triangles_tiled()
+@njit(nogil=True, cache=True)
+def render_mesh_tiled(sW, sH, hor_fov_adjust, ver_fov_adjust, frame, z_buffer, points, triangles, texture_uv, texture_map, texture, text_size, renderMode, color, cullBack, textureType, tileSize, rejectBackfaces):
+    tri_screen = np.empty((2 * len(triangles), 3, 3))
+    tri_uv = np.empty((2 * len(triangles), 3, 2))
+    tri_bounds = np.empty((2 * len(triangles), 4), dtype=np.int64)
+
+    count, backfaceCount, clippedCount = setup_triangles(points, triangles, texture_uv, texture_map, sW, sH, hor_fov_adjust, ver_fov_adjust, tri_screen, tri_uv, tri_bounds, rejectBackfaces)
+    pixels = rasterize_triangles_tiled(sW, sH, frame, z_buffer, texture, text_size, tri_screen, tri_uv, tri_bounds, count, renderMode, color, cullBack, textureType, tileSize)
+
+    return backfaceCount, clippedCount, count, pixels
+
+# sorts triangles into the square screen tiles their bounding boxes touch
+# returns (start of each tile's list, the lists themselves), so tile i owns bins[binStarts[i]:binStarts[i + 1]]
+# triangles stay in the order they were submitted inside each tile, which is what keeps this identical to drawing them one by one
+@njit(cache=True)
+def bin_triangles(sW, sH, tri_bounds, count, tileSize):
+    tilesX = (sW + tileSize - 1) // tileSize
+    tilesY = (sH + tileSize - 1) // tileSize
+
+    binStarts = np.zeros(tilesX * tilesY + 1, dtype=np.int64)
+
+    # first pass: how many triangles land in each tile
+    for t in range(count):
+        # draw_triangle() never goes past maxX/maxY, so they're exclusive here too
+        x0 = max(tri_bounds[t, 0], 0)
+        x1 = min(tri_bounds[t, 1], sW)
+        y0 = max(tri_bounds[t, 2], 0)
+        y1 = min(tri_bounds[t, 3], sH)
+        if (x0 >= x1 or y0 >= y1):
+            continue
+
+        for ty in range(y0 // tileSize, (y1 - 1) // tileSize + 1):
+            for tx in range(x0 // tileSize, (x1 - 1) // tileSize + 1):
+                binStarts[ty * tilesX + tx + 1] += 1
+
+    for i in range(tilesX * tilesY):
+        binStarts[i + 1] += binStarts[i]
+
+    # second pass: actually filling the lists
+    bins = np.empty(binStarts[tilesX * tilesY], dtype=np.int64)
+    filled = binStarts[:-1].copy()
+    for t in range(count):
+        x0 = max(tri_bounds[t, 0], 0)
+        x1 = min(tri_bounds[t, 1], sW)
+        y0 = max(tri_bounds[t, 2], 0)
+        y1 = min(tri_bounds[t, 3], sH)
+        if (x0 >= x1 or y0 >= y1):
+            continue
+
+        for ty in range(y0 // tileSize, (y1 - 1) // tileSize + 1):
+            for tx in range(x0 // tileSize, (x1 - 1) // tileSize + 1):
+                bins[filled[ty * tilesX + tx]] = t
+                filled[ty * tilesX + tx] += 1
+
+    return binStarts, bins
+
+# draws the same triangles as rasterize_triangles(), but one screen tile per thread
+# every tile only ever touches its own part of frame and z_buffer, so threads never write to the same pixel
+@njit(parallel=True, cache=True)
+def rasterize_triangles_tiled(sW, sH, frame, z_buffer, texture, text_size, tri_screen, tri_uv, tri_bounds, count, renderMode, color, cullBack, textureType, tileSize):
+    tilesX = (sW + tileSize - 1) // tileSize
+    tilesY = (sH + tileSize - 1) // tileSize
+
+    binStarts, bins = bin_triangles(sW, sH, tri_bounds, count, tileSize)
+
+    pixels = 0
+    for tile in prange(tilesX * tilesY):
+        tileMinX = (tile % tilesX) * tileSize
+        tileMinY = (tile // tilesX) * tileSize
+
+        for i in range(binStarts[tile], binStarts[tile + 1]):
+            t = bins[i]
+            # clipping the triangle's bounding box to the tile
+            pixels += draw_triangle(sW, sH, frame, z_buffer, texture, tri_screen[t], tri_uv[t], max(tri_bounds[t, 0], tileMinX), min(tri_bounds[t, 1], tileMinX + tileSize), max(tri_bounds[t, 2], tileMinY), min(tri_bounds[t, 3], tileMinY + tileSize), text_size, tri_screen[t, 0, 2], tri_screen[t, 1, 2], tri_screen[t, 2, 2], renderMode, color, cullBack, textureType)
+
+    return pixels
+
+# ********  INSTANCING:  ********
+
+# drawing every instance of an InstancedModel (see pg3d_instancing.py) in one compiled call
+# the instances share one mesh, and every instance has its own position, forward/up vectors, scale and color (one row each in the arrays)
+
+# the mesh is transformed into points (a scratch copy of the mesh's points) for one instance at a time, so that's the only per-vertex memory
+# without tiling, each instance is drawn right after it's set up
+# with tiling, the set up triangles pile up in the buffers (tagged with which instance they came from) and get drawn together when they fill up,
+# that way each thread gets a decent amount of work instead of one tiny mesh at a time
+# either way everything is drawn in the same order as drawing the instances one by one
+
+# returns how many instances were drawn, how many were frustum culled, and (like render_mesh()) the triangles thrown out for facing away/clipped/sent to be drawn, and the pixels drawn
+@njit(nogil=True, cache=True)
+def render_instances(sW, sH, hor_fov_adjust, ver_fov_adjust, frame, z_buffer, points, triangles, texture_uv, texture_map, texture, text_size, renderMode, cullBack, textureType, rejectBackfaces,
+                     viewMatrix, positions, forwards, ups, scales, colors, instanceCount,
+                     frustumCulling, boundsCenter, boundsRadius, boundsMin, boundsMax, tanHalfHorizontal, tanHalfVertical, tiled, tileSize, batchSize):
+    # room for at least one instance (clipping can turn every triangle into two)
+    capacity = 2 * len(triangles)
+    if (tiled):
+        capacity = max(capacity, batchSize)
+
+    tri_screen = np.empty((capacity, 3, 3))
+    tri_uv = np.empty((capacity, 3, 2))
+    tri_bounds = np.empty((capacity, 4), dtype=np.int64)
+    # which instance each triangle in the buffers came from (only for tiling)
+    tri_instance = np.empty(capacity, dtype=np.int64)
+
+    # colors are 0-255, the rasterizer multiplies texture colors by 0-1
+    tints = colors[:instanceCount] / 255
+
+    matrix = np.empty((3, 4))
+
+    drawn = 0
+    culled = 0
+    backfaceCount = 0
+    clippedCount = 0
+    rasterizedCount = 0
+    pixels = 0
+    count = 0
+
+    for i in range(instanceCount):
+        instance_view_matrix(viewMatrix, positions[i], forwards[i], ups[i], scales[i], matrix)
+
+        if (frustumCulling and not mesh_in_frustum(matrix, boundsCenter, boundsRadius, boundsMin, boundsMax, tanHalfHorizontal, tanHalfVertical)):
+            culled += 1
+            continue
+        drawn += 1
+
+        # not enough room left for this instance, so drawing what's there first
+        if (tiled and count + 2 * len(triangles) > capacity):
+            pixels += rasterize_instances_tiled(sW, sH, frame, z_buffer, texture, text_size, tri_screen, tri_uv, tri_bounds, tri_instance, tints, count, renderMode, cullBack, textureType, tileSize)
+            count = 0
+
+        transform_vertices(points, matrix, sW, sH, hor_fov_adjust, ver_fov_adjust)
+        written, backfaces, clipped = setup_triangles(points, triangles, texture_uv, texture_map, sW, sH, hor_fov_adjust, ver_fov_adjust, tri_screen[count:], tri_uv[count:], tri_bounds[count:], rejectBackfaces)
+        backfaceCount += backfaces
+        clippedCount += clipped
+        rasterizedCount += written
+
+        if (tiled):
+            tri_instance[count:count + written] = i
+            count += written
+        else:
+            pixels += rasterize_triangles(sW, sH, frame, z_buffer, texture, text_size, tri_screen, tri_uv, tri_bounds, written, renderMode, tints[i], cullBack, textureType)
+
+    if (tiled and count > 0):
+        pixels += rasterize_instances_tiled(sW, sH, frame, z_buffer, texture, text_size, tri_screen, tri_uv, tri_bounds, tri_instance, tints, count, renderMode, cullBack, textureType, tileSize)
+
+    return drawn, culled, backfaceCount, clippedCount, rasterizedCount, pixels
+
+# the model -> camera matrix for one instance, written into matrix
+# (the same thing ModelTransform.get_matrix() and model_view_matrix() in pg3d.py do for a model: scale, then rotation, then position, then the camera)
+@njit(cache=True)
+def instance_view_matrix(viewMatrix, position, forward, up, scale, matrix):
+    rotation = m.object_rotation_matrix_3d(forward, up)
+
+    for r in range(3):
+        for c in range(3):
+            matrix[r, c] = (viewMatrix[r, 0] * rotation[0, c] + viewMatrix[r, 1] * rotation[1, c] + viewMatrix[r, 2] * rotation[2, c]) * scale[c]
+        matrix[r, 3] = viewMatrix[r, 0] * position[0] + viewMatrix[r, 1] * position[1] + viewMatrix[r, 2] * position[2] + viewMatrix[r, 3]
+
+# same as rasterize_triangles_tiled(), except every triangle is tinted by the color of the instance it came from
+@njit(parallel=True, cache=True)
+def rasterize_instances_tiled(sW, sH, frame, z_buffer, texture, text_size, tri_screen, tri_uv, tri_bounds, tri_instance, tints, count, renderMode, cullBack, textureType, tileSize):
+    tilesX = (sW + tileSize - 1) // tileSize
+    tilesY = (sH + tileSize - 1) // tileSize
+
+    binStarts, bins = bin_triangles(sW, sH, tri_bounds, count, tileSize)
+
+    pixels = 0
+    for tile in prange(tilesX * tilesY):
+        tileMinX = (tile % tilesX) * tileSize
+        tileMinY = (tile // tilesX) * tileSize
+
+        for i in range(binStarts[tile], binStarts[tile + 1]):
+            t = bins[i]
+            pixels += draw_triangle(sW, sH, frame, z_buffer, texture, tri_screen[t], tri_uv[t], max(tri_bounds[t, 0], tileMinX), min(tri_bounds[t, 1], tileMinX + tileSize), max(tri_bounds[t, 2], tileMinY), min(tri_bounds[t, 3], tileMinY + tileSize), text_size, tri_screen[t, 0, 2], tri_screen[t, 1, 2], tri_screen[t, 2, 2], renderMode, tints[tri_instance[t]], cullBack, textureType)
+
+    return pixels
+
+# narrows the pixel range [lo, hi) of a row down to where an edge function could be >= threshold
+# value is the edge function at x = base, and it goes up by step for every pixel to the right
+# this leaves a pixel of slack on both sides, the actual check still happens per pixel
+@njit(inline='always', cache=True)
+def edge_span(lo, hi, base, value, step, threshold):
+    if (step == 0):
+        if (value < threshold):
+            return lo, lo
+        return lo, hi
+
+    bound = base + (threshold - value) / step
+
+    if (step > 0):
+        # the edge function goes up to the right, so it's everything from bound onwards
+        if (bound - 1 >= hi):
+            return hi, hi
+        if (bound - 1 > lo):
+            lo = int(np.floor(bound)) - 1
+    else:
+        # and everything up to bound the other way around
+        if (bound + 1 < lo):
+            return lo, lo
+        if (bound + 2 < hi):
+            hi = int(np.floor(bound)) + 2
 
-        #  we do nothing if the triangle is all behind (state == 1), we just skip those
+    return lo, hi
 
+# the actual rasterizer, shared between all the rendering modes
+# this gets inlined into draw_triangle_texture() and friends with renderMode as a constant, so each mode gets its own compiled loop without the mode checks in it
 # z-buffering NOT used for wireframe, it is for the others though
-@njit()
-def draw_triangle(sW, sH, frame, z_buffer, texture, proj_points, uv_points, minX, maxX, minY, maxY, text_size, z0, z1, z2, renderMode, color, cullBack, textureType):
-    global wireframeColor
+# returns how many pixels were drawn (for wireframe, how many line pixels), alpha-clipped pixels count too since they passed the z test
+@njit(inline='always', cache=True)
+def raster_triangle(sW, sH, frame, z_buffer, texture, proj_points, uv_points, minX, maxX, minY, maxY, text_size, z0, z1, z2, renderMode, color, cullBack, textureType):
+    x0 = proj_points[0][0]
+    y0 = proj_points[0][1]
+    x1 = proj_points[1][0]
+    y1 = proj_points[1][1]
+    x2 = proj_points[2][0]
+    y2 = proj_points[2][1]
+
+    # how much each edge function goes up by per pixel, to the right (x) and down (y)
+    # (y, -x) for c 90 deg rotation
+    abStepX = y1 - y0
+    abStepY = -(x1 - x0)
+    bcStepX = y2 - y1
+    bcStepY = -(x2 - x1)
+    caStepX = y0 - y2
+    caStepY = -(x0 - x2)
+
+    # the three edge functions add up to twice the triangle's area at every pixel
+    area = (x2 - x0) * (y1 - y0) - (y2 - y0) * (x1 - x0)
+
+    # the edge functions are whole numbers, so stepping them is exact... unless a corner is so far off screen that they don't fit in a float anymore
+    # (that happens for triangles right up against the camera), and then they're worked out from scratch for every pixel like before
+    exactSteps = max(np.abs(x0), np.abs(y0), np.abs(x1), np.abs(y1), np.abs(x2), np.abs(y2)) < 16777216
+
+    # which way round the triangle is, and how far outside of it a pixel can still be drawn
+    # 0 means the triangle is too flat to tell (or the edge functions aren't exact), so every pixel in the box gets checked
+    orientation = 0
+    threshold = 0.0
+    if (exactSteps):
+        if (renderMode == RENDER_WIREFRAME):
+            # the lines are 10 wide, and a thin triangle can light up the other side of its edges
+            threshold = -10.0
+            if (area > 30):
+                orientation = 1
+            elif (area < -30):
+                orientation = -1
+        else:
+            if (area > 0):
+                orientation = 1
+            elif (area < 0):
+                if (cullBack):
+                    return 0
+                orientation = -1
+
+    # barycentric weights are the edge functions divided by this (see below), it's the same for every pixel
+    invAreaSum = 0.0
+    if (area != 0):
+        invAreaSum = 1 / (np.abs(area) / 2)
+
+    renderColor = color * 255
+
+    pixels = 0
 
-    renderColor = color
-    
     # looping through every pixel in the bounding box that the triangle represents
     # we limit this box to the edges of the screen, because we don't care about anything else
 
     # because of these restrictions we don't need any further checks for making sure the x and y are valid
+    boxMinX = max(minX, 0)
+    boxMaxX = min(maxX, sW)
     for y in range(max(minY, 0), min(maxY, sH)):
-        for x in range(max(minX, 0), min(maxX, sW)):
-            apx = x - proj_points[0][6]
-            apy = y - proj_points[0][7]
-            
-            bpx = x - proj_points[1][6]
-            bpy = y - proj_points[1][7]
-            
-            cpx = x - proj_points[2][6]
-            cpy = y - proj_points[2][7]
-
-            # (y, -x) for c 90 deg rotation
-            dotab = apx * (proj_points[1][7] - proj_points[0][7]) + apy * -(proj_points[1][6] - proj_points[0][6])
-            dotbc = bpx * (proj_points[2][7] - proj_points[1][7]) + bpy * -(proj_points[2][6] - proj_points[1][6])
-            dotca = cpx * (proj_points[0][7] - proj_points[2][7]) + cpy * -(proj_points[0][6] - proj_points[2][6])
-
-            if (renderMode == "wireframe"):
+        # the edge functions at the left of the box
+        rowAB = (boxMinX - x0) * abStepX + (y - y0) * abStepY
+        rowBC = (boxMinX - x1) * bcStepX + (y - y1) * bcStepY
+        rowCA = (boxMinX - x2) * caStepX + (y - y2) * caStepY
+
+        # skipping the parts of the row that are outside of the triangle
+        startX = boxMinX
+        endX = boxMaxX
+        if (orientation != 0):
+            startX, endX = edge_span(startX, endX, boxMinX, orientation * rowAB, orientation * abStepX, threshold)
+            startX, endX = edge_span(startX, endX, boxMinX, orientation * rowBC, orientation * bcStepX, threshold)
+            startX, endX = edge_span(startX, endX, boxMinX, orientation * rowCA, orientation * caStepX, threshold)
+
+        if (startX >= endX):
+            continue
+
+        dotab = rowAB + (startX - boxMinX) * abStepX
+        dotbc = rowBC + (startX - boxMinX) * bcStepX
+        dotca = rowCA + (startX - boxMinX) * caStepX
+
+        for x in range(startX, endX):
+            if (not exactSteps):
+                dotab = (x - x0) * abStepX + (y - y0) * abStepY
+                dotbc = (x - x1) * bcStepX + (y - y1) * bcStepY
+                dotca = (x - x2) * caStepX + (y - y2) * caStepY
+
+            if (renderMode == RENDER_WIREFRAME):
                 if ((np.abs(dotab) < 10) and ((dotbc >= 0) and (dotca >= 0))):
-                    frame[x, y] = renderColor * 255
+                    frame[x, y] = renderColor
+                    pixels += 1
                 elif ((np.abs(dotbc) < 10) and ((dotab >= 0) and (dotca >= 0))):
-                    frame[x, y] = renderColor * 255
+                    frame[x, y] = renderColor
+                    pixels += 1
                 elif ((np.abs(dotca) < 10) and ((dotab >= 0) and (dotbc >= 0))):
-                    frame[x, y] = renderColor * 255
+                    frame[x, y] = renderColor
+                    pixels += 1
                 elif ((np.abs(dotab) < 10) and ((dotbc <= 0) and (dotca <= 0))):
-                    frame[x, y] = renderColor * 255
+                    frame[x, y] = renderColor
+                    pixels += 1
                 elif ((np.abs(dotbc) < 10) and ((dotab <= 0) and (dotca <= 0))):
-                    frame[x, y] = renderColor * 255
+                    frame[x, y] = renderColor
+                    pixels += 1
                 elif ((np.abs(dotca) < 10) and ((dotab <= 0) and (dotbc <= 0))):
-                    frame[x, y] = renderColor * 255
+                    frame[x, y] = renderColor
+                    pixels += 1
             else:
                 # line segments: 0 -> 1,    1 -> 2,        2 -> 0
+                inTriangle = False
+                a0 = dotbc
+                a1 = dotca
+                a2 = dotab
                 if ((dotab >= 0) and (dotbc >= 0) and (dotca >= 0)):
                     inTriangle = True
-                else:
-                    inTriangle = False
-
-                if (not cullBack):
+                elif (not cullBack):
                     if ((dotab <= 0) and (dotbc <= 0) and (dotca <= 0)):
                         inTriangle = True
-                        dotab *= -1
-                        dotbc *= -1
-                        dotca *= -1
+                        a0 = -dotbc
+                        a1 = -dotca
+                        a2 = -dotab
 
                 if (inTriangle):
-                    a0 = dotbc / 2
-                    a1 = dotca / 2
-                    a2 = dotab / 2
-                    
-                    sum = (a0 + a1 + a2)
-                    if (sum > 0):
-                        invAreaSum = 1 / (a0 + a1 + a2)
-                        w0 = a0 * invAreaSum
-                        w1 = a1 * invAreaSum
-                        w2 = a2 * invAreaSum
+                    if (invAreaSum > 0):
+                        w0 = a0 / 2 * invAreaSum
+                        w1 = a1 / 2 * invAreaSum
+                        w2 = a2 / 2 * invAreaSum
                     else:
                         w0 = 1
                         w1 = 0
-                        w2 = 0  
+                        w2 = 0
 
                     # sinze z0,z1, and z2 are all 1/z at some point, this value will also be 1 / z
                     z = w0*z0 + w1*z1 + w2*z2
@@ -429,28 +914,58 @@ def draw_triangle(sW, sH, frame, z_buffer, texture, proj_points, uv_points, minX
                     # z needs to be greater than the value at the z buffer, meaning 1 / z needs to be less
                     # also make sure the u and v coords are valid, they need to be [0..1]
                     if z > z_buffer[x, y] and min(u,v) >= 0 and max(u,v) <= 1:
-                        # showing the u and v coords as a color, not the actual texture just yet
-                        if (renderMode == "states"):
-                            frame[x, y] = renderColor * 255
-
-                            # z buffer stores values of 1 / z
-                            z_buffer[x, y] = z
-                        elif (renderMode == "uv"):
-                            frame[x, y] = np.asarray([u*255,v*255,0]).astype('uint8')
-
-                            # z buffer stores values of 1 / z
-                            z_buffer[x, y] = z
-                        elif (renderMode == "texture"):
+                        if (renderMode == RENDER_STATES):
+                            frame[x, y] = renderColor
+                        elif (renderMode == RENDER_UV):
+                            # showing the u and v coords as a color
+                            frame[x, y, 0] = u*255
+                            frame[x, y, 1] = v*255
+                            frame[x, y, 2] = 0
+                        else:
                             pixelColor = texture[int(u*text_size[0] + 1)][int(v*text_size[1])]
                             # ALL objects in the scene are rendered using alpha-clip, so if there's no color it's transparent
-                            if (textureType == 1):
-                                if (pixelColor[0] > 0 or pixelColor[1] > 0 or pixelColor[2] > 0):
-                                    frame[x, y] = pixelColor * color
+                            if ((textureType != 1) or (pixelColor[0] > 0 or pixelColor[1] > 0 or pixelColor[2] > 0)):
+                                frame[x, y, 0] = pixelColor[0] * color[0]
+                                frame[x, y, 1] = pixelColor[1] * color[1]
+                                frame[x, y, 2] = pixelColor[2] * color[2]
+
+                        # z buffer stores values of 1 / z
+                        z_buffer[x, y] = z
+                        pixels += 1
+
+            dotab += abStepX
+            dotbc += bcStepX
+            dotca += caStepX
 
-                                    # z buffer stores values of 1 / z
-                                    z_buffer[x, y] = z
-                            else:
-                                frame[x, y] = pixelColor * color
+    return pixels
 
-                            # z buffer stores values of 1 / z
-                            z_buffer[x, y] = z
\ No newline at end of file
+@njit(cache=True)
+def draw_triangle_texture(sW, sH, frame, z_buffer, texture, proj_points, uv_points, minX, maxX, minY, maxY, text_size, z0, z1, z2, color, cullBack, textureType):
+    return raster_triangle(sW, sH, frame, z_buffer, texture, proj_points, uv_points, minX, maxX, minY, maxY, text_size, z0, z1, z2, RENDER_TEXTURE, color, cullBack, textureType)
+
+@njit(cache=True)
+def draw_triangle_uv(sW, sH, frame, z_buffer, texture, proj_points, uv_points, minX, maxX, minY, maxY, text_size, z0, z1, z2, color, cullBack, textureType):
+    return raster_triangle(sW, sH, frame, z_buffer, texture, proj_points, uv_points, minX, maxX, minY, maxY, text_size, z0, z1, z2, RENDER_UV, color, cullBack, textureType)
+
+@njit(cache=True)
+def draw_triangle_wireframe(sW, sH, frame, z_buffer, texture, proj_points, uv_points, minX, maxX, minY, maxY, text_size, z0, z1, z2, color, cullBack, textureType):
+    return raster_triangle(sW, sH, frame, z_buffer, texture, proj_points, uv_points, minX, maxX, minY, maxY, text_size, z0, z1, z2, RENDER_WIREFRAME, color, cullBack, textureType)
+
+@njit(cache=True)
+def draw_triangle_states(sW, sH, frame, z_buffer, texture, proj_points, uv_points, minX, maxX, minY, maxY, text_size, z0, z1, z2, color, cullBack, textureType):
+    return raster_triangle(sW, sH, frame, z_buffer, texture, proj_points, uv_points, minX, maxX, minY, maxY, text_size, z0, z1, z2, RENDER_STATES, color, cullBack, textureType)
+
+# renderMode is one of the RENDER_ numbers at the top of this file (see render_mode_index())
+# the mode is only checked once per triangle here, the drawing itself happens in a loop compiled just for that mode
+# returns how many pixels were drawn
+@njit(cache=True)
+def draw_triangle(sW, sH, frame, z_buffer, texture, proj_points, uv_points, minX, maxX, minY, maxY, text_size, z0, z1, z2, renderMode, color, cullBack, textureType):
+    if (renderMode == RENDER_TEXTURE):
+        return draw_triangle_texture(sW, sH, frame, z_buffer, texture, proj_points, uv_points, minX, maxX, minY, maxY, text_size, z0, z1, z2, color, cullBack, textureType)
+    elif (renderMode == RENDER_UV):
+        return draw_triangle_uv(sW, sH, frame, z_buffer, texture, proj_points, uv_points, minX, maxX, minY, maxY, text_size, z0, z1, z2, color, cullBack, textureType)
+    elif (renderMode == RENDER_WIREFRAME):
+        return draw_triangle_wireframe(sW, sH, frame, z_buffer, texture, proj_points, uv_points, minX, maxX, minY, maxY, text_size, z0, z1, z2, color, cullBack, textureType)
+    elif (renderMode == RENDER_STATES):
+        return draw_triangle_states(sW, sH, frame, z_buffer, texture, proj_points, uv_points, minX, maxX, minY, maxY, text_size, z0, z1, z2, color, cullBack, textureType)
+    return 0
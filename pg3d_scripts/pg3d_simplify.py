@@ -0,0 +1,301 @@
+import argparse
+import os
+import numpy as np
+from numba import njit
+from . import pg3d_utils as utils
+
+# mesh simplification, for making level of detail meshes (see Model.add_lod()) out of meshes that don't have any
+
+# this is the quadric error metric method (Garland & Heckbert): every vertex keeps track of the planes of the triangles around it,
+# and the cheapest edges (the ones that move the surface the least) get collapsed, one vertex merging into the other, until there are few enough triangles
+# the vertex that's merged away ends up at the other vertex's position, so no new vertices or uv coords are ever made
+
+# some vertices are never merged away:
+#   - ones on a uv seam (used with more than one uv coord), so texture_map always stays valid and the texture doesn't tear
+#   - ones on the edge of the mesh (or on an edge shared by more than 2 triangles), so holes and outlines keep their shape
+
+# as a module:          pg3d_simplify.simplify_obj("tree.obj", "tree_lod1.obj", 0.5)
+# from the repo folder: python -m pg3d_scripts.pg3d_simplify "3d models/tree/tree.obj" 0.5 0.25   (writes tree_lod1.obj and tree_lod2.obj next to it)
+
+# simplifies a mesh from read_obj() down to about ratio of its triangles
+# max_error is how far (in the mesh's units, roughly) the surface is allowed to move, it stops early if it can't get further without going over
+# returns the same four arrays as read_obj()
+def simplify_mesh(vertices, triangles, texture_uv, texture_map, ratio, max_error=np.inf):
+    hasUVs = len(texture_map) == len(triangles) and len(triangles) > 0
+
+    # vertices that are in the same place have to be the same vertex, otherwise the mesh looks like it's full of holes
+    positions, positionIndex = utils.unique_rows(vertices[:,0:3])
+    triangles = positionIndex[triangles]
+
+    locked = locked_vertices(triangles, texture_map, len(positions), hasUVs)
+    if (not hasUVs):
+        texture_map = np.zeros((len(triangles), 3), dtype=int)
+
+    targetCount = int(len(triangles) * ratio)
+    triangles, texture_map = collapse_edges(positions, triangles, texture_map, locked, plane_quadrics(positions, triangles), targetCount, max_error * max_error)
+
+    # dropping everything the leftover triangles don't use
+    used, newIndex = utils.first_use_order(triangles, len(positions))
+    newVertices = np.ones((len(used), 9))
+    newVertices[:,0:3] = positions[used]
+    triangles = newIndex[triangles]
+
+    if (hasUVs):
+        used, newIndex = utils.first_use_order(texture_map, len(texture_uv))
+        texture_uv = texture_uv[used]
+        texture_map = newIndex[texture_map]
+    else:
+        texture_map = np.zeros(0, dtype=int)
+
+    return newVertices, triangles, texture_uv, texture_map
+
+# reads an obj file, simplifies it and writes the result to another one
+# returns how many triangles it had before and after
+def simplify_obj(path_in, path_out, ratio, max_error=np.inf):
+    mesh = utils.read_obj(path_in)
+    simplified = simplify_mesh(*mesh, ratio, max_error)
+    utils.write_obj(path_out, *simplified)
+
+    return len(mesh[1]), len(simplified[1])
+
+# which vertices can't be merged away (see the top of the file)
+def locked_vertices(triangles, texture_map, vertexCount, hasUVs):
+    locked = np.zeros(vertexCount, dtype=bool)
+
+    # every edge, with the smaller vertex first, so the same edge from two triangles looks the same
+    edges = np.concatenate([triangles[:,[0,1]], triangles[:,[1,2]], triangles[:,[2,0]]])
+    edges = np.sort(edges, axis=1)
+    uniqueEdges, edgeIndex = utils.unique_rows(edges)
+    edgeUses = np.bincount(edgeIndex, minlength=len(uniqueEdges))
+    locked[uniqueEdges[edgeUses != 2].reshape(-1)] = True
+
+    if (hasUVs):
+        # a vertex is on a seam if its corners don't all use the same uv coord
+        corners = triangles.reshape(-1)
+        uvs = texture_map.reshape(-1)
+        firstUV = np.full(vertexCount, -1)
+        firstUV[corners[::-1]] = uvs[::-1]
+        locked[corners[uvs != firstUV[corners]]] = True
+
+    return locked
+
+# the planes of the triangles around every vertex, added up as a quadric (a symmetric 4x4 matrix, stored as its 10 different numbers)
+# a quadric's error at a point is the sum of the squared distances from the point to all of its planes
+@njit(cache=True)
+def plane_quadrics(positions, triangles):
+    quadrics = np.zeros((len(positions), 10))
+
+    for t in range(len(triangles)):
+        p0 = positions[triangles[t, 0]]
+        p1 = positions[triangles[t, 1]]
+        p2 = positions[triangles[t, 2]]
+
+        nx = (p1[1] - p0[1]) * (p2[2] - p0[2]) - (p1[2] - p0[2]) * (p2[1] - p0[1])
+        ny = (p1[2] - p0[2]) * (p2[0] - p0[0]) - (p1[0] - p0[0]) * (p2[2] - p0[2])
+        nz = (p1[0] - p0[0]) * (p2[1] - p0[1]) - (p1[1] - p0[1]) * (p2[0] - p0[0])
+        length = np.sqrt(nx * nx + ny * ny + nz * nz)
+        if (length == 0):
+            continue
+
+        a = nx / length
+        b = ny / length
+        c = nz / length
+        d = -(a * p0[0] + b * p0[1] + c * p0[2])
+
+        for i in range(3):
+            q = quadrics[triangles[t, i]]
+            q[0] += a * a
+            q[1] += a * b
+            q[2] += a * c
+            q[3] += a * d
+            q[4] += b * b
+            q[5] += b * c
+            q[6] += b * d
+            q[7] += c * c
+            q[8] += c * d
+            q[9] += d * d
+
+    return quadrics
+
+# the error of the quadric qa + qb at point p
+@njit(cache=True)
+def quadric_error(qa, qb, p):
+    x = p[0]
+    y = p[1]
+    z = p[2]
+    return ((qa[0] + qb[0]) * x * x + 2 * (qa[1] + qb[1]) * x * y + 2 * (qa[2] + qb[2]) * x * z + 2 * (qa[3] + qb[3]) * x
+            + (qa[4] + qb[4]) * y * y + 2 * (qa[5] + qb[5]) * y * z + 2 * (qa[6] + qb[6]) * y
+            + (qa[7] + qb[7]) * z * z + 2 * (qa[8] + qb[8]) * z + (qa[9] + qb[9]))
+
+# the (not normalized) normal of a triangle
+@njit(cache=True)
+def triangle_normal(p0, p1, p2):
+    normal = np.empty(3)
+    normal[0] = (p1[1] - p0[1]) * (p2[2] - p0[2]) - (p1[2] - p0[2]) * (p2[1] - p0[1])
+    normal[1] = (p1[2] - p0[2]) * (p2[0] - p0[0]) - (p1[0] - p0[0]) * (p2[2] - p0[2])
+    normal[2] = (p1[0] - p0[0]) * (p2[1] - p0[1]) - (p1[1] - p0[1]) * (p2[0] - p0[0])
+    return normal
+
+# collapses edges until there are targetCount triangles left, or every edge left would cost more than maxErrorSquared
+# returns the leftover triangles and their texture_map rows
+
+# this works in passes: every pass figures out which triangles each vertex is in, sorts every vertex's cheapest collapse by cost,
+# and does as many of the cheapest ones as it can, as long as they don't touch anything another collapse in the same pass changed
+# (that way the triangle lists stay right without having to update them after every collapse)
+@njit(cache=True)
+def collapse_edges(positions, triangles, texture_map, locked, quadrics, targetCount, maxErrorSquared):
+    vertexCount = len(positions)
+    triangles = triangles.copy()
+    texture_map = texture_map.copy()
+
+    alive = np.ones(len(triangles), dtype=np.bool_)
+    aliveCount = len(triangles)
+
+    # for finding the vertices two vertices have in common (see below)
+    stamps = np.zeros(vertexCount, dtype=np.int64)
+    stamp = 0
+
+    while (aliveCount > targetCount):
+        # which triangles each vertex is in
+        refStarts = np.zeros(vertexCount + 1, dtype=np.int64)
+        for t in range(len(triangles)):
+            if (alive[t]):
+                for i in range(3):
+                    refStarts[triangles[t, i] + 1] += 1
+        for v in range(vertexCount):
+            refStarts[v + 1] += refStarts[v]
+        refs = np.empty(refStarts[vertexCount], dtype=np.int64)
+        filled = refStarts[:vertexCount].copy()
+        for t in range(len(triangles)):
+            if (alive[t]):
+                for i in range(3):
+                    v = triangles[t, i]
+                    refs[filled[v]] = t
+                    filled[v] += 1
+
+        # the cheapest collapse for every vertex (a merges into b, for every neighbor b it has)
+        # (each edge is in two triangles, going opposite ways, so it's only looked at from the one where it goes from the smaller vertex to the bigger one)
+        bestCosts = np.full(vertexCount, np.inf)
+        bestTargets = np.full(vertexCount, -1, dtype=np.int64)
+        for t in range(len(triangles)):
+            if (not alive[t]):
+                continue
+            for i in range(3):
+                if (triangles[t, i] > triangles[t, (i + 1) % 3]):
+                    continue
+                for direction in range(2):
+                    a = triangles[t, (i + direction) % 3]
+                    b = triangles[t, (i + 1 - direction) % 3]
+                    if (locked[a]):
+                        continue
+                    cost = quadric_error(quadrics[a], quadrics[b], positions[b])
+                    if (cost < bestCosts[a]):
+                        bestCosts[a] = cost
+                        bestTargets[a] = b
+
+        fromVertex = np.flatnonzero(bestTargets != -1)
+        toVertex = bestTargets[fromVertex]
+        costs = bestCosts[fromVertex]
+        count = len(fromVertex)
+
+        order = np.argsort(costs[:count])
+
+        touched = np.zeros(vertexCount, dtype=np.bool_)
+        collapsed = 0
+        for k in range(count):
+            if (aliveCount <= targetCount):
+                break
+            c = order[k]
+            if (costs[c] > maxErrorSquared):
+                break
+
+            a = fromVertex[c]
+            b = toVertex[c]
+            if (touched[a] or touched[b]):
+                continue
+
+            # the edge has to be in exactly 2 triangles, and a and b can't have any other neighbors in common
+            # (otherwise the collapse would pinch the mesh into something that isn't a surface anymore)
+            stamp += 1
+            for j in range(refStarts[a], refStarts[a + 1]):
+                for i in range(3):
+                    stamps[triangles[refs[j], i]] = stamp
+            stamp += 1
+            common = 0
+            for j in range(refStarts[b], refStarts[b + 1]):
+                for i in range(3):
+                    v = triangles[refs[j], i]
+                    if (stamps[v] == stamp - 1):
+                        common += 1
+                    stamps[v] = stamp
+            # (a and b themselves are counted once each, plus once per other vertex in common)
+            if (common != 4):
+                continue
+
+            # none of a's other triangles can flip over (or get squashed flat) when a moves to b
+            valid = True
+            shared = 0
+            uvB = -1
+            for j in range(refStarts[a], refStarts[a + 1]):
+                t = refs[j]
+                corner = 0
+                hasB = False
+                for i in range(3):
+                    if (triangles[t, i] == a):
+                        corner = i
+                    if (triangles[t, i] == b):
+                        hasB = True
+                        uvB = texture_map[t, i]
+                if (hasB):
+                    shared += 1
+                    continue
+
+                p1 = positions[triangles[t, (corner + 1) % 3]]
+                p2 = positions[triangles[t, (corner + 2) % 3]]
+                before = triangle_normal(positions[a], p1, p2)
+                after = triangle_normal(positions[b], p1, p2)
+                lengths = np.sqrt((before[0] * before[0] + before[1] * before[1] + before[2] * before[2]) * (after[0] * after[0] + after[1] * after[1] + after[2] * after[2]))
+                if (lengths == 0 or (before[0] * after[0] + before[1] * after[1] + before[2] * after[2]) < 0.2 * lengths):
+                    valid = False
+                    break
+            if (not valid or shared != 2):
+                continue
+
+            # the 2 triangles along the edge disappear, the rest of a's triangles use b instead
+            # (a isn't on a seam, so b has the same uv coord in every triangle around a)
+            for j in range(refStarts[a], refStarts[a + 1]):
+                t = refs[j]
+                for i in range(3):
+                    touched[triangles[t, i]] = True
+                hasB = triangles[t, 0] == b or triangles[t, 1] == b or triangles[t, 2] == b
+                if (hasB):
+                    alive[t] = False
+                    aliveCount -= 1
+                else:
+                    for i in range(3):
+                        if (triangles[t, i] == a):
+                            triangles[t, i] = b
+                            texture_map[t, i] = uvB
+
+            for i in range(10):
+                quadrics[b, i] += quadrics[a, i]
+            collapsed += 1
+
+        if (collapsed == 0):
+            break
+
+    return triangles[alive], texture_map[alive]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="writes simplified versions of an obj file (for levels of detail), as name_lod1.obj, name_lod2.obj...")
+    parser.add_argument("path", help="the obj file to simplify")
+    parser.add_argument("ratios", type=float, nargs="+", help="how much of the triangles to keep for each level (0.5 = half)")
+    parser.add_argument("--max-error", type=float, default=np.inf, help="how far the surface is allowed to move (in the mesh's units), levels can end up with more triangles than asked for because of this")
+    arguments = parser.parse_args()
+
+    mesh = utils.read_obj(arguments.path)
+    for level, ratio in enumerate(arguments.ratios):
+        simplified = simplify_mesh(*mesh, ratio, arguments.max_error)
+        outputPath = os.path.splitext(arguments.path)[0] + "_lod" + str(level + 1) + ".obj"
+        utils.write_obj(outputPath, *simplified)
+        print(outputPath + ":", len(mesh[1]), "->", len(simplified[1]), "triangles")
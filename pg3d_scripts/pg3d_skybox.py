@@ -0,0 +1,92 @@
+import numpy as np
+import pygame as pg
+from . import pg3d_assets as assets
+
+# the sky that's drawn behind everything when the background mode is "skybox"
+
+# the texture is 3 screens tall, looking up/down slides the visible window through it
+# the camera's horizontal angle can slide it left/right too (yaw scrolling), then the texture is stretched to go all the way around
+
+# the sky can be tinted by setBackGroundColor(), and every tinted version is kept around
+# (so switching back and forth between colors doesn't redo any work)
+class Skybox:
+    # how many tinted versions of the sky are kept before the oldest one is thrown out
+    maxTints = 8
+
+    def __init__(self, texture_path, width, height, horizontalFOV):
+        self.texturePath = texture_path
+        self.width = width
+        self.height = height
+        self.horizontalFOV = horizontalFOV
+
+        self.yawScrolling = False
+
+        # (r, g, b) -> tinted texture, oldest first
+        self.tints = {}
+        self.tintColor = (255, 255, 255)
+
+        self.load_texture()
+
+    # (re)loading the base texture at the size it needs to be
+    def load_texture(self):
+        textureWidth = self.width
+        if (self.yawScrolling):
+            # the screen covers horizontalFOV of the full circle, so the whole circle is this many pixels wide
+            textureWidth = int(round(self.width * 2 * np.pi / self.horizontalFOV))
+
+        self.baseTexture = np.zeros((textureWidth, self.height * 3, 3)).astype('uint8')
+        pg.surfarray.surface_to_array(self.baseTexture, pg.transform.scale(pg.surfarray.make_surface(assets.load_texture(self.texturePath)), (textureWidth, self.height * 3)))
+
+        self.tints = {}
+        self.texture = self.get_tinted_texture(self.tintColor)
+
+    def set_yaw_scrolling(self, enabled):
+        if (self.yawScrolling != enabled):
+            self.yawScrolling = enabled
+            self.load_texture()
+
+    # r, g and b are 0-255, same as setBackGroundColor()
+    # the tint is always applied to the original texture, so tints don't stack up
+    def set_tint(self, r, g, b):
+        self.tintColor = (r, g, b)
+        self.texture = self.get_tinted_texture(self.tintColor)
+
+    def get_tinted_texture(self, color):
+        if (color == (255, 255, 255)):
+            return self.baseTexture
+
+        if (color in self.tints):
+            # moving it to the back, so it's the last one to be thrown out
+            texture = self.tints.pop(color)
+            self.tints[color] = texture
+            return texture
+
+        texture = (self.baseTexture * np.asarray([color[0]/255, color[1]/255, color[2]/255])).astype('uint8')
+
+        self.tints[color] = texture
+        if (len(self.tints) > Skybox.maxTints):
+            del self.tints[next(iter(self.tints))]
+
+        return texture
+
+    # copying the part of the sky the camera can see into the frame
+    # forward is the camera's forward vector (in world space)
+    def draw(self, frame, forward):
+        # looking down moves the window down the texture, looking up moves it up
+        startY = int(-forward[1] * self.height)
+        startY += self.height
+
+        if (not self.yawScrolling):
+            frame[:, :] = self.texture[:, startY:startY + self.height]
+            return
+
+        # turning to the right slides the sky to the left
+        textureWidth = len(self.texture)
+        yaw = np.arctan2(forward[0], forward[2])
+        startX = int(-yaw * textureWidth / (2 * np.pi) - self.width / 2) % textureWidth
+
+        # the visible window might wrap around the end of the texture, in which case it's copied in two parts
+        firstPart = min(self.width, textureWidth - startX)
+        frame[:firstPart, :] = self.texture[startX:startX + firstPart, startY:startY + self.height]
+        if (firstPart < self.width):
+            frame[firstPart:, :] = self.texture[:self.width - firstPart, startY:startY + self.height]
@@ -1,5 +1,6 @@
 import numpy as np
 import random
+from numba import njit
 
 # generates a string of random number characters of a given length
 # used for particle system hashcodes, but those were removed so its just here now
@@ -17,49 +18,369 @@ def random_number_string(length):
 # I'm not complaining bc it works, but its still weird
 def read_obj(fileName):
     '''
-    Read wavefront models with or without textures, supports triangles and quads (turned into triangles)
+    Read wavefront models with or without textures, supports triangles, quads and bigger polygons (turned into triangles)
     '''
-    vertices, triangles, texture_uv, texture_map = [], [], [], []
+    with open(fileName, "rb") as f:
+        data = f.read()
+    if (not data.endswith(b"\n")):
+        data += b"\n"
 
-    with open(fileName) as f:
-        for line in f.readlines():
+    # instead of going through the file line by line, the whole file is handled as one big array of characters
+    characters = np.frombuffer(data, dtype=np.uint8)
 
-            splitted = line.split() # split the line in a list
+    lineEnds = np.flatnonzero(characters == ord("\n"))
+    lineStarts = np.concatenate(([0], lineEnds[:-1] + 1))
 
-            if len(splitted) == 0: # skip empty lines
-                continue
+    # (padded, so looking at the first three characters of a short line at the end doesn't go past the end)
+    padded = np.concatenate((characters, np.zeros(3, dtype=np.uint8)))
 
-            if splitted[0] == "v": # vertices
-                vertices.append(splitted[1:4] + [1,1,1] + [1,1,1]) # aditional spaces for transformation, and projection
+    # lines can be indented ("  v 0 0 0" is still a vertex), so where the text of each line actually starts
+    # (only the indented lines get moved forward, one character at a time, which is nothing for most files)
+    # the line break isn't a space or a tab, so a line can't start past its own end
+    textStarts = lineStarts.copy()
+    indented = np.arange(len(lineStarts))
+    while (len(indented) > 0):
+        indented = indented[(padded[textStarts[indented]] == ord(" ")) | (padded[textStarts[indented]] == ord("\t"))]
+        textStarts[indented] += 1
 
-            elif splitted[0] == "vt": # texture coordinates
-                texture_uv.append(splitted[1:3])
+    # sorting the lines out by what they start with
+    first = padded[textStarts]
+    second = padded[textStarts + 1]
+    third = padded[textStarts + 2]
 
-            elif splitted[0] == "f": # Faces
+    isVertex = (first == ord("v")) & ((second == ord(" ")) | (second == ord("\t")))
+    isUV = (first == ord("v")) & (second == ord("t")) & ((third == ord(" ")) | (third == ord("\t")))
+    isFace = (first == ord("f")) & ((second == ord(" ")) | (second == ord("\t")))
 
-                if len(splitted[1].split("/")) == 1: # no textures
-                    triangles.append([splitted[1], splitted[2], splitted[3]])
+    # all the lines of each kind (with the prefix blanked out) as one string, and all the numbers are converted in one go
+    vertices = np.ones((isVertex.sum(), 9)) # aditional spaces for transformation, and projection
+    vertices[:,0:3] = parse_obj_numbers(obj_lines(data, isVertex, lineStarts, lineEnds, textStarts, 1), isVertex.sum(), 3, float)
 
-                    if len(splitted) > 4: # quads, make additional triangle
-                        triangles.append([splitted[1], splitted[3], splitted[4]])
+    texture_uv = parse_obj_numbers(obj_lines(data, isUV, lineStarts, lineEnds, textStarts, 2), isUV.sum(), 2, float)
+    texture_uv[:,1] = 1 - texture_uv[:,1] # apparently obj textures are upside down
 
-                else: # with textures
-                    p1 = splitted[1].split("/")
-                    p2 = splitted[2].split("/")
-                    p3 = splitted[3].split("/")
-                    triangles.append([p1[0], p2[0], p3[0]])
-                    texture_map.append([p1[1], p2[1], p3[1]])
-                    
-                    if len(splitted) > 4: # quads, make additional triangle
-                        p4 = splitted[4].split("/")
-                        triangles.append([p1[0], p3[0], p4[0]])
-                        texture_map.append([p1[1], p3[1], p4[1]])
-                
-    vertices = np.asarray(vertices).astype(float)
-    triangles = np.asarray(triangles).astype(int) - 1 # adjust indexes to start with 0
+    faces = parse_obj_faces(obj_lines(data, isFace, lineStarts, lineEnds, textStarts, 1), isFace.sum())
 
-    texture_uv = np.asarray(texture_uv).astype(float)
-    texture_uv[:,1] = 1 - texture_uv[:,1] # apparently obj textures are upside down
-    texture_map = np.asarray(texture_map).astype(int) - 1 # adjust indexes to start with 0
-    
-    return vertices, triangles, texture_uv, texture_map
\ No newline at end of file
+    # negative indexes count back from the last vertex/uv before the face (-1 is the one right above it)
+    if ((faces < 0).any()):
+        vertexCounts = np.cumsum(isVertex)[isFace]
+        uvCounts = np.cumsum(isUV)[isFace]
+        faces[:,:,0] = np.where(faces[:,:,0] < 0, faces[:,:,0] + vertexCounts[:,None] + 1, faces[:,:,0])
+        faces[:,:,1] = np.where(faces[:,:,1] < 0, faces[:,:,1] + uvCounts[:,None] + 1, faces[:,:,1])
+
+    # polygons are split into triangles that all share the first corner (0,1,2 then 0,2,3 then 0,3,4...)
+    # the triangles stay in the same order as the faces in the file
+    cornerCounts = (faces[:,:,0] != 0).sum(axis=1)
+    triangleCounts = np.maximum(cornerCounts - 2, 0)
+    firstTriangle = np.cumsum(triangleCounts) - triangleCounts
+
+    triangles = np.zeros((triangleCounts.sum(), 3), dtype=int)
+    texture_map = np.zeros((triangleCounts.sum(), 3), dtype=int)
+    for i in range(1, faces.shape[1] - 1):
+        hasTriangle = triangleCounts >= i
+        rows = firstTriangle[hasTriangle] + i - 1
+        corners = faces[hasTriangle]
+        triangles[rows] = corners[:, [0, i, i + 1], 0]
+        texture_map[rows] = corners[:, [0, i, i + 1], 1]
+
+    triangles -= 1 # adjust indexes to start with 0
+    texture_map -= 1
+
+    # the drawing code doesn't check indexes, so a face pointing at a vertex/uv that isn't in the file is caught here instead
+    # (-1 in the texture map is a corner without texture coordinates)
+    if (((triangles < 0) | (triangles >= len(vertices))).any()):
+        raise ValueError(str(fileName) + " has a face with a vertex index that isn't in the file")
+    if (((texture_map < -1) | (texture_map >= len(texture_uv))).any()):
+        raise ValueError(str(fileName) + " has a face with a texture coordinate index that isn't in the file")
+
+    # corners without texture coordinates (like "1//1" or just "1") use the first one
+    texture_map = np.maximum(texture_map, 0)
+    # and a file without any gets one at (0, 0), so the triangles can still be drawn (in the color of the texture's corner)
+    if (len(texture_uv) == 0):
+        texture_uv = np.zeros((1, 2))
+
+    return vertices, triangles, texture_uv, texture_map
+
+# all the chosen lines as one string, with the prefix (the first prefixLength characters after any indent) of each one blanked out
+def obj_lines(data, chosen, lineStarts, lineEnds, textStarts, prefixLength):
+    chosen = np.flatnonzero(chosen)
+    if (len(chosen) == 0):
+        return ""
+
+    # lines of the same kind are usually all in one block, so the file is copied a block at a time
+    breaks = np.flatnonzero(np.diff(chosen) != 1) + 1
+    blockStarts = lineStarts[chosen[np.concatenate(([0], breaks))]]
+    blockEnds = lineEnds[chosen[np.concatenate((breaks - 1, [len(chosen) - 1]))]] + 1
+    characters = np.frombuffer(b"".join(data[blockStarts[i]:blockEnds[i]] for i in range(len(blockStarts))), dtype=np.uint8).copy()
+
+    lengths = lineEnds[chosen] + 1 - lineStarts[chosen]
+    starts = np.cumsum(lengths) - lengths + textStarts[chosen] - lineStarts[chosen]
+    for i in range(prefixLength):
+        characters[starts + i] = ord(" ")
+
+    return characters.tobytes().decode()
+
+# how many numbers (or anything else separated by spaces) are on each line
+def count_obj_tokens(text):
+    characters = np.frombuffer(text.encode(), dtype=np.uint8)
+
+    # spaces, tabs and line breaks are all <= 32
+    isSpace = characters <= ord(" ")
+    tokenStarts = np.flatnonzero(~isSpace & np.concatenate(([True], isSpace[:-1])))
+    lineEnds = np.flatnonzero(characters == ord("\n"))
+
+    return np.diff(np.concatenate(([0], np.searchsorted(tokenStarts, lineEnds))))
+
+# all the numbers in some obj lines, as a (lines, columns) array
+# lines with more numbers than that (like the optional w coordinate) have the extra ones ignored
+def parse_obj_numbers(text, lineCount, columns, dtype):
+    if (lineCount == 0):
+        return np.zeros((0, columns), dtype=dtype)
+
+    values = np.fromstring(text, dtype=dtype, sep=" ")
+    counts = count_obj_tokens(text)
+
+    # where each line's numbers start
+    starts = np.cumsum(counts) - counts
+
+    return values[starts[:,None] + np.arange(columns)]
+
+# the corners of every face as an array of (faces, most corners of any face, 3)
+# each corner is (vertex, uv, normal) as written in the file (starting at 1), 0 means it isn't there
+# so "1/2/3", "1//3", "1/2" and "1" all work
+def parse_obj_faces(text, lineCount):
+    if (lineCount == 0):
+        return np.zeros((0, 3, 3), dtype=int)
+
+    text = text.replace("//", "/0/")
+    cornerCounts = count_obj_tokens(text)
+
+    # how many numbers each corner has (1, 2 or 3), usually the whole file writes them the same way
+    slashCount = text.count("/")
+    if (slashCount == 0):
+        values = np.fromstring(text, dtype=int, sep=" ").reshape(-1, 1)
+    elif (slashCount == cornerCounts.sum()):
+        values = np.fromstring(text.replace("/", " "), dtype=int, sep=" ").reshape(-1, 2)
+    elif (slashCount == cornerCounts.sum() * 2):
+        values = np.fromstring(text.replace("/", " "), dtype=int, sep=" ").reshape(-1, 3)
+    else:
+        # corners written in different ways in the same file, which is allowed but weird
+        values = np.asarray([pad_obj_corner(i) for i in text.split()], dtype=int).reshape(-1, 3)
+
+    # spreading the corners out into rows (faces with fewer corners are padded with zeros)
+    faces = np.zeros((lineCount, max(cornerCounts.max(), 3), 3), dtype=int)
+    faceOfEachCorner = np.repeat(np.arange(lineCount), cornerCounts)
+    cornerInFace = np.arange(len(values)) - np.repeat(np.cumsum(cornerCounts) - cornerCounts, cornerCounts)
+    faces[faceOfEachCorner, cornerInFace, :values.shape[1]] = values
+
+    return faces
+
+def pad_obj_corner(corner):
+    parts = (corner.split("/") + ["0", "0"])[:3]
+    return [i if i != "" else "0" for i in parts]
+
+# writes the four arrays from read_obj() back out as an obj file (so read_obj() gives the same thing back)
+# only positions, uvs and faces are written, no normals or materials
+def write_obj(fileName, vertices, triangles, texture_uv, texture_map):
+    with open(fileName, "w") as f:
+        f.write("# written by pg3d, " + str(len(triangles)) + " triangles\n")
+        np.savetxt(f, vertices[:,0:3], fmt="v %.9g %.9g %.9g")
+
+        if (len(texture_map) == len(triangles) and len(triangles) > 0):
+            uvs = np.array(texture_uv, dtype=float).reshape(-1, 2)
+            uvs[:,1] = 1 - uvs[:,1] # flipping them back (see read_obj())
+            np.savetxt(f, uvs, fmt="vt %.9g %.9g")
+
+            corners = np.stack([triangles + 1, texture_map + 1], axis=2).reshape(-1, 6)
+            np.savetxt(f, corners, fmt="f %d/%d %d/%d %d/%d")
+        else:
+            np.savetxt(f, triangles + 1, fmt="f %d %d %d")
+
+# bounding volumes for a mesh (in the mesh file's coordinates), used to skip drawing objects that are off screen
+# returns the bounding sphere (center, radius) and the bounding box (min corner, max corner)
+def mesh_bounds(vertices):
+    if (len(vertices) == 0):
+        return np.zeros(3), 0.0, np.zeros(3), np.zeros(3)
+
+    boxMin = vertices[:,0:3].min(axis=0)
+    boxMax = vertices[:,0:3].max(axis=0)
+
+    # the sphere is centered on the box, and just big enough to fit every vertex
+    center = (boxMin + boxMax) / 2
+    radius = np.sqrt(((vertices[:,0:3] - center) ** 2).sum(axis=1).max())
+
+    return center, radius, boxMin, boxMax
+
+# ********  MESH optimization:  ********
+
+# cleans up a mesh from read_obj() so it's cheaper to draw, without changing what it looks like
+#   - vertices (and uvs) that are exactly the same get merged, and ones no triangle uses are dropped
+#   - triangles are reordered so that ones sharing vertices are drawn close together (see order_triangles())
+#   - vertices (and uvs) are renumbered in the order the triangles first use them, so they're read front to back
+# returns the same four arrays as read_obj()
+def optimize_mesh(vertices, triangles, texture_uv, texture_map):
+    if (len(triangles) == 0):
+        return vertices, triangles, texture_uv, texture_map
+
+    hasUVs = len(texture_map) == len(triangles)
+
+    # merging exact duplicates
+    positions, positionIndex = unique_rows(vertices[:,0:3])
+    triangles = positionIndex[triangles]
+    if (hasUVs):
+        texture_uv, uvIndex = unique_rows(texture_uv)
+        texture_map = uvIndex[texture_map]
+
+    order = order_triangles(triangles, len(positions), 32)
+    triangles = triangles[order]
+    if (hasUVs):
+        texture_map = texture_map[order]
+
+    # renumbering by first use (which also drops the unused ones)
+    used, newIndex = first_use_order(triangles, len(positions))
+    newVertices = np.ones((len(used), 9))
+    newVertices[:,0:3] = positions[used]
+    triangles = newIndex[triangles]
+
+    if (hasUVs):
+        used, newIndex = first_use_order(texture_map, len(texture_uv))
+        texture_uv = texture_uv[used]
+        texture_map = newIndex[texture_map]
+
+    return newVertices, triangles, texture_uv, texture_map
+
+# the different rows in an array, and which of them each original row is
+# (same as np.unique(rows, axis=0, return_inverse=True), but that one is really slow for big arrays)
+def unique_rows(rows):
+    order = np.lexsort(rows.T[::-1])
+    sortedRows = rows[order]
+
+    isFirst = np.ones(len(rows), dtype=bool)
+    isFirst[1:] = (sortedRows[1:] != sortedRows[:-1]).any(axis=1)
+
+    inverse = np.empty(len(rows), dtype=int)
+    inverse[order] = np.cumsum(isFirst) - 1
+
+    return sortedRows[isFirst], inverse
+
+# the indexes that are used, in the order they're first used, and what each one gets renumbered to (-1 if unused)
+def first_use_order(indexes, count):
+    flat = indexes.reshape(-1)
+    used = flat[np.sort(np.unique(flat, return_index=True)[1])]
+
+    newIndex = np.full(count, -1, dtype=int)
+    newIndex[used] = np.arange(len(used))
+
+    return used, newIndex
+
+# an order to draw the triangles in, so that each vertex's triangles are drawn close together
+# this is Tom Forsyth's "linear-speed vertex cache optimisation": it pretends there's a cache of the last cacheSize vertices used,
+# and keeps picking the triangle whose vertices score best (recently used, or with few triangles left to draw)
+@njit(cache=True)
+def order_triangles(triangles, vertexCount, cacheSize):
+    triangleCount = len(triangles)
+
+    # which triangles use each vertex
+    remaining = np.zeros(vertexCount, dtype=np.int64)
+    for t in range(triangleCount):
+        for i in range(3):
+            remaining[triangles[t, i]] += 1
+
+    adjacencyStart = np.zeros(vertexCount + 1, dtype=np.int64)
+    for v in range(vertexCount):
+        adjacencyStart[v + 1] = adjacencyStart[v] + remaining[v]
+    adjacency = np.empty(adjacencyStart[vertexCount], dtype=np.int64)
+    filled = adjacencyStart[:vertexCount].copy()
+    for t in range(triangleCount):
+        for i in range(3):
+            v = triangles[t, i]
+            adjacency[filled[v]] = t
+            filled[v] += 1
+
+    cachePosition = np.full(vertexCount, -1, dtype=np.int64)
+    vertexScores = np.empty(vertexCount)
+    for v in range(vertexCount):
+        vertexScores[v] = vertex_cache_score(cachePosition[v], remaining[v], cacheSize)
+
+    drawn = np.zeros(triangleCount, dtype=np.bool_)
+    order = np.empty(triangleCount, dtype=np.int64)
+
+    # (with room for the 3 vertices that get pushed in before the cache is trimmed)
+    cache = np.full(cacheSize + 3, -1, dtype=np.int64)
+    newCache = np.full(cacheSize + 3, -1, dtype=np.int64)
+
+    nextUndrawn = 0
+    best = -1
+    for n in range(triangleCount):
+        # nothing in the cache has triangles left, so just go with the next one in the original order
+        if (best == -1):
+            while (drawn[nextUndrawn]):
+                nextUndrawn += 1
+            best = nextUndrawn
+
+        order[n] = best
+        drawn[best] = True
+
+        # moving the triangle's vertices to the front of the cache
+        count = 0
+        for i in range(3):
+            v = triangles[best, i]
+            newCache[count] = v
+            count += 1
+            remaining[v] -= 1
+        for i in range(cacheSize + 3):
+            v = cache[i]
+            if (v == -1):
+                break
+            if (v != triangles[best, 0] and v != triangles[best, 1] and v != triangles[best, 2]):
+                newCache[count] = v
+                count += 1
+        for i in range(cacheSize + 3):
+            cache[i] = -1
+        for i in range(count):
+            cache[i] = newCache[i]
+
+        # rescoring everything in the cache (and whatever just fell out of it)
+        for i in range(count):
+            v = cache[i]
+            if (i < cacheSize):
+                cachePosition[v] = i
+            else:
+                cachePosition[v] = -1
+                cache[i] = -1
+            vertexScores[v] = vertex_cache_score(cachePosition[v], remaining[v], cacheSize)
+
+        # and picking the best triangle that uses one of the cached vertices
+        best = -1
+        bestScore = -1.0
+        for i in range(min(count, cacheSize)):
+            v = cache[i]
+            for j in range(adjacencyStart[v], adjacencyStart[v + 1]):
+                t = adjacency[j]
+                if (drawn[t]):
+                    continue
+                score = vertexScores[triangles[t, 0]] + vertexScores[triangles[t, 1]] + vertexScores[triangles[t, 2]]
+                if (score > bestScore):
+                    bestScore = score
+                    best = t
+
+    return order
+
+# how much drawing a triangle that uses this vertex next is worth
+@njit(cache=True)
+def vertex_cache_score(cachePosition, remainingTriangles, cacheSize):
+    if (remainingTriangles == 0):
+        return -1.0
+
+    score = 0.0
+    if (cachePosition >= 0):
+        if (cachePosition < 3):
+            # the triangle that was just drawn, a fixed score so it doesn't just keep drawing strips
+            score = 0.75
+        else:
+            score = (1.0 - (cachePosition - 3) / (cacheSize - 3)) ** 1.5
+
+    # vertices with only a few triangles left get a boost, to get rid of them
+    score += 2.0 * remainingTriangles ** -0.5
+
+    return score
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# no window needed for any of the tests (see the headless argument of init())
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,37 @@
+import builtins
+import numpy as np
+import pytest
+from pg3d_scripts import pg3d as engine
+from pg3d_scripts import pg3d_batching as batching
+from pg3d_scripts.pg3d_model import Model
+
+@pytest.fixture(scope="module")
+def scene():
+    engine.init(80, 60, 80, 60, 70, True)
+    yield
+    engine.quit()
+
+def unbatched_frame():
+    engine.disableStaticBatching()
+    frame = engine.getFrame().copy()
+    engine.enableStaticBatching()
+    return frame
+
+# a static model spawned right after one was destroyed can get the old one's id(), with the same everything else (mesh, texture, transformVersion)
+# python doesn't always hand the memory back right away, so every model gets the same id() here to make sure it happens
+def test_respawned_static_model_rebuilds_batch(scene, monkeypatch):
+    monkeypatch.setattr(batching, "id", lambda obj: 0 if isinstance(obj, Model) else builtins.id(obj), raising=False)
+
+    engine.spawnCube("old", -2.0, 0.0, 8.0, ["static"])
+    engine.getFrame()
+
+    engine.destroyObjectWithName("old")
+    engine.spawnCube("new", 2.0, 0.0, 8.0, ["static"])
+
+    frame = engine.getFrame().copy()
+    assert engine.getRenderStats()["static_batches_drawn"] == 1
+    assert frame.any()
+    assert np.array_equal(frame, unbatched_frame())
+
+    engine.destroyObjectWithName("new")
+    batching.clear_static_batches()
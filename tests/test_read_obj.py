@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from pg3d_scripts import pg3d_utils as utils
+
+def write_obj(tmp_path, text):
+    path = tmp_path / "mesh.obj"
+    path.write_text(text)
+    return str(path)
+
+# the same quad, once written normally and once with every line indented (spaces, tabs and both)
+quad = "v 0 0 0\nv 1 0 0\nv 1 1 0\nv 0 1 0\nvt 0 0\nvt 1 0\nvt 1 1\nvt 0 1\nf 1/1 2/2 3/3 4/4\n"
+indentedQuad = "  v 0 0 0\n\tv 1 0 0\n \tv 1 1 0\nv 0 1 0\n  vt 0 0\n\tvt 1 0\nvt 1 1\n   vt 0 1\n\t f 1/1 2/2 3/3 4/4\n"
+
+def test_indented_lines(tmp_path):
+    expected = utils.read_obj(write_obj(tmp_path, quad))
+    mesh = utils.read_obj(write_obj(tmp_path, indentedQuad))
+
+    assert len(mesh[0]) == 4
+    assert len(mesh[1]) == 2
+    for i in range(4):
+        assert np.array_equal(mesh[i], expected[i])
+
+def test_vertex_index_out_of_range(tmp_path):
+    with pytest.raises(ValueError):
+        utils.read_obj(write_obj(tmp_path, "v 0 0 0\nv 1 0 0\nv 1 1 0\nf 1 2 4\n"))
+
+def test_texture_index_out_of_range(tmp_path):
+    with pytest.raises(ValueError):
+        utils.read_obj(write_obj(tmp_path, "v 0 0 0\nv 1 0 0\nv 1 1 0\nvt 0 0\nf 1/1 2/1 3/2\n"))